@@ -24,8 +24,81 @@ _prompts = load_prompts()
 
 # 定数として展開（これまでのコードとの互換性のため）
 DEFAULT_MODEL = _prompts.get("DEFAULT_MODEL", "gemini-3-flash-preview")
-MAX_TRANSLATION_CHUNK_SIZE = _prompts.get("MAX_TRANSLATION_CHUNK_SIZE", 4000)
-MAX_STRUCTURING_CHUNK_SIZE = _prompts.get("MAX_STRUCTURING_CHUNK_SIZE", 40000)
+
+# トークン予算によるチャンク分割
+# Python 版は文字数ではなくトークン数で分割する（shared/prompts.json の MAX_TRANSLATION_CHUNK_SIZE は Web 版のみが使う）
+# 予算はチャンク本文の「入力 + 予想出力」トークン数。出力は上限の安全マージン内に収める
+MAX_OUTPUT_TOKENS = _prompts.get("MAX_OUTPUT_TOKENS", 65536)
+OUTPUT_TOKEN_SAFETY_RATIO = _prompts.get("OUTPUT_TOKEN_SAFETY_RATIO", 0.8)
+MAX_TRANSLATION_CHUNK_TOKENS = _prompts.get("MAX_TRANSLATION_CHUNK_TOKENS", 24000)
+MAX_STRUCTURING_CHUNK_TOKENS = _prompts.get("MAX_STRUCTURING_CHUNK_TOKENS", 20000)
+TRANSLATION_OUTPUT_RATIO = _prompts.get("TRANSLATION_OUTPUT_RATIO", 1.4)  # 英→日の膨張率（トークン比）
+STRUCTURING_OUTPUT_RATIO = _prompts.get("STRUCTURING_OUTPUT_RATIO", 1.0)  # 英→英
+USE_EXACT_TOKEN_COUNT = _prompts.get("USE_EXACT_TOKEN_COUNT", False)  # count_tokens API で正確に数える
+
+# Phase 2 の並列構造化（原文を重なりのある窓に分割し、窓ごとに構造化して継ぎ目で縫い合わせる）
+ENABLE_STRUCTURING_CHUNKING = _prompts.get("ENABLE_STRUCTURING_CHUNKING", False)
+STRUCTURING_OVERLAP_TOKENS = _prompts.get("STRUCTURING_OVERLAP_TOKENS", 300)  # 前の窓から引き継ぐ末尾段落の目安
+
+# Phase 3 で隣り合う小さなセクションを MAX_TRANSLATION_CHUNK_TOKENS に収まる範囲で1チャンクにまとめる
+ENABLE_TRANSLATION_PACKING = _prompts.get("ENABLE_TRANSLATION_PACKING", True)
+
+# Phase 3 の各チャンクに、レジュメ全文ではなく論旨とチャンクの見出しに一致するセクションだけを付与する
+SELECT_RESUME_CONTEXT = _prompts.get("SELECT_RESUME_CONTEXT", True)
+
+# Phase 3 のヘッジリクエスト（パーセンタイルが null の場合は無効）
+TRANSLATION_HEDGE_PERCENTILE = _prompts.get("TRANSLATION_HEDGE_PERCENTILE", None)
+TRANSLATION_HEDGE_BUDGET_RATIO = _prompts.get("TRANSLATION_HEDGE_BUDGET_RATIO", 0.1)  # チャンク数に対する重複リクエストの上限
+
+# Phase 3 のチャンクを推定コストの大きい順に開始する（false なら文書順。結合順はどちらも文書順）
+TRANSLATION_LONGEST_FIRST = _prompts.get("TRANSLATION_LONGEST_FIRST", True)
+
+# LLM通信設定
+LLM_MAX_CONNECTIONS = _prompts.get("LLM_MAX_CONNECTIONS", 100)
+
+# レート制限（プロセス全体で共有）
+LLM_REQUESTS_PER_MINUTE = _prompts.get("LLM_REQUESTS_PER_MINUTE", 60)
+LLM_TOKENS_PER_MINUTE = _prompts.get("LLM_TOKENS_PER_MINUTE", 1000000)
+LLM_INITIAL_CONCURRENCY = _prompts.get("LLM_INITIAL_CONCURRENCY", 3)
+LLM_MAX_CONCURRENCY = _prompts.get("LLM_MAX_CONCURRENCY", 32)
+
+# リトライ・サーキットブレーカー
+LLM_MAX_RETRY_DELAY = _prompts.get("LLM_MAX_RETRY_DELAY", 60)
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = _prompts.get("CIRCUIT_BREAKER_FAILURE_THRESHOLD", 5)
+CIRCUIT_BREAKER_RESET_SECONDS = _prompts.get("CIRCUIT_BREAKER_RESET_SECONDS", 30)
+
+# バッチ処理で同時に処理する文書数（LLM の同時実行数は共有レートリミッタが別途制御する）
+BATCH_DOCUMENT_CONCURRENCY = _prompts.get("BATCH_DOCUMENT_CONCURRENCY", 4)
+
+# serve モード（常駐ジョブサーバー）の既定のアドレスと、処理待ちジョブ数の上限
+SERVER_ADDRESS = _prompts.get("SERVER_ADDRESS", "127.0.0.1:8765")
+SERVER_MAX_QUEUE = _prompts.get("SERVER_MAX_QUEUE", 32)
+
+# 推定費用の単価（ドル / 100万トークン）。docs/management/model_optimization.md の料金
+LLM_INPUT_PRICE_PER_MILLION = _prompts.get("LLM_INPUT_PRICE_PER_MILLION", 0.50)
+LLM_OUTPUT_PRICE_PER_MILLION = _prompts.get("LLM_OUTPUT_PRICE_PER_MILLION", 3.00)
+
+# 実行計画（--plan）の所要時間・トークン数の見積もり
+PLAN_OUTPUT_TOKENS_PER_SECOND = _prompts.get("PLAN_OUTPUT_TOKENS_PER_SECOND", 150)  # 1回の呼び出しの出力生成速度
+PLAN_CALL_OVERHEAD_SECONDS = _prompts.get("PLAN_CALL_OVERHEAD_SECONDS", 2.0)  # 入力の処理・最初のトークンまでの時間
+PLAN_RESUME_OUTPUT_TOKENS = _prompts.get("PLAN_RESUME_OUTPUT_TOKENS", 2500)  # レジュメ（日本語 2500〜3500 字）のトークン数
+
+# LLMレスポンスキャッシュ設定
+LLM_CACHE_ENABLED = _prompts.get("LLM_CACHE_ENABLED", True)
+LLM_CACHE_PATH = PROJECT_ROOT / _prompts.get("LLM_CACHE_PATH", ".cache/llm_responses.sqlite3")
+LLM_CACHE_MAX_BYTES = _prompts.get("LLM_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+LLM_CACHE_TTL_SECONDS = _prompts.get("LLM_CACHE_TTL_SECONDS", 30 * 24 * 60 * 60)
+
+# 翻訳メモリ（文書をまたいだ段落単位の訳の再利用）設定
+TRANSLATION_MEMORY_ENABLED = _prompts.get("TRANSLATION_MEMORY_ENABLED", True)
+TRANSLATION_MEMORY_PATH = PROJECT_ROOT / _prompts.get("TRANSLATION_MEMORY_PATH", ".cache/translation_memory.sqlite3")
+TRANSLATION_MEMORY_MIN_CHARS = _prompts.get("TRANSLATION_MEMORY_MIN_CHARS", 80)  # 類似段落として扱う最小文字数
+TRANSLATION_MEMORY_FUZZY_THRESHOLD = _prompts.get("TRANSLATION_MEMORY_FUZZY_THRESHOLD", 0.6)  # 参考訳とする推定 Jaccard 係数の下限
+TRANSLATION_MEMORY_MAX_REFERENCES = _prompts.get("TRANSLATION_MEMORY_MAX_REFERENCES", 3)  # 1チャンクに付与する参考訳の上限
+TRANSLATION_MEMORY_MAX_LENGTH_RATIO = _prompts.get("TRANSLATION_MEMORY_MAX_LENGTH_RATIO", 1.75)  # 保存する訳文の長さが予想から外れてよい倍率
+
+# 用語集（glossary.csv）の索引の保存先（ファイルの更新時刻が変わるまで再利用する）
+GLOSSARY_INDEX_CACHE_DIR = PROJECT_ROOT / _prompts.get("GLOSSARY_INDEX_CACHE_DIR", ".cache/glossary")
 
 STRUCTURING_WITH_HINT_PROMPT = _prompts.get("STRUCTURING_WITH_HINT_PROMPT", "")
 SUMMARY_PROMPT = _prompts.get("SUMMARY_PROMPT", "")
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+GlossaryIndex: 用語集（glossary.csv）の索引
+
+用語集全体を毎回プロンプトに貼ると、数万語の分野用語集ではプロンプトが用語集の大きさに比例して膨らむ。
+小文字化した原語の Aho-Corasick オートマトンを1回だけ作り、チャンクに実際に現れる用語の行だけを付与する。
+
+- 照合はチャンクの長さ（+ 一致数）に比例する（用語数には依存しない）
+- 英字で始まる・終わる用語は単語の途中では一致させない（"art" は "particular" に一致しない）。
+  語末には複数形の "s" / "es" を許す（"ritual" は "rituals" に一致する）
+- 索引は GLOSSARY_INDEX_CACHE_DIR にファイルの更新時刻・サイズとともに保存し、変更がなければ再利用する
+"""
+import os
+import pickle
+import hashlib
+import tempfile
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .constants import GLOSSARY_INDEX_CACHE_DIR
+from .utils import Utils
+
+# キャッシュの形式を変えたら上げる
+_CACHE_VERSION = 1
+# 同じプロセスで読み込んだ索引（serve モードではジョブごとに用語集を読み直す）
+_loaded: Dict[str, Tuple[int, int, "GlossaryIndex"]] = {}
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+class GlossaryIndex:
+    """小文字化した原語の Aho-Corasick オートマトンと、用語集の行"""
+
+    def __init__(self, entries: Iterable[Tuple[str, str]], notes: Optional[List[str]] = None):
+        """
+        Args:
+            entries: (原語, 訳語) の組（用語集の順）
+            notes: 用語の形式でない行（常に付与する）
+        """
+        self.lines: List[str] = []
+        self.terms: List[str] = []
+        self.notes = notes or []
+        # 遷移は (状態 << 21 | 文字コード) をキーにした1つの辞書（保存・読み込みが速い）。
+        # 失敗遷移、その状態で終わる用語、失敗遷移をたどって最初に出力のある状態（なければ -1）
+        self._goto: Dict[int, int] = {}
+        self._fail: List[int] = [0]
+        self._out: Dict[int, List[int]] = {}
+        self._out_link: List[int] = [-1]
+        children: List[List[Tuple[int, int]]] = [[]]  # 構築中だけ使う (文字コード, 子の状態)
+        for term, translation in entries:
+            self.lines.append(f"{term}: {translation}")
+            self.terms.append(term.lower())
+            self._insert(len(self.terms) - 1, children)
+        self._build_links(children)
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    @classmethod
+    def from_text(cls, glossary_text: str) -> "GlossaryIndex":
+        """load_glossary の形式（"原語: 訳語" の行）から作る。この形式でない行は常に付与する"""
+        entries, notes = [], []
+        for line in glossary_text.splitlines():
+            term, sep, translation = line.partition(": ")
+            if sep and term.strip():
+                entries.append((term.strip(), translation.strip()))
+            elif line.strip():
+                notes.append(line)
+        return cls(entries, notes)
+
+    @classmethod
+    def load(cls, path: str | Path, cache_dir: Optional[Path] = GLOSSARY_INDEX_CACHE_DIR) -> "GlossaryIndex":
+        """
+        glossary.csv の索引を読み込む
+
+        ファイルの更新時刻とサイズが同じなら、プロセス内、次に cache_dir の保存済みの索引を使う（None でディスクに保存しない）。
+        """
+        path = Path(path).resolve()
+        if not path.exists():
+            return cls([])
+        stat = path.stat()
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        memo = _loaded.get(str(path))
+        if memo is not None and memo[:2] == stamp:
+            return memo[2]
+
+        cache_file = None
+        index = None
+        if cache_dir is not None:
+            cache_file = Path(cache_dir) / (hashlib.sha256(str(path).encode("utf-8")).hexdigest()[:16] + ".pickle")
+            index = cls._read_cache(cache_file, stamp)
+        if index is None:
+            index = cls(Utils.load_glossary_entries(path))
+            if cache_file is not None:
+                cls._write_cache(cache_file, stamp, index)
+        _loaded[str(path)] = (*stamp, index)
+        return index
+
+    @staticmethod
+    def _read_cache(cache_file: Path, stamp: Tuple[int, int]) -> Optional["GlossaryIndex"]:
+        try:
+            with open(cache_file, "rb") as f:
+                version, cached_stamp, index = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError, AttributeError):
+            return None
+        if version != _CACHE_VERSION or tuple(cached_stamp) != stamp:
+            return None
+        return index
+
+    @staticmethod
+    def _write_cache(cache_file: Path, stamp: Tuple[int, int], index: "GlossaryIndex") -> None:
+        """一時ファイルに書いてから置き換える（書き込めなくても処理は続ける）"""
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=cache_file.parent, prefix=f".{cache_file.name}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump((_CACHE_VERSION, stamp, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_name, cache_file)
+            except BaseException:
+                Path(tmp_name).unlink(missing_ok=True)
+                raise
+        except OSError as e:
+            print(f"Warning: Failed to cache glossary index: {e}")
+
+    def _insert(self, term_id: int, children: List[List[Tuple[int, int]]]) -> None:
+        state = 0
+        for ch in self.terms[term_id]:
+            key = state << 21 | ord(ch)
+            nxt = self._goto.get(key)
+            if nxt is None:
+                nxt = len(self._fail)
+                self._goto[key] = nxt
+                children[state].append((ord(ch), nxt))
+                children.append([])
+                self._fail.append(0)
+                self._out_link.append(-1)
+            state = nxt
+        if state:
+            self._out.setdefault(state, []).append(term_id)
+
+    def _build_links(self, children: List[List[Tuple[int, int]]]) -> None:
+        """幅優先で失敗遷移と出力リンクを張る"""
+        goto = self._goto
+        queue = deque(child for _, child in children[0])
+        while queue:
+            state = queue.popleft()
+            for code, nxt in children[state]:
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and (f << 21 | code) not in goto:
+                    f = self._fail[f]
+                target = goto.get(f << 21 | code, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                fail = self._fail[nxt]
+                self._out_link[nxt] = fail if fail in self._out else self._out_link[fail]
+
+    def _ends_word(self, text: str, end: int) -> bool:
+        """end の位置で単語が終わるか（複数形の s / es を許す）"""
+        for suffix in ("", "s", "es"):
+            if text.startswith(suffix, end):
+                after = end + len(suffix)
+                if after >= len(text) or not _is_word_char(text[after]):
+                    return True
+        return False
+
+    def lookup(self, chunk: str) -> List[int]:
+        """チャンクに現れる用語の番号（用語集の順）"""
+        if not self._goto:
+            return []
+        text = chunk.lower()
+        goto, fail, out, out_link = self._goto, self._fail, self._out, self._out_link
+        found = set()
+        state = 0
+        for pos, ch in enumerate(text):
+            code = ord(ch)
+            nxt = goto.get(state << 21 | code)
+            while nxt is None and state:
+                state = fail[state]
+                nxt = goto.get(state << 21 | code)
+            state = nxt or 0
+            s = state if state in out else out_link[state]
+            while s > 0:
+                for term_id in out[s]:
+                    if term_id in found:
+                        continue
+                    term = self.terms[term_id]
+                    start = pos + 1 - len(term)
+                    if _is_word_char(term[0]) and start > 0 and _is_word_char(text[start - 1]):
+                        continue
+                    if _is_word_char(term[-1]) and not self._ends_word(text, pos + 1):
+                        continue
+                    found.add(term_id)
+                s = out_link[s]
+        return sorted(found)
+
+    def for_chunk(self, chunk: str) -> str:
+        """チャンクに付与する用語集のテキスト（load_glossary と同じ "原語: 訳語" の行）"""
+        return "\n".join(self.notes + [self.lines[i] for i in self.lookup(chunk)])
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+ヘッジリクエスト: 遅延しているチャンクに重複リクエストを送り、先に返った方を採用する
+
+- LatencyTracker: 同じ実行内で観測したチャンクのレイテンシ
+- HedgeBudget: 1回の実行で許す重複リクエスト数の上限
+- hedged_call: 観測レイテンシのパーセンタイルを超えたら重複リクエストを送り、勝者以外をキャンセルする
+- request_started_scope / notify_request_started: バックエンドが API への送信を始めた時点を呼び出し側へ知らせる
+  （レートリミッタの枠待ちをレイテンシに含めないため）
+"""
+import math
+import time
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from typing import Awaitable, Callable
+
+
+_request_started: contextvars.ContextVar["Callable[[], None] | None"] = contextvars.ContextVar("request_started", default=None)
+
+
+@contextmanager
+def request_started_scope(callback: Callable[[], None]):
+    """このスコープ内の LLM 呼び出しが API への送信を始めたときに callback を呼ぶ"""
+    token = _request_started.set(callback)
+    try:
+        yield
+    finally:
+        _request_started.reset(token)
+
+
+def notify_request_started() -> None:
+    """バックエンドが API への送信直前（レートリミッタの枠を確保した後）に呼ぶ"""
+    callback = _request_started.get()
+    if callback is not None:
+        callback()
+
+
+class LatencyTracker:
+    """完了したリクエストのレイテンシを記録し、パーセンタイルを返す"""
+
+    def __init__(self, min_samples: int = 5):
+        """
+        Args:
+            min_samples: パーセンタイルを返すのに必要な最小観測数（少ない観測で誤ってヘッジしないため）
+        """
+        self.min_samples = min_samples
+        self._samples: list[float] = []
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> float | None:
+        """p パーセンタイル（0〜100）。観測数が足りない場合は None"""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class HedgeBudget:
+    """重複リクエスト数の上限"""
+
+    def __init__(self, max_hedges: int):
+        self.max_hedges = max_hedges
+        self.used = 0
+
+    def try_acquire(self) -> bool:
+        if self.used >= self.max_hedges:
+            return False
+        self.used += 1
+        return True
+
+
+async def hedged_call(call: Callable[[bool], Awaitable[str]], tracker: LatencyTracker,
+                      budget: HedgeBudget, percentile: float,
+                      on_hedge: Callable[[], None] | None = None,
+                      poll_interval: float = 0.5) -> str:
+    """
+    call(False) を実行し、送信開始からの経過時間が観測レイテンシの percentile を超えたら call(True) を重複して送る。
+    先に成功した方の結果を返し、もう一方はキャンセルする。勝者の送信開始から完了までを tracker に記録する。
+
+    送信開始はバックエンドの notify_request_started で知る。レートリミッタの枠を待っている
+    （送信を始めていない）リクエストはヘッジしない。
+
+    Args:
+        call: is_hedge を受け取り、リクエストのコルーチンを返す関数
+        tracker: この実行で観測したレイテンシ
+        budget: 重複リクエストの予算
+        percentile: ヘッジを発動する経過時間のパーセンタイル（例: 90）
+        on_hedge: 重複リクエストを送ったときに呼ばれるコールバック
+        poll_interval: しきい値の再計算間隔（秒）。実行中に観測が増えるため定期的に見直す
+    """
+    started: dict[bool, float] = {}
+
+    async def attempt(is_hedge: bool) -> str:
+        def on_started() -> None:
+            # リトライでは送信が複数回あるため、最初の送信開始を採用する
+            started.setdefault(is_hedge, time.monotonic())
+
+        with request_started_scope(on_started):
+            return await call(is_hedge)
+
+    primary = asyncio.ensure_future(attempt(False))
+    tasks = {primary: False}
+
+    try:
+        while not primary.done():
+            threshold = tracker.percentile(percentile)
+            if threshold is None or False not in started:
+                # 観測が足りない間と、主リクエストが枠待ちで送信を始めていない間はヘッジしない
+                timeout = poll_interval
+            else:
+                remaining = threshold - (time.monotonic() - started[False])
+                if remaining <= 0:
+                    if budget.try_acquire():
+                        tasks[asyncio.ensure_future(attempt(True))] = True
+                        if on_hedge:
+                            on_hedge()
+                    break
+                timeout = min(remaining, poll_interval)
+            await asyncio.wait([primary], timeout=timeout)
+
+        # 先に成功した方を採用する。片方が失敗した場合はもう一方を待つ
+        pending = set(tasks)
+        last_error: BaseException | None = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.cancelled():
+                    continue
+                error = task.exception()
+                if error is None:
+                    if tasks[task] in started:
+                        tracker.record(time.monotonic() - started[tasks[task]])
+                    return task.result()
+                last_error = error
+        if last_error is not None:
+            raise last_error
+        raise asyncio.CancelledError()
+    finally:
+        losers = [task for task in tasks if not task.done()]
+        for task in losers:
+            task.cancel()
+        if losers:
+            await asyncio.gather(*losers, return_exceptions=True)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+差分更新: 原文の小さな修正（OCR の誤り訂正など）を前回の構造化結果へ反映する
+
+Phase 2 は原文全体を1回の呼び出しで構造化するため、数行の修正でも全文をやり直すことになる。
+原文の変更箇所を行単位で求め、前回の構造化 Markdown 中の対応箇所を置き換えることで Phase 2 を省略する。
+対応箇所を一意に特定できない変更が1つでもあれば None を返し、呼び出し側は通常の Phase 2 を行う。
+"""
+import difflib
+
+
+def _replace_once(text: str, old: str, new: str) -> str | None:
+    """old が text 中にちょうど1回現れる場合のみ置き換える"""
+    if not old or text.count(old) != 1:
+        return None
+    return text.replace(old, new, 1)
+
+
+def patch_structured_text(old_raw: str, new_raw: str, old_structured: str) -> str | None:
+    """
+    原文の差分を前回の構造化 Markdown に適用する
+
+    Args:
+        old_raw: 前回の原文
+        new_raw: 今回の原文
+        old_structured: 前回の原文から作った構造化 Markdown
+
+    Returns:
+        今回の原文に対応する構造化 Markdown。差分を適用できない場合は None
+    """
+    old_lines = old_raw.splitlines()
+    new_lines = new_raw.splitlines()
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+
+    patched = old_structured
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        old_segment = [line.strip() for line in old_lines[i1:i2]]
+        new_segment = [line.strip() for line in new_lines[j1:j2]]
+        # 挿入・削除は直前（先頭なら直後）の行を含めて置き換え、挿入位置を特定できるようにする
+        if i1 > 0:
+            anchor = old_lines[i1 - 1].strip()
+            old_segment.insert(0, anchor)
+            new_segment.insert(0, anchor)
+        elif i2 < len(old_lines):
+            anchor = old_lines[i2].strip()
+            old_segment.append(anchor)
+            new_segment.append(anchor)
+
+        # 構造化で行の折り返しが変わっている可能性があるため、まず行ごとの置き換えを試みる
+        if len(old_segment) == len(new_segment):
+            result = patched
+            for old_line, new_line in zip(old_segment, new_segment):
+                if old_line == new_line:
+                    continue
+                result = _replace_once(result, old_line, new_line)
+                if result is None:
+                    break
+            if result is not None:
+                patched = result
+                continue
+
+        result = _replace_once(patched, "\n".join(old_segment), "\n".join(new_segment))
+        if result is None:
+            return None
+        patched = result
+    return patched
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+LLMバックエンド: PaperProcessorSkills から差し替え可能な LLM 呼び出し口
+
+- LLMBackend: バックエンドが満たすべきプロトコル
+- GeminiBackend: Gemini API（LLMProcessor そのもの）
+- RecordingBackend: 別のバックエンドを呼び出し、プロンプトと応答の組をカセットファイルへ記録
+- ReplayBackend: カセットファイルから応答を再生（ネットワーク・APIキー不要）。擬似レイテンシを付与できる
+"""
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from pathlib import Path
+from typing import Protocol, runtime_checkable
+
+from .llm_stream import LLMStream
+from .telemetry import CallStats, current_telemetry
+from .hedging import notify_request_started
+from .token_estimator import TokenEstimator
+from .constants import DEFAULT_MODEL
+
+
+@runtime_checkable
+class LLMBackend(Protocol):
+    """
+    PaperProcessorSkills が利用する LLM バックエンドのインターフェース
+
+    acall_api は API への送信直前に hedging.notify_request_started() を呼ぶ（呼ばないバックエンドではヘッジしない）。
+    model_name は応答を生成するモデル名（チェックポイントのキーに含める）。
+    """
+
+    model_name: str
+
+    def call_api(self, prompt: str, progress_callback=None) -> str:
+        ...
+
+    async def acall_api(self, prompt: str, progress_callback=None, dedupe: bool = True) -> str:
+        ...
+
+    def astream_api(self, prompt: str, progress_callback=None) -> LLMStream:
+        ...
+
+    async def aclose(self) -> None:
+        ...
+
+
+def __getattr__(name: str):
+    # Gemini API バックエンド（google.genai の読み込みは最初に参照したときまで遅らせる）
+    if name == "GeminiBackend":
+        from .llm_processor import LLMProcessor
+        return LLMProcessor
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def prompt_key(prompt: str) -> str:
+    """カセット内でプロンプトを識別するキー"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class RecordingBackend:
+    """
+    別のバックエンドへ委譲しつつ、プロンプトと応答の組をカセット（JSON Lines）へ追記する
+    """
+
+    def __init__(self, inner: LLMBackend, cassette_path: str | Path):
+        """
+        Args:
+            inner: 実際に呼び出すバックエンド
+            cassette_path: 記録先のカセットファイル（追記モード）
+        """
+        self.inner = inner
+        self.cassette_path = Path(cassette_path)
+        self.cassette_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    @property
+    def model_name(self) -> str:
+        return self.inner.model_name
+
+    def _record(self, prompt: str, response: str, latency: float, finish_reason: str | None = "STOP") -> None:
+        entry = {
+            "key": prompt_key(prompt),
+            "prompt": prompt,
+            "response": response,
+            "latency": round(latency, 3),
+            "finish_reason": finish_reason,
+            "model": self.model_name,
+        }
+        with self._lock:
+            with open(self.cassette_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def call_api(self, prompt: str, progress_callback=None) -> str:
+        started = time.perf_counter()
+        response = self.inner.call_api(prompt, progress_callback)
+        self._record(prompt, response, time.perf_counter() - started)
+        return response
+
+    async def acall_api(self, prompt: str, progress_callback=None, dedupe: bool = True) -> str:
+        started = time.perf_counter()
+        response = await self.inner.acall_api(prompt, progress_callback, dedupe)
+        self._record(prompt, response, time.perf_counter() - started)
+        return response
+
+    def astream_api(self, prompt: str, progress_callback=None) -> LLMStream:
+        async def fragments(stream: LLMStream):
+            started = time.perf_counter()
+            inner_stream = self.inner.astream_api(prompt, progress_callback)
+            parts = []
+            async for fragment in inner_stream:
+                stream.finish_reason = inner_stream.finish_reason
+                parts.append(fragment)
+                yield fragment
+            stream.finish_reason = inner_stream.finish_reason
+            self._record(prompt, "".join(parts), time.perf_counter() - started, stream.finish_reason)
+
+        return LLMStream(fragments)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+class SyntheticLatency:
+    """
+    再生時に付与する擬似レイテンシの分布
+
+    - "none": 待機しない
+    - "recorded": 記録時の実測値 × scale
+    - "constant": mean 秒
+    - "uniform": low〜high 秒の一様分布
+    - "lognormal": 中央値 mean 秒・形状 sigma の対数正規分布
+    """
+
+    KINDS = ("none", "recorded", "constant", "uniform", "lognormal")
+
+    def __init__(self, kind: str = "recorded", mean: float = 1.0, sigma: float = 0.5,
+                 low: float = 0.5, high: float = 2.0, scale: float = 1.0, seed: int | None = 0):
+        if kind not in self.KINDS:
+            raise ValueError(f"未知のレイテンシ分布です: {kind}")
+        self.kind = kind
+        self.mean = mean
+        self.sigma = sigma
+        self.low = low
+        self.high = high
+        self.scale = scale
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self, recorded: float | None = None) -> float:
+        """1回分の待ち時間（秒）を返す"""
+        with self._lock:
+            if self.kind == "none":
+                return 0.0
+            if self.kind == "recorded":
+                return (recorded or 0.0) * self.scale
+            if self.kind == "constant":
+                return self.mean * self.scale
+            if self.kind == "uniform":
+                return self._random.uniform(self.low, self.high) * self.scale
+            return self._random.lognormvariate(0.0, self.sigma) * self.mean * self.scale
+
+
+class ReplayBackend:
+    """
+    カセットファイルに記録された応答を再生するバックエンド
+
+    同じプロンプトには常に同じ応答を返すため、パイプライン全体の計測・プロファイルを
+    オフラインかつ決定的に行える。未記録のプロンプトは LookupError。
+    """
+
+    STREAM_FRAGMENT_SIZE = 512  # 再生時の擬似ストリーミング断片の文字数
+
+    def __init__(self, cassette_path: str | Path, latency: SyntheticLatency | None = None):
+        """
+        Args:
+            cassette_path: RecordingBackend が書き出したカセットファイル
+            latency: 擬似レイテンシの分布。Noneの場合は待機しない
+
+        model_name は記録したモデル名（モデル名のない以前のカセットでは DEFAULT_MODEL）。
+        """
+        self.cassette_path = Path(cassette_path)
+        self.latency = latency or SyntheticLatency("none")
+        self._entries: dict[str, dict] = {}
+        self._token_estimator = TokenEstimator()
+
+        with open(self.cassette_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                # 同じプロンプトが複数回記録されている場合は最後の記録を採用する
+                self._entries[entry["key"]] = entry
+        models = [entry["model"] for entry in self._entries.values() if entry.get("model")]
+        self.model_name = models[-1] if models else DEFAULT_MODEL
+
+    def _lookup(self, prompt: str) -> dict:
+        entry = self._entries.get(prompt_key(prompt))
+        if entry is None:
+            raise LookupError(f"カセットに記録されていないプロンプトです: {prompt[:80]!r}")
+        return entry
+
+    def _record_call(self, prompt: str, entry: dict, started: float) -> None:
+        """再生した呼び出しをテレメトリに記録する（トークン数は概算）"""
+        telemetry = current_telemetry()
+        if telemetry is None:
+            return
+        stats = CallStats()
+        stats.started = started
+        stats.attempts = 1
+        stats.model = "replay"
+        stats.latency = time.monotonic() - started
+        stats.prompt_tokens = self._token_estimator.estimate(prompt)
+        stats.response_tokens = self._token_estimator.estimate(entry["response"])
+        stats.finish_reason = entry.get("finish_reason") or "STOP"
+        stats.finished = time.monotonic()
+        telemetry.record(stats)
+
+    def call_api(self, prompt: str, progress_callback=None) -> str:
+        entry = self._lookup(prompt)
+        started = time.monotonic()
+        time.sleep(self.latency.sample(entry.get("latency")))
+        self._record_call(prompt, entry, started)
+        return entry["response"]
+
+    async def acall_api(self, prompt: str, progress_callback=None, dedupe: bool = True) -> str:
+        entry = self._lookup(prompt)
+        started = time.monotonic()
+        notify_request_started()
+        await asyncio.sleep(self.latency.sample(entry.get("latency")))
+        self._record_call(prompt, entry, started)
+        return entry["response"]
+
+    def astream_api(self, prompt: str, progress_callback=None) -> LLMStream:
+        async def fragments(stream: LLMStream):
+            entry = self._lookup(prompt)
+            started = time.monotonic()
+            response = entry["response"]
+            pieces = [
+                response[i:i + self.STREAM_FRAGMENT_SIZE]
+                for i in range(0, len(response), self.STREAM_FRAGMENT_SIZE)
+            ] or [""]
+            delay = self.latency.sample(entry.get("latency")) / len(pieces)
+            for i, piece in enumerate(pieces):
+                await asyncio.sleep(delay)
+                if i == len(pieces) - 1:
+                    stream.finish_reason = entry.get("finish_reason") or "STOP"
+                    self._record_call(prompt, entry, started)
+                yield piece
+
+        return LLMStream(fragments)
+
+    async def aclose(self) -> None:
+        return None
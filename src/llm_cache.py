@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+LLMResponseCache: LLMレスポンスのディスクキャッシュ（SQLite）
+
+- キー: モデル名・生成設定・プロンプトのハッシュ（内容アドレス）
+- 有効期限（TTL）を過ぎたエントリは無効
+- 合計サイズが上限を超えた場合、最終アクセスが古い順（LRU）に削除
+"""
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any
+
+
+class LLMResponseCache:
+    """
+    LLMレスポンスを SQLite に保存する永続キャッシュ
+
+    同一プロセス内の複数スレッドから利用できるよう、接続はロックで保護する。
+    """
+
+    def __init__(self, path: str | Path, max_bytes: int, ttl_seconds: float):
+        """
+        Args:
+            path: SQLite ファイルのパス（親ディレクトリは自動作成）
+            max_bytes: キャッシュ全体の最大サイズ（バイト）
+            ttl_seconds: エントリの有効期限（秒）
+        """
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON responses(accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name: str, config: dict[str, Any], prompt: str) -> str:
+        """モデル名・生成設定・プロンプトから内容アドレスのキーを作る"""
+        payload = json.dumps(
+            {"model": model_name, "config": config, "prompt": prompt},
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """キャッシュを参照する。期限切れ・未登録の場合は None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        """レスポンスを保存し、必要に応じて古いエントリを削除する"""
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """期限切れエントリを削除し、上限を超えていれば LRU 順に削除する（ロック取得済みで呼ぶ）"""
+        self._conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at ASC"
+        ).fetchall()
+        stale_keys = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale_keys.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
+
+    def clear(self) -> None:
+        """全エントリを削除する"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self) -> None:
+        """接続を閉じる"""
+        with self._lock:
+            self._conn.close()
@@ -4,76 +4,618 @@ LLMProcessor: Gemini APIとの通信を管理するクラス
 """
 import os
 import time
+import hashlib
+import asyncio
+import threading
+import concurrent.futures
+import httpx
 from google import genai
 from google.genai import types
 
-from .constants import DEFAULT_MODEL
+from .constants import (
+    DEFAULT_MODEL, LLM_MAX_CONNECTIONS, MAX_OUTPUT_TOKENS, LLM_MAX_RETRY_DELAY,
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD, CIRCUIT_BREAKER_RESET_SECONDS,
+    LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL_SECONDS
+)
+from .llm_cache import LLMResponseCache
+from .llm_stream import LLMStream
+from .rate_limiter import RateLimiter
+from .token_estimator import TokenEstimator
+from .telemetry import CallStats, current_telemetry
+from .progress import ChunkRetried, emit
+from .hedging import notify_request_started
+from .retry_policy import (
+    RetryPolicy, CircuitBreaker, CircuitOpenError, ErrorClass, LLMFatalError, ContentBlockedError,
+    BLOCKED_FINISH_REASONS, classify_error
+)
+
+
+class LLMEndpoint:
+    """
+    API キーとモデルの組
+
+    エンドポイントごとにクライアント・クォータ状態（RateLimiter）・健全性（CircuitBreaker）を持つ。
+    RateLimiter は同じキーとモデルの組であればプロセス内で共有される。
+    """
+
+    def __init__(self, api_key: str, model_name: str, http_options: types.HttpOptions,
+                 rate_limiter: RateLimiter | None = None):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.client = genai.Client(api_key=api_key, http_options=http_options)
+        self.rate_limiter = rate_limiter or RateLimiter.shared(self.name)
+        self.circuit_breaker = CircuitBreaker(CIRCUIT_BREAKER_FAILURE_THRESHOLD, CIRCUIT_BREAKER_RESET_SECONDS)
+
+    @property
+    def name(self) -> str:
+        """ログ・リミッタ共有用の識別名（キーそのものは含めない）"""
+        key_id = hashlib.sha256(self.api_key.encode("utf-8")).hexdigest()[:8]
+        return f"{self.model_name}:{key_id}"
+
+    def load(self) -> tuple[bool, float, int]:
+        """ルーティング用の負荷（小さいほど空いている）: (クォータ待ち中か, 使用率, 実行中数)"""
+        limiter = self.rate_limiter
+        throttled = limiter.requests.wait_time(1) > 0 or limiter.tokens.wait_time(1) > 0
+        return throttled, limiter.in_flight / limiter.concurrency_limit, limiter.in_flight
 
 
 class LLMProcessor:
     """
     Gemini APIとの通信を管理するクラス
-    
-    - リトライ処理（exponential backoff）
+
+    - リトライ処理（エラー分類・full jitter・Retry-After・実行期限・サーキットブレーカー）
     - 温度設定: 0.0（学術翻訳向け）
+    - 非同期版 acall_api は SDK の非同期クライアント（共有コネクションプール）を使用
+    - レスポンスキャッシュ（同一プロンプトの再実行は API を呼ばない。正常に終了した応答のみ保存）
+    - single-flight: 同時に発行された同一プロンプトは 1 回だけ API を呼ぶ
+    - 非同期呼び出しはプロセス共有の RateLimiter（RPM/TPM・AIMD 同時実行数）を通す
+    - astream_api: generate_content_stream によるストリーミング生成
+    - 複数の (API キー, モデル) を束ねたプールとして動作し、空いている健全なエンドポイントへ振り分ける
+      （GOOGLE_API_KEYS="key1,key2:model" または endpoints 引数で指定）
     """
 
     MAX_RETRIES = 3
     BASE_DELAY = 2  # 秒
 
-    def __init__(self, api_key: str | None = None, model_name: str | None = None):
+    def __init__(self, api_key: str | None = None, model_name: str | None = None,
+                 max_connections: int = LLM_MAX_CONNECTIONS,
+                 cache: LLMResponseCache | None = None, use_cache: bool = LLM_CACHE_ENABLED,
+                 rate_limiter: RateLimiter | None = None,
+                 endpoints: list[tuple[str, str | None]] | None = None):
         """
         Args:
             api_key: Google API Key。Noneの場合は環境変数から取得
             model_name: 使用するモデル名。Noneの場合はDEFAULT_MODELを使用
+            max_connections: 非同期クライアントが保持する HTTP コネクションの上限
+            cache: レスポンスキャッシュ。Noneの場合は設定値から既定のキャッシュを作成
+            use_cache: False の場合はキャッシュを使用しない
+            rate_limiter: 先頭エンドポイントのレートリミッタ。Noneの場合はプロセス共有のリミッタを使用
+            endpoints: (API キー, モデル名) のリスト。モデル名が None の場合は model_name を使用。
+                       None の場合は api_key、環境変数 GOOGLE_API_KEYS、GOOGLE_API_KEY の順に参照
         """
-        self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
-        if not self.api_key:
+        default_model = model_name or DEFAULT_MODEL
+        if endpoints is None:
+            if api_key:
+                endpoints = [(api_key, None)]
+            else:
+                endpoints = self._endpoints_from_env()
+        if not endpoints:
             raise ValueError("GOOGLE_API_KEY が設定されていません")
-        
-        self.client = genai.Client(api_key=self.api_key)
-        self.model_name = model_name or DEFAULT_MODEL
+
+        # 非同期呼び出しはすべて同じ httpx.AsyncClient（コネクションプール）を共有する
+        http_options = types.HttpOptions(
+            async_client_args={
+                "limits": httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                ),
+            },
+        )
+        self.endpoints = [
+            LLMEndpoint(key, model or default_model, http_options, rate_limiter if i == 0 else None)
+            for i, (key, model) in enumerate(endpoints)
+        ]
+        self.api_key = self.endpoints[0].api_key
+
+        if use_cache and cache is None:
+            cache = LLMResponseCache(LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL_SECONDS)
+        self.cache = cache if use_cache else None
+        self.token_estimator = TokenEstimator()
+        self.retry_policy = RetryPolicy(self.MAX_RETRIES, self.BASE_DELAY, LLM_MAX_RETRY_DELAY)
+
+        # single-flight 用: キャッシュキー -> 実行中の Future
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._sync_inflight: dict[str, concurrent.futures.Future] = {}
+        self._sync_inflight_lock = threading.Lock()
+
+    @staticmethod
+    def _endpoints_from_env() -> list[tuple[str, str | None]]:
+        """環境変数から (API キー, モデル名) のリストを作る。GOOGLE_API_KEYS は "key[:model],..." 形式"""
+        pooled = os.getenv("GOOGLE_API_KEYS", "")
+        endpoints: list[tuple[str, str | None]] = []
+        for entry in pooled.split(","):
+            entry = entry.strip()
+            if not entry:
+                continue
+            key, _, model = entry.partition(":")
+            endpoints.append((key.strip(), model.strip() or None))
+        if not endpoints and os.getenv("GOOGLE_API_KEY"):
+            endpoints.append((os.getenv("GOOGLE_API_KEY", ""), None))
+        return endpoints
+
+    # 以下は先頭（主）エンドポイントへのショートカット
+    @property
+    def client(self) -> genai.Client:
+        return self.endpoints[0].client
+
+    @client.setter
+    def client(self, value) -> None:
+        self.endpoints[0].client = value
+
+    @property
+    def model_name(self) -> str:
+        return self.endpoints[0].model_name
+
+    @model_name.setter
+    def model_name(self, value: str) -> None:
+        self.endpoints[0].model_name = value
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        return self.endpoints[0].rate_limiter
+
+    @rate_limiter.setter
+    def rate_limiter(self, value: RateLimiter) -> None:
+        self.endpoints[0].rate_limiter = value
+
+    @property
+    def circuit_breaker(self) -> CircuitBreaker:
+        return self.endpoints[0].circuit_breaker
+
+    def _generation_config(self) -> types.GenerateContentConfig:
+        """生成設定（同期・非同期で共通）"""
+        return types.GenerateContentConfig(
+            temperature=0.0,
+            max_output_tokens=MAX_OUTPUT_TOKENS,  # Gemini 1.5/3 Flash の物理上限
+        )
+
+    def _cache_key(self, prompt: str) -> str:
+        """モデル名・生成設定・プロンプトからキャッシュキーを作る"""
+        config = self._generation_config().model_dump(mode="json", exclude_none=True)
+        # プール内のエンドポイントの応答は相互に代替可能とみなし、モデル名の集合をキーに含める
+        models = ",".join(sorted({endpoint.model_name for endpoint in self.endpoints}))
+        return LLMResponseCache.make_key(models, config, prompt)
+
+    def _estimate_prompt_tokens(self, prompt: str) -> int:
+        """レート制限用にプロンプトの入力トークン数を概算する"""
+        return self.token_estimator.estimate(prompt)
+
+    def count_tokens(self, text: str) -> int:
+        """count_tokens API で正確なトークン数を取得する"""
+        response = self.client.models.count_tokens(model=self.model_name, contents=text)
+        return response.total_tokens or 0
+
+    def _notify_retry(self, attempt: int, error: Exception, progress_callback=None) -> None:
+        """リトライ発生を進捗イベントとコールバックへ通知する（どちらもなければ標準出力）"""
+        msg = f"リトライ中... ({attempt + 1}/{self.retry_policy.max_attempts}) - 原因: {error}"
+        self._notify(msg, ChunkRetried(attempt + 1, str(error)), progress_callback)
+
+    @staticmethod
+    def _notify(msg: str, event: ChunkRetried, progress_callback=None) -> None:
+        emitted = emit(event)
+        if progress_callback:
+            progress_callback(msg)
+        elif not emitted:
+            print(msg)
+
+    def _route(self, tried: set[int]) -> LLMEndpoint:
+        """
+        試行前の確認（実行期限）を行い、未試行・健全・最も空いているエンドポイントを選ぶ。
+        すべて遮断中なら CircuitOpenError。
+        """
+        self.retry_policy.check_deadline()
+        candidates = sorted(
+            range(len(self.endpoints)),
+            key=lambda i: (i in tried, self.endpoints[i].load()),
+        )
+        last_error: CircuitOpenError | None = None
+        for i in candidates:
+            endpoint = self.endpoints[i]
+            try:
+                endpoint.circuit_breaker.before_call()
+            except CircuitOpenError as e:
+                last_error = e
+                continue
+            tried.add(i)
+            return endpoint
+        raise last_error or CircuitOpenError("利用可能な LLM エンドポイントがありません")
+
+    def _can_fail_over(self, tried: set[int]) -> bool:
+        """今回のリクエストでまだ試していない、遮断されていないエンドポイントがあるか"""
+        return any(
+            i not in tried and self.endpoints[i].circuit_breaker.is_available()
+            for i in range(len(self.endpoints))
+        )
+
+    def _on_success(self, endpoint: LLMEndpoint) -> None:
+        endpoint.circuit_breaker.record_success()
+        endpoint.rate_limiter.on_success()
+
+    def _on_failure(self, error: Exception, attempt: int, endpoint: LLMEndpoint, tried: set[int],
+                    progress_callback=None) -> tuple[float, bool]:
+        """
+        失敗を分類・記録し、(リトライまでの待ち時間, 別エンドポイントへの切り替えか) を返す。
+        リトライしない場合（致命的エラー・試行回数超過・期限超過）は例外を送出する。
+        """
+        error_class = classify_error(error)
+        endpoint.circuit_breaker.record_failure(error_class, error)
+        if error_class == ErrorClass.QUOTA:
+            endpoint.rate_limiter.on_throttle()
+
+        # クォータ超過・一時的エラーは、未試行のエンドポイントがあれば待たずに切り替える
+        if error_class in RetryPolicy.RETRYABLE and self._can_fail_over(tried):
+            msg = f"エンドポイント {endpoint.name} で失敗したため切り替えます - 原因: {error}"
+            self._notify(msg, ChunkRetried(attempt + 1, f"別のエンドポイントへ切り替え - {error}"), progress_callback)
+            return 0.0, True
+
+        if not self.retry_policy.should_retry(error_class, attempt):
+            if isinstance(error, LLMFatalError):
+                raise error
+            if error_class in (ErrorClass.FATAL, ErrorClass.CONTENT_BLOCKED):
+                raise LLMFatalError(f"API呼び出しに失敗しました（リトライ不可）: {error}") from error
+            raise RuntimeError(f"API呼び出しに失敗しました（{attempt + 1}回試行）: {error}") from error
+
+        delay = self.retry_policy.backoff(attempt, error)
+        self.retry_policy.check_deadline(delay)
+        self._notify_retry(attempt, error, progress_callback)
+        return delay, False
+
+    @staticmethod
+    def _finish_reason_of(response) -> str | None:
+        candidates = getattr(response, "candidates", None) or []
+        if not candidates or not candidates[0].finish_reason:
+            return None
+        reason = candidates[0].finish_reason
+        return str(getattr(reason, "value", reason))
+
+    @staticmethod
+    def _check_prompt_blocked(response) -> None:
+        feedback = getattr(response, "prompt_feedback", None)
+        block_reason = getattr(feedback, "block_reason", None) if feedback else None
+        if block_reason:
+            raise ContentBlockedError(f"プロンプトがブロックされました: {getattr(block_reason, 'value', block_reason)}")
+
+    def _extract_text(self, response) -> str:
+        """レスポンスからテキストを取り出す。ブロック・空レスポンスは例外"""
+        self._check_prompt_blocked(response)
+        if response.text:
+            return response.text
+        finish_reason = self._finish_reason_of(response)
+        if finish_reason in BLOCKED_FINISH_REASONS:
+            raise ContentBlockedError(f"応答がブロックされました: {finish_reason}")
+        raise ValueError("APIからのレスポンスが空です")
 
     def call_api(self, prompt: str, progress_callback=None) -> str:
         """
-        Gemini APIを呼び出す（リトライ処理付き）
-        
+        Gemini APIを呼び出す（キャッシュ・リトライ処理付き）
+
         Args:
             prompt: プロンプト
             progress_callback: 進捗コールバック関数（オプション）
-            
+
         Returns:
             APIレスポンスのテキスト
         """
-        last_error = None
-        
-        for attempt in range(self.MAX_RETRIES):
+        stats = CallStats()
+        try:
+            return self._call_api(prompt, progress_callback, stats)
+        except BaseException as e:
+            stats.error = type(e).__name__
+            raise
+        finally:
+            self._record_call(stats)
+
+    def _call_api(self, prompt: str, progress_callback, stats: CallStats) -> str:
+        if self.cache is None:
+            return self._call_api_uncached(prompt, progress_callback, stats)
+
+        key = self._cache_key(prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            stats.cached = True
+            return cached
+
+        with self._sync_inflight_lock:
+            future = self._sync_inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = concurrent.futures.Future()
+                self._sync_inflight[key] = future
+
+        if not is_leader:
+            stats.cached = True
+            return future.result()
+
+        try:
+            text = self._call_api_uncached(prompt, progress_callback, stats)
+            if self._cacheable(stats):
+                self.cache.put(key, text)
+            future.set_result(text)
+            return text
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._sync_inflight_lock:
+                self._sync_inflight.pop(key, None)
+
+    def _call_api_uncached(self, prompt: str, progress_callback=None, stats: CallStats | None = None) -> str:
+        """Gemini APIを同期的に呼び出す（リトライ処理のみ）"""
+        stats = stats or CallStats()
+        attempt = 0
+        tried: set[int] = set()
+        while True:
+            endpoint = self._route(tried)
+            stats.start_attempt(endpoint.model_name, endpoint.name)
             try:
-                response = self.client.models.generate_content(
-                    model=self.model_name,
+                response = endpoint.client.models.generate_content(
+                    model=endpoint.model_name,
                     contents=prompt,
-                    config=types.GenerateContentConfig(
-                        temperature=0.0,
-                        max_output_tokens=65536,  # Gemini 1.5/3 Flash の物理上限
-                    )
+                    config=self._generation_config(),
                 )
-                
-                if response.text:
-                    return response.text
-                else:
+                stats.end_attempt(getattr(response, "usage_metadata", None), self._finish_reason_of(response))
+                text = self._extract_text(response)
+                self._on_success(endpoint)
+                return text
+            except Exception as e:
+                stats.end_attempt()
+                delay, failover = self._on_failure(e, attempt, endpoint, tried, progress_callback)
+            if failover:
+                continue
+            time.sleep(delay)
+            attempt += 1
+            tried.clear()
+
+    async def acall_api(self, prompt: str, progress_callback=None, dedupe: bool = True) -> str:
+        """
+        Gemini APIを非同期に呼び出す（キャッシュ・リトライ処理付き）
+
+        スレッドを占有せず、待機には asyncio.sleep を用いる。
+        呼び出し元のタスクがキャンセルされた場合は CancelledError がそのまま伝播し、
+        通信中のリクエストやバックオフ待機も中断される。
+
+        Args:
+            prompt: プロンプト
+            progress_callback: 進捗コールバック関数（オプション）
+            dedupe: False の場合は single-flight を行わず、実行中の同一プロンプトがあっても独立に呼び出す
+                    （ヘッジリクエスト用）
+
+        Returns:
+            APIレスポンスのテキスト
+        """
+        stats = CallStats()
+        try:
+            return await self._acall_api(prompt, progress_callback, dedupe, stats)
+        except BaseException as e:
+            stats.error = type(e).__name__
+            raise
+        finally:
+            self._record_call(stats)
+
+    @staticmethod
+    def _cacheable(stats: CallStats) -> bool:
+        """正常に終了した応答か（MAX_TOKENS などで打ち切られた応答はキャッシュしない）"""
+        return stats.finish_reason == "STOP"
+
+    async def _acache_put(self, key: str, text: str, stats: CallStats) -> None:
+        # SQLite への書き込みでイベントループを止めないよう、別スレッドで行う
+        if self._cacheable(stats):
+            await asyncio.to_thread(self.cache.put, key, text)
+
+    async def _acall_api(self, prompt: str, progress_callback, dedupe: bool, stats: CallStats) -> str:
+        if self.cache is None:
+            return await self._acall_api_uncached(prompt, progress_callback, stats)
+
+        key = self._cache_key(prompt)
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            stats.cached = True
+            return cached
+
+        if not dedupe:
+            text = await self._acall_api_uncached(prompt, progress_callback, stats)
+            await self._acache_put(key, text, stats)
+            return text
+
+        # 同一プロンプトが実行中なら、その結果を待つ
+        while key in self._inflight:
+            future = self._inflight[key]
+            try:
+                stats.cached = True
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # 先行タスクがキャンセルされた場合は自分が代わりに実行する
+                if not future.cancelled():
+                    raise
+                stats.cached = False
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            text = await self._acall_api_uncached(prompt, progress_callback, stats)
+            future.set_result(text)
+            await self._acache_put(key, text, stats)
+            return text
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 待機者がいない場合に "exception was never retrieved" を出さない
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _acall_api_uncached(self, prompt: str, progress_callback=None, stats: CallStats | None = None) -> str:
+        """Gemini APIを非同期に呼び出す（レート制限・リトライ処理のみ）"""
+        stats = stats or CallStats()
+        estimated_tokens = self._estimate_prompt_tokens(prompt)
+        attempt = 0
+        tried: set[int] = set()
+        while True:
+            endpoint = self._route(tried)
+            actual_tokens = None
+            # バックオフ待機中は枠を保持しないよう、試行ごとに枠を確保する
+            queued = time.monotonic()
+            await endpoint.rate_limiter.acquire(estimated_tokens)
+            stats.queue_wait += time.monotonic() - queued
+            stats.start_attempt(endpoint.model_name, endpoint.name)
+            notify_request_started()
+            try:
+                response = await endpoint.client.aio.models.generate_content(
+                    model=endpoint.model_name,
+                    contents=prompt,
+                    config=self._generation_config(),
+                )
+                usage = getattr(response, "usage_metadata", None)
+                stats.end_attempt(usage, self._finish_reason_of(response))
+                actual_tokens = getattr(usage, "total_token_count", None)
+                if not isinstance(actual_tokens, int):
+                    actual_tokens = None
+
+                text = self._extract_text(response)
+                self._on_success(endpoint)
+                return text
+            except Exception as e:
+                # CancelledError は Exception の派生ではないため、ここでは捕捉されない
+                stats.end_attempt()
+                delay, failover = self._on_failure(e, attempt, endpoint, tried, progress_callback)
+            finally:
+                endpoint.rate_limiter.release(estimated_tokens, actual_tokens)
+
+            if failover:
+                continue
+            await asyncio.sleep(delay)
+            attempt += 1
+            tried.clear()
+
+    def astream_api(self, prompt: str, progress_callback=None) -> LLMStream:
+        """
+        Gemini APIをストリーミングで呼び出す
+
+        返り値の LLMStream を async for で回すとテキスト断片が到着順に得られる。
+        最初の断片を受け取る前の失敗のみリトライする（途中まで返した出力はやり直せないため）。
+
+        Args:
+            prompt: プロンプト
+            progress_callback: 進捗コールバック関数（オプション）
+
+        Returns:
+            LLMStream
+        """
+        return LLMStream(lambda stream: self._stream_fragments(prompt, stream, progress_callback))
+
+    async def _stream_fragments(self, prompt: str, stream: LLMStream, progress_callback=None):
+        """ストリーミング応答の断片を返す非同期ジェネレータ（キャッシュ・レート制限・リトライ・計測付き）"""
+        stats = CallStats()
+        try:
+            async for fragment in self._stream_attempts(prompt, stream, stats, progress_callback):
+                yield fragment
+        except GeneratorExit:
+            raise
+        except BaseException as e:
+            stats.error = type(e).__name__
+            raise
+        finally:
+            self._record_call(stats)
+
+    async def _stream_attempts(self, prompt: str, stream: LLMStream, stats: CallStats, progress_callback=None):
+        """キャッシュ確認と、最初の断片を受け取るまでのリトライを行う"""
+        key = self._cache_key(prompt) if self.cache is not None else None
+        if key is not None:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                stream.finish_reason = "STOP"
+                stats.cached = True
+                stats.finish_reason = "STOP"
+                yield cached
+                return
+
+        estimated_tokens = self._estimate_prompt_tokens(prompt)
+        attempt = 0
+        tried: set[int] = set()
+        while True:
+            endpoint = self._route(tried)
+            actual_tokens = None
+            fragments: list[str] = []
+            queued = time.monotonic()
+            await endpoint.rate_limiter.acquire(estimated_tokens)
+            stats.queue_wait += time.monotonic() - queued
+            stats.start_attempt(endpoint.model_name, endpoint.name)
+            notify_request_started()
+            try:
+                response_stream = await endpoint.client.aio.models.generate_content_stream(
+                    model=endpoint.model_name,
+                    contents=prompt,
+                    config=self._generation_config(),
+                )
+                async for chunk in response_stream:
+                    self._check_prompt_blocked(chunk)
+                    finish_reason = self._finish_reason_of(chunk)
+                    if finish_reason:
+                        stream.finish_reason = finish_reason
+                    usage = getattr(chunk, "usage_metadata", None)
+                    stats.add_usage(usage)
+                    total = getattr(usage, "total_token_count", None)
+                    if isinstance(total, int):
+                        actual_tokens = total
+
+                    text = chunk.text
+                    if text:
+                        fragments.append(text)
+                        yield text
+
+                if not fragments:
+                    if stream.finish_reason in BLOCKED_FINISH_REASONS:
+                        raise ContentBlockedError(f"応答がブロックされました: {stream.finish_reason}")
                     raise ValueError("APIからのレスポンスが空です")
-                    
+
+                stats.end_attempt(finish_reason=stream.finish_reason)
+                self._on_success(endpoint)
+                if key is not None and stream.finish_reason == "STOP":
+                    await asyncio.to_thread(self.cache.put, key, "".join(fragments))
+                return
+
             except Exception as e:
-                last_error = e
-                # エラーの詳細を把握しやすくする
-                error_msg = str(e)
-                if attempt < self.MAX_RETRIES - 1:
-                    delay = self.BASE_DELAY * (2 ** attempt)
-                    msg = f"リトライ中... ({attempt + 1}/{self.MAX_RETRIES}) - 原因: {error_msg}"
-                    if progress_callback:
-                        progress_callback(msg)
-                    else:
-                        print(msg)
-                    time.sleep(delay)
-        
-        raise RuntimeError(f"API呼び出しに失敗しました（{self.MAX_RETRIES}回試行）: {last_error}")
+                stats.end_attempt(finish_reason=stream.finish_reason)
+                if fragments:
+                    # 途中まで返した出力はやり直せないため、記録だけして送出する
+                    endpoint.circuit_breaker.record_failure(classify_error(e), e)
+                    raise
+                delay, failover = self._on_failure(e, attempt, endpoint, tried, progress_callback)
+            finally:
+                endpoint.rate_limiter.release(estimated_tokens, actual_tokens)
+
+            if failover:
+                continue
+            await asyncio.sleep(delay)
+            attempt += 1
+            tried.clear()
+
+    def _record_call(self, stats: CallStats) -> None:
+        """スコープのテレメトリへ呼び出し1回分の計測値を記録する"""
+        telemetry = current_telemetry()
+        if telemetry is None:
+            return
+        stats.finished = time.monotonic()
+        if stats.model is None:
+            stats.model = self.model_name
+        telemetry.record(stats)
+
+    async def aclose(self) -> None:
+        """非同期クライアントのコネクションプールとキャッシュを解放する"""
+        for endpoint in self.endpoints:
+            await endpoint.client.aio.aclose()
+        if self.cache is not None:
+            self.cache.close()
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+LLMStream: ストリーミング応答の共通の受け口
+
+SDK に依存しないため、LLM を呼び出さないコマンドからも google.genai を読み込まずに参照できる。
+"""
+from typing import AsyncIterator, Callable
+
+
+class LLMStream:
+    """
+    ストリーミング応答
+
+    async for でテキスト断片を到着順に受け取る。finish_reason は終了理由を含む
+    断片が届いた時点で更新されるため、全文を受け取る前に打ち切り（MAX_TOKENS）を検知できる。
+    """
+
+    def __init__(self, fragment_source: Callable[["LLMStream"], AsyncIterator[str]]):
+        """
+        Args:
+            fragment_source: この LLMStream を受け取り、テキスト断片の非同期イテレータを返す関数。
+                             断片を返しながら finish_reason を更新する。
+        """
+        self._fragment_source = fragment_source
+        self.finish_reason: str | None = None
+
+    @property
+    def truncated(self) -> bool:
+        """出力トークン上限で打ち切られたかどうか"""
+        return self.finish_reason == "MAX_TOKENS"
+
+    async def __aiter__(self):
+        async for fragment in self._fragment_source(self):
+            yield fragment
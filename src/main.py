@@ -1,85 +1,175 @@
 # -*- coding: utf-8 -*-
 """
 p2workflowy - 英語論文処理プログラム
+
+サブコマンド:
+  run      論文を処理する（要約 -> 構造化 -> 翻訳）。サブコマンドを省略した場合も run
+  serve    常駐ジョブサーバーとして起動する
+  convert  Markdown を Workflowy 形式に変換する（ローカルのみ）
+  split    構造化 Markdown の翻訳チャンク計画を表示する（ローカルのみ）
+  clean    構造化 Markdown から不要なセクションを削除する（ローカルのみ）
+
+LLM を使わないサブコマンドを速く起動できるよう、google.genai・httpx などの重いモジュールは
+LLM やサーバーが必要になった時点で読み込む。
 """
 import sys
+import glob
 import asyncio
 import argparse
-import json
-import re
-from typing import List, Dict, Any, cast
+from typing import TYPE_CHECKING
 from pathlib import Path
-from dotenv import load_dotenv
-
-# .envファイルを読み込む
-load_dotenv()
+from contextlib import contextmanager
 
 from .skills import PaperProcessorSkills
+from .llm_backends import LLMBackend, RecordingBackend, ReplayBackend, SyntheticLatency
 from .utils import Utils
-from .constants import EXCLUDE_SECTION_KEYWORDS
+from .markdown_index import MarkdownIndex
+from .glossary import GlossaryIndex
+from .translation_memory import TranslationMemory
+from .retry_policy import deadline_scope
+from .telemetry import Telemetry, call_context
+from .progress import (
+    ProgressBus, ProgressCallback, TTYProgressSink, LineProgressSink, JSONLProgressSink, CallbackProgressSink,
+    PhaseStarted, PhaseFinished, Notice, progress_scope, emit, format_status, format_duration
+)
+from .run_manifest import RunManifest
+from .incremental import patch_structured_text
+from .constants import (
+    EXCLUDE_SECTION_KEYWORDS, BATCH_DOCUMENT_CONCURRENCY, SERVER_ADDRESS, SERVER_MAX_QUEUE,
+    TRANSLATION_MEMORY_ENABLED, TRANSLATION_MEMORY_PATH
+)
 
+if TYPE_CHECKING:
+    from .server import Job
 
-def print_progress(message: str, percentage: int | None = None) -> None:
-    """進捗を表示する"""
-    if percentage is not None:
-        # :<80 で既存の長いメッセージを空白で上書きクリアする
-        print(f"\r[{percentage:3d}%] {message:<80}", end="", flush=True)
-    else:
-        print(f"\r{message:<80}")
+COMMANDS = ("run", "serve", "convert", "split", "clean")
+
+
+def default_progress_sinks() -> list:
+    """端末ならプログレスバー、それ以外（リダイレクト・ログ）なら1イベント1行"""
+    return [TTYProgressSink() if sys.stdout.isatty() else LineProgressSink()]
+
+
+@contextmanager
+def pipeline_phase(telemetry: Telemetry, name: str, description: str):
+    """テレメトリのフェーズを計測し、開始・終了を進捗イベントとして送る"""
+    with telemetry.phase(name):
+        emit(PhaseStarted(name, description))
+        yield
+        emit(PhaseFinished(name))
 
 
-async def run_pipeline(input_file: Path, skills: PaperProcessorSkills, glossary_text: str):
+async def run_pipeline(input_file: Path, skills: PaperProcessorSkills, glossary: str | GlossaryIndex, fresh: bool = False, incremental: bool = False,
+                       pipelined: bool = False, progress: ProgressCallback | None = None) -> Path:
     """
     標準的な論文処理パイプライン (要約 -> 構造化 -> 翻訳)
+
+    途中結果は <入力名>_run/ に保存し、再実行時は完了済みのフェーズ・チャンクを飛ばす。
+    fresh=True の場合は保存済みの途中結果を破棄して最初から実行する。
+    incremental=True の場合、入力が前回から修正されていれば前回のレジュメを再利用し、
+    原文の差分を前回の構造化結果へ反映して Phase 2 を省略する（翻訳は変更のあったチャンクのみ）。
+    pipelined=True の場合、構造化の H2 セクションが閉じるたびに翻訳を始め、Phase 2 と Phase 3 を重ねる。
+    progress は進捗イベントの送り先（ProgressBus など）。省略時は標準出力に表示する。
+    成果物（Workflowy 形式のテキスト）のパスを返す。
     """
+    if progress is None:
+        progress = ProgressBus(*default_progress_sinks())
+    with progress_scope(progress):
+        return await _run_pipeline(input_file, skills, glossary, fresh, incremental, pipelined)
+
+
+async def _run_pipeline(input_file: Path, skills: PaperProcessorSkills, glossary: str | GlossaryIndex, fresh: bool, incremental: bool,
+                        pipelined: bool) -> Path:
     output_final = input_file.parent / f"{input_file.stem}_output.txt"
     output_structured = input_file.parent / f"{input_file.stem}_structured_eng.md"
+    output_telemetry = input_file.parent / f"{input_file.stem}_telemetry.jsonl"
 
     raw_text = Utils.read_text_file(input_file)
 
+    # LLM 呼び出しごとの計測値を JSONL に記録し、最後に実行レポートを表示する
+    telemetry = Telemetry(output_telemetry)
+
+    # 中断した実行の再開用マニフェスト
+    manifest = RunManifest.for_input(input_file, raw_text)
+    if fresh:
+        manifest.clear()
+    previous_input = manifest.previous_input() if incremental else None
+
     # Phase 1: Semantic Mapping (レジュメ生成)
-    print_progress("Phase 1: 原文から意味的な構造（レジュメ）を把握中...", 10)
-    resume_text = await skills.generate_resume(
-        raw_text,
-        progress_callback=lambda msg: print_progress(f"Phase 1: {msg}", 10)
-    )
-    print_progress("Phase 1: レジュメ生成完了", 30)
+    # プロンプトやモデルを変えた場合は保存済みの結果を使わない
+    resume_key = skills.checkpoint_key("resume")
+    resume_text = manifest.load_phase("resume", resume_key)
+    if resume_text is None and previous_input is not None:
+        # 小さな修正で論文の骨子は変わらないため、前回のレジュメを文脈として使う
+        resume_text = manifest.previous_phase("resume", resume_key)
+        if resume_text is not None:
+            manifest.save_phase("resume", resume_text, resume_key)
+    if resume_text is not None:
+        emit(Notice("Phase 1: 前回のレジュメを再利用します"))
+    else:
+        with pipeline_phase(telemetry, "resume", "Phase 1: 原文から意味的な構造（レジュメ）を把握中..."):
+            resume_text = await skills.generate_resume(raw_text)
+        manifest.save_phase("resume", resume_text, resume_key)
 
     # Phase 2: Anchored Structuring (構造化) - 以前の状態に戻し一括処理（あるいは再考）
-    print_progress("Phase 2: レジュメをガイドにして原文の構造を復元中...", 30)
     structure_hint = Utils.extract_structure_from_resume(resume_text)
-    structured_md = await skills.structure_text_with_hint(
-        raw_text,
-        structure_hint,
-        progress_callback=lambda msg: print_progress(f"Phase 2: {msg}", 30),
-        enable_chunking=False # 一括処理に戻す
-    )
-    Utils.write_text_file(output_structured, structured_md)
-    print_progress("Phase 2: 構造化完了", 50)
+    structured_key = skills.checkpoint_key("structured", structure_hint, "")
+    structured_md = manifest.load_phase("structured", structured_key)
+    if structured_md is None and previous_input is not None:
+        previous_structured = manifest.previous_phase("structured", structured_key)
+        if previous_structured is not None:
+            structured_md = patch_structured_text(previous_input, raw_text, previous_structured)
+            if structured_md is not None:
+                manifest.save_phase("structured", structured_md, structured_key)
+            else:
+                emit(Notice("Phase 2: 原文の差分を前回の構造化結果へ反映できないため、構造化をやり直します"))
+    translated_text = None
+    if structured_md is not None:
+        Utils.write_text_file(output_structured, structured_md)
+        emit(Notice("Phase 2: 前回の構造化結果を再利用します"))
+    elif pipelined:
+        # Phase 2 + 3 をパイプラインで実行: 構造化の H2 セクションが閉じるたびに翻訳へ投入する
+        with pipeline_phase(telemetry, "structuring+translation", "Phase 2+3: 構造化しながら、完成したセクションから順に翻訳中..."):
+            structured_md, translated_text = await skills.structure_and_translate(
+                raw_text,
+                structure_hint,
+                glossary,
+                summary_context=resume_text,
+                exclude_keywords=EXCLUDE_SECTION_KEYWORDS,
+                output_path=output_structured,
+                checkpoint=manifest,
+                enable_chunking=skills.structuring_chunking
+            )
+    else:
+        with pipeline_phase(telemetry, "structuring", "Phase 2: レジュメをガイドにして原文の構造を復元中..."):
+            structured_md = await skills.structure_text_with_hint(
+                raw_text,
+                structure_hint,
+                enable_chunking=skills.structuring_chunking, # 既定は一括処理（--chunked-structuring で並列構造化）
+                output_path=output_structured # ストリーミングで中間ファイルへ逐次追記
+            )
+        manifest.save_phase("structured", structured_md, structured_key)
 
     # 不要なセクションを物理的に削除 (References 等)
     structured_md = Utils.remove_unwanted_sections(structured_md, EXCLUDE_SECTION_KEYWORDS)
 
     # Phase 3: Contextual Translation (並列翻訳)
-    print_progress("Phase 3: 文脈を考慮した並列翻訳を実施中...", 50)
-    translated_text = await skills.translate_academic(
-        structured_md,
-        glossary_text,
-        summary_context=resume_text,
-        progress_callback=lambda msg: print_progress(f"Phase 3: {msg}", 50)
-    )
-    print_progress("Phase 3: 翻訳完了", 90)
+    if translated_text is None:
+        with pipeline_phase(telemetry, "translation", "Phase 3: 文脈を考慮した並列翻訳を実施中..."):
+            translated_text = await skills.translate_academic(
+                structured_md,
+                glossary,
+                summary_context=resume_text,
+                checkpoint=manifest
+            )
 
     # Phase 4: Assembly (結合)
-    print_progress("Phase 4: 成果物を統合中...", 90)
+    emit(PhaseStarted("assembly", "Phase 4: 成果物を統合中..."))
     resume_workflowy = Utils.markdown_to_workflowy(resume_text)
     resume_section = "  - レジュメ (Resume)\n" + "\n".join(["    " + line for line in resume_workflowy.splitlines()])
 
     # タイトル抽出
-    eng_lines = structured_md.splitlines()
-    title = input_file.stem
-    if eng_lines and eng_lines[0].strip().startswith('# '):
-        title = eng_lines[0].strip().replace('# ', '').strip()
+    title = MarkdownIndex(structured_md).title() or input_file.stem
 
     # 翻訳結果の処理
     lines = translated_text.splitlines()
@@ -92,30 +182,359 @@ async def run_pipeline(input_file: Path, skills: PaperProcessorSkills, glossary_
     final_content = f"- {title}\n{resume_section}\n{translation_section}"
     Utils.write_text_file(output_final, final_content)
     
-    print_progress("Phase 4: 処理完了!", 100)
+    emit(PhaseFinished("assembly", "Phase 4: 処理完了!"))
     print(f"\n成果物: {output_final}")
+    print(telemetry.format_report())
+    return output_final
 
 
-async def main():
-    """メインエントリーポイント"""
-    project_dir = Path(__file__).parent.parent
-    glossary_file = project_dir / "glossary.csv"
-    
+INPUT_SUFFIXES = (".txt", ".md")
+GENERATED_SUFFIXES = ("_output.txt", "_structured_eng.md", "_telemetry.jsonl")
+
+
+def is_generated(path: Path) -> bool:
+    """このツール自身の成果物（_output.txt など）や、中間結果の保存先 <入力名>_run/ 以下のファイルか"""
+    if path.name.endswith(GENERATED_SUFFIXES):
+        return True
+    return any(parent.name.endswith("_run") and (parent / "manifest.json").exists() for parent in path.parents)
+
+
+def collect_inputs(spec: str) -> list[Path]:
+    """
+    バッチ処理の入力を列挙する。ディレクトリの場合は直下のファイル、それ以外はグロブパターンとして展開し、
+    どちらも .txt / .md のうちこのツール自身の成果物でないものに絞る。
+    """
+    path = Path(spec)
+    if path.is_dir():
+        candidates = list(path.iterdir())
+    else:
+        candidates = [Path(p) for p in glob.glob(spec)]
+    return sorted(
+        p for p in candidates
+        if p.is_file() and p.suffix in INPUT_SUFFIXES and not is_generated(p)
+    )
+
+
+def is_batch_input(spec: str) -> bool:
+    """ディレクトリまたはグロブパターンならバッチ処理"""
+    return Path(spec).is_dir() or glob.has_magic(spec)
+
+
+async def run_batch(input_files: list[Path], skills: PaperProcessorSkills, glossary: str | GlossaryIndex,
+                    max_documents: int = BATCH_DOCUMENT_CONCURRENCY, fresh: bool = False, incremental: bool = False,
+                    pipelined: bool = False, progress: ProgressCallback | None = None) -> dict[Path, BaseException | None]:
+    """
+    複数の文書を1つのイベントループで並行処理する
+
+    すべての文書が同じ LLM バックエンド（共有レートリミッタ）を使うため、ある文書の Phase 1 と
+    別の文書の Phase 3 が重なってクォータを使い切る。成果物は文書ごとに完了した時点で書き出される。
+    1件の失敗で他の文書は止めない。
+
+    Args:
+        max_documents: 同時に処理する文書数の上限（全文書の Phase 1 が一斉に始まって翻訳が後回しになるのを防ぐ）
+        progress: 全文書で共有する進捗イベントの送り先。イベントの document に文書名が入るため、
+                  スループットと残り時間はバッチ全体で集計される。省略時は1イベント1行で表示する
+
+    Returns:
+        文書ごとの結果（成功は None、失敗は例外）
+    """
+    semaphore = asyncio.Semaphore(max_documents)
+    bus = progress or ProgressBus(LineProgressSink())
+    total = len(input_files)
+    finished = 0
+
+    async def process(input_file: Path) -> BaseException | None:
+        nonlocal finished
+        name = input_file.name
+
+        async with semaphore:
+            with progress_scope(bus), call_context(document=name):
+                try:
+                    await run_pipeline(input_file, skills, glossary, fresh=fresh, incremental=incremental, pipelined=pipelined, progress=bus)
+                    error = None
+                except Exception as e:
+                    emit(Notice(f"エラー: {e}", warning=True))
+                    error = e
+        finished += 1
+        status = format_status(bus.status()) if isinstance(bus, ProgressBus) else ""
+        print(f"=== {finished}/{total} 文書完了: {name}{' (失敗)' if error else ''} ===" + (f" ({status})" if status else ""))
+        return error
+
+    errors = await asyncio.gather(*(process(f) for f in input_files))
+    results = dict(zip(input_files, errors))
+    failed = [f for f, e in results.items() if e is not None]
+    print(f"\nバッチ処理完了: 成功 {total - len(failed)} 件 / 失敗 {len(failed)} 件")
+    for f in failed:
+        print(f"  失敗: {f} ({results[f]})")
+    return results
+
+
+async def serve(address: str, skills: PaperProcessorSkills, glossary_file: Path,
+                workers: int = BATCH_DOCUMENT_CONCURRENCY, max_queue: int = SERVER_MAX_QUEUE) -> None:
+    """
+    常駐ジョブサーバーを起動する（serve モード）
+
+    PaperProcessorSkills と LLM クライアント（接続・レートリミッタ・キャッシュ）を保持したまま、
+    ローカルの JSON API で投入されたジョブを run_pipeline で処理する。用語集はジョブごとに読み直す（更新時刻が同じなら索引を再利用する）。
+    """
+    from .server import JobServer
+
+    async def run_job(job: "Job") -> Path:
+        glossary = GlossaryIndex.load(glossary_file)
+        return await run_pipeline(job.input_file, skills, glossary, fresh=job.fresh, incremental=job.incremental,
+                                  pipelined=job.pipelined, progress=ProgressBus(CallbackProgressSink(job.handle)))
+
+    server = JobServer(run_job, max_queue=max_queue, workers=workers)
+    await server.start(address)
+    print(f"ジョブサーバーを起動しました: {address}（同時 {workers} 件、待ち {max_queue} 件まで）")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def submit_to_server(address: str, input_files: list[Path], fresh: bool = False, incremental: bool = False,
+                     pipelined: bool = False) -> bool:
+    """起動中のジョブサーバーにファイルを投入し、すべて終わるまで進捗を表示する。すべて成功なら True"""
+    from .server import JobClient
+
+    client = JobClient(address)
+    try:
+        jobs = {client.submit(f, fresh=fresh, incremental=incremental, pipelined=pipelined)["id"]: f for f in input_files}
+        print(f"{len(jobs)} 件のジョブを投入しました: {address}")
+        failed = 0
+        for job_id, input_file in jobs.items():
+            def show(status: dict, name: str = input_file.name) -> None:
+                eta = f" (残り約 {format_duration(status['eta'])})" if status.get("eta") else ""
+                print(f"\r[{name} {status['percentage'] or 0:3d}%] {status['message'] + eta:<80}", end="", flush=True)
+
+            status = client.wait(job_id, on_status=show)
+            if status["status"] == "done":
+                print(f"\n成果物: {status['output_file']}")
+            else:
+                failed += 1
+                print(f"\nエラー: {input_file} ({status['error']})")
+        return failed == 0
+    finally:
+        client.close()
+
+
+def create_backend(args: argparse.Namespace) -> LLMBackend:
+    """コマンドライン引数に応じて LLM バックエンドを作成する"""
+    if args.replay:
+        return ReplayBackend(args.replay, SyntheticLatency(args.replay_latency))
+    from dotenv import load_dotenv
+    from .llm_processor import LLMProcessor
+
+    # .envファイルを読み込む
+    load_dotenv()
+    backend: LLMBackend = LLMProcessor()
+    if args.record:
+        backend = RecordingBackend(backend, args.record)
+    return backend
+
+
+def create_skills(args: argparse.Namespace) -> PaperProcessorSkills:
+    """コマンドライン引数に応じて PaperProcessorSkills を作成する"""
+    skills = PaperProcessorSkills(create_backend(args))
+    if args.hedge_percentile is not None:
+        skills.hedge_percentile = args.hedge_percentile
+    if args.chunked_structuring:
+        skills.structuring_chunking = True
+    # 再生（--replay）では記録時と同じプロンプトで呼び出すため、翻訳メモリを使わない
+    if TRANSLATION_MEMORY_ENABLED and not args.no_memory and not args.replay:
+        skills.translation_memory = TranslationMemory(TRANSLATION_MEMORY_PATH)
+    return skills
+
+
+def add_llm_arguments(parser: argparse.ArgumentParser) -> None:
+    """LLM を使うサブコマンド（run / serve）に共通の引数"""
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=BATCH_DOCUMENT_CONCURRENCY,
+        metavar="N",
+        help=f"同時に処理する文書数（バッチ処理・サーバーのワーカー数。既定: {BATCH_DOCUMENT_CONCURRENCY}）"
+    )
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        metavar="P",
+        help="Phase 3 で観測レイテンシの P パーセンタイルを超えたチャンクに重複リクエストを送る（例: 90）"
+    )
+    parser.add_argument(
+        "--chunked-structuring",
+        action="store_true",
+        help="長い原文を重なりのある窓に分割して並列に構造化し、継ぎ目を縫い合わせる"
+    )
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="翻訳メモリ（過去に翻訳した段落の再利用・参考訳）を使わない"
+    )
+    parser.add_argument(
+        "--record",
+        metavar="CASSETTE",
+        help="LLM のプロンプトと応答をカセットファイル (JSON Lines) に記録する"
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="CASSETTE",
+        help="カセットファイルから応答を再生する（API を呼び出さない）"
+    )
+    parser.add_argument(
+        "--replay-latency",
+        choices=SyntheticLatency.KINDS,
+        default="recorded",
+        help="再生時に付与する擬似レイテンシの分布（既定: recorded）"
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="p2workflowy - 英語論文処理（Paper Mode 専用）"
     )
-    parser.add_argument(
+    commands = parser.add_subparsers(dest="command", metavar="{run,serve,convert,split,clean}")
+
+    run = commands.add_parser("run", help="論文を処理する（サブコマンド省略時の既定）")
+    run.add_argument(
         "input_file",
         nargs="?",
-        help="処理対象のファイルパス"
+        help="処理対象のファイルパス。ディレクトリまたはグロブパターン（例: 'papers/*.txt'）を指定するとバッチ処理"
     )
-    parser.add_argument(
+    run.add_argument(
         "--test",
         action="store_true",
         help="テストモード"
     )
-    
-    args = parser.parse_args()
+    run.add_argument(
+        "--deadline",
+        type=float,
+        metavar="SECONDS",
+        help="実行全体の期限（秒）。期限を超えるリトライ待機は行わずに打ち切る"
+    )
+    run.add_argument(
+        "--fresh",
+        action="store_true",
+        help="前回の途中結果（<入力名>_run/）を破棄して最初から実行する"
+    )
+    run.add_argument(
+        "--incremental",
+        action="store_true",
+        help="修正された入力を差分更新する（前回のレジュメ・構造化結果を再利用し、変更のあったチャンクのみ翻訳）"
+    )
+    run.add_argument(
+        "--pipelined",
+        action="store_true",
+        help="構造化の完了を待たず、完成したセクションから順に翻訳する（Phase 2 と Phase 3 を重ねる）"
+    )
+    run.add_argument(
+        "--plan",
+        action="store_true",
+        help="API を呼ばずに、フェーズごとの呼び出し数・トークン数・推定費用・所要時間を見積もって表示する"
+    )
+    run.add_argument(
+        "--progress-jsonl",
+        metavar="FILE",
+        help="進捗イベント（フェーズ・チャンクの開始/完了/リトライ・スループット・残り時間）を JSON Lines で追記する"
+    )
+    run.add_argument(
+        "--server",
+        metavar="ADDRESS",
+        help="起動中のジョブサーバーに入力を投入して処理させる（ローカルで LLM を呼び出さない）"
+    )
+    add_llm_arguments(run)
+
+    serve_parser = commands.add_parser("serve", help="常駐ジョブサーバーとして起動する")
+    serve_parser.add_argument(
+        "address",
+        nargs="?",
+        default=SERVER_ADDRESS,
+        help=f"待ち受けるアドレス（既定: {SERVER_ADDRESS}。Unix ソケットは unix:/path/to/socket）"
+    )
+    add_llm_arguments(serve_parser)
+
+    for name, help_text in (
+        ("convert", "Markdown を Workflowy 形式に変換する"),
+        ("split", "構造化 Markdown の翻訳チャンク計画を表示する（不要セクションの削除後）"),
+        ("clean", "構造化 Markdown から不要なセクション（References 等）を削除する"),
+    ):
+        local = commands.add_parser(name, help=help_text)
+        local.add_argument("input_file", help="入力の Markdown ファイル")
+        if name != "split":
+            local.add_argument("-o", "--output", metavar="FILE", help="出力先（省略時は標準出力）")
+    return parser
+
+
+def write_output(text: str, output: str | None) -> None:
+    if output:
+        Utils.write_text_file(Path(output), text)
+    else:
+        sys.stdout.write(text if text.endswith("\n") else text + "\n")
+
+
+def show_chunk_plan(markdown: str) -> None:
+    """不要セクションを削除した構造化 Markdown を、Phase 3 と同じ規則で翻訳チャンクに分けて表示する"""
+    skills = PaperProcessorSkills()
+    chunks, packing = skills.plan_chunks(Utils.remove_unwanted_sections(markdown, EXCLUDE_SECTION_KEYWORDS))
+    total = 0
+    print(f"{'#':>4}  {'tokens':>8}  {'chars':>8}  heading")
+    for i, chunk in enumerate(chunks):
+        tokens = skills.token_estimator.estimate(chunk)
+        total += tokens
+        heading = next((line.strip() for line in chunk.splitlines() if line.strip().startswith("#")), "(本文のみ)")
+        print(f"{i:>4}  {tokens:>8,}  {len(chunk):>8,}  {heading[:60]}")
+    print(f"チャンク数: {len(chunks)}  推定入力トークン: {total:,}")
+    if packing:
+        print(packing)
+
+
+def show_run_plan(input_files: list[Path], glossary: str | GlossaryIndex, args: argparse.Namespace) -> None:
+    """入力ごとの実行計画（呼び出し数・トークン数・推定費用・所要時間）を表示する。LLM は呼び出さない"""
+    from .planner import plan_document
+
+    skills = PaperProcessorSkills()
+    chunking = args.chunked_structuring or skills.structuring_chunking
+    plans = [
+        plan_document(f.name, Utils.read_text_file(f), skills, glossary, structuring_chunking=chunking, pipelined=args.pipelined)
+        for f in input_files
+    ]
+    for plan in plans:
+        print(plan.format_report())
+    if len(plans) > 1:
+        print(f"合計: {sum(p.calls for p in plans)} 回 / 入力 {sum(p.input_tokens for p in plans):,} トークン"
+              f" / 出力 {sum(p.output_tokens for p in plans):,} トークン / 推定費用 ${sum(p.cost for p in plans):.4f}"
+              "（所要時間は文書ごとの見積もり。バッチ処理ではクォータを共有して重なる）")
+
+
+async def main(argv: list[str] | None = None):
+    """メインエントリーポイント"""
+    project_dir = Path(__file__).parent.parent
+    glossary_file = project_dir / "glossary.csv"
+
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # 従来どおり「main.py <ファイル>」のようにサブコマンドを省略した場合は run
+    if not argv or (argv[0] not in COMMANDS and argv[0] not in ("-h", "--help")):
+        argv.insert(0, "run")
+    args = build_parser().parse_args(argv)
+
+    if args.command in ("convert", "split", "clean"):
+        markdown = Utils.read_text_file(Path(args.input_file))
+        if args.command == "convert":
+            write_output(Utils.markdown_to_workflowy(markdown), args.output)
+        elif args.command == "clean":
+            write_output(Utils.remove_unwanted_sections(markdown, EXCLUDE_SECTION_KEYWORDS), args.output)
+        else:
+            show_chunk_plan(markdown)
+        return
+
+    if args.command == "serve":
+        skills = create_skills(args)
+        try:
+            await serve(args.address, skills, glossary_file, workers=args.jobs)
+        finally:
+            await skills.aclose()
+        return
     
     if not args.input_file:
         print("\n" + "=" * 60)
@@ -125,16 +544,46 @@ async def main():
     else:
         input_path_str = args.input_file
     
-    input_file = Path(input_path_str.strip("'\""))
-    if not input_file.exists():
-        print(f"エラー: ファイルが見つかりません: {input_file}")
-        return
+    input_spec = input_path_str.strip("'\"")
+    if is_batch_input(input_spec):
+        input_files = collect_inputs(input_spec)
+        if not input_files:
+            print(f"エラー: 処理対象のファイルが見つかりません: {input_spec}")
+            return
+    else:
+        input_files = None
+        input_file = Path(input_spec)
+        if not input_file.exists():
+            print(f"エラー: ファイルが見つかりません: {input_file}")
+            return
 
-    glossary_text = Utils.load_glossary(glossary_file) if glossary_file.exists() else ""
+    if args.server:
+        ok = submit_to_server(args.server, input_files if input_files is not None else [input_file],
+                              fresh=args.fresh, incremental=args.incremental, pipelined=args.pipelined)
+        sys.exit(0 if ok else 1)
 
-    print(f"\n処理を開始します...")
-    skills = PaperProcessorSkills()
-    await run_pipeline(input_file, skills, glossary_text)
+    glossary = GlossaryIndex.load(glossary_file)
+
+    if args.plan:
+        show_run_plan(input_files if input_files is not None else [input_file], glossary, args)
+        return
+
+    print("\n処理を開始します...")
+    skills = create_skills(args)
+    sinks = [LineProgressSink()] if input_files is not None else default_progress_sinks()
+    if args.progress_jsonl:
+        sinks.append(JSONLProgressSink(args.progress_jsonl))
+    progress = ProgressBus(*sinks)
+    try:
+        with deadline_scope(args.deadline):
+            if input_files is not None:
+                print(f"バッチ処理: {len(input_files)} 件（同時 {args.jobs} 件）")
+                await run_batch(input_files, skills, glossary, args.jobs, fresh=args.fresh, incremental=args.incremental, pipelined=args.pipelined, progress=progress)
+            else:
+                await run_pipeline(input_file, skills, glossary, fresh=args.fresh, incremental=args.incremental, pipelined=args.pipelined, progress=progress)
+    finally:
+        progress.close()
+        await skills.aclose()
 
 
 if __name__ == "__main__":
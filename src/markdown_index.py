@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Markdown の見出しの索引: 1回の走査で見出しの (レベル, 開始, 終了) のオフセットを求める
+
+チャンク分割・不要セクションの削除・タイトルの抽出は、この索引から元の文字列をスライスして行う。
+レベルごとに split('\\n') と join を繰り返す方法では、書籍サイズの入力を何度も複製してしまう。
+
+見出しの判定は従来の処理に合わせて2種類ある。
+- 厳密な見出し: 行頭が "#" × レベル + " "（_split_by_heading_level の境界）
+- 緩い見出し: 行の前後の空白を除くと "#" で始まる（SectionFilter が判定する候補）
+"""
+import re
+from bisect import bisect_left
+from typing import List, Optional, Protocol
+
+
+class LineFilter(Protocol):
+    def accept(self, line: str) -> bool: ...
+
+
+class Heading:
+    """見出し1つ。start は見出し行の先頭、end は同じかより浅いレベルの次の厳密な見出しの手前（配下を含む範囲）"""
+
+    __slots__ = ("level", "start", "line_end", "end", "strict")
+
+    def __init__(self, level: int, start: int, line_end: int, strict: bool):
+        self.level = level
+        self.start = start
+        self.line_end = line_end  # 見出し行の末尾（改行の手前）
+        self.end = -1
+        self.strict = strict
+
+    def __repr__(self) -> str:
+        return f"Heading(level={self.level}, start={self.start}, end={self.end}, strict={self.strict})"
+
+
+class MarkdownIndex:
+    """Markdown の見出しの索引（元の文字列は複製せずに保持する）"""
+
+    # 最初の空白以外の文字が "#" の行（改行は空白に含めない）。
+    # re.MULTILINE の "^" はすべての位置で試されて遅いため、改行から探し、先頭行は別に判定する
+    _CANDIDATE_RE = re.compile(r"\n[^\S\n]*#")
+    _FIRST_LINE_RE = re.compile(r"[^\S\n]*#")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.headings: List[Heading] = []
+        # 厳密な見出しの開始オフセット（レベルごと、昇順）
+        self._strict_starts: dict[int, List[int]] = {}
+
+        stack: List[Heading] = []
+        starts = [m.start() + 1 for m in self._CANDIDATE_RE.finditer(text)]
+        if self._FIRST_LINE_RE.match(text):
+            starts.insert(0, 0)
+        for start in starts:
+            line_end = text.find("\n", start)
+            if line_end == -1:
+                line_end = len(text)
+            hashes = 0
+            while start + hashes < line_end and text[start + hashes] == "#":
+                hashes += 1
+            strict = hashes > 0 and start + hashes < line_end and text[start + hashes] == " "
+            heading = Heading(hashes if strict else 0, start, line_end, strict)
+            self.headings.append(heading)
+            if not strict:
+                continue
+            self._strict_starts.setdefault(hashes, []).append(start)
+            # 木構造: 同じかより浅いレベルの見出しが来たら、それまでの見出しの範囲を閉じる
+            while stack and stack[-1].level >= hashes:
+                stack.pop().end = self._before_line(start)
+            stack.append(heading)
+        for heading in stack:
+            heading.end = len(text)
+        for heading in self.headings:
+            if heading.end < 0:
+                heading.end = heading.line_end
+
+    def _before_line(self, start: int) -> int:
+        """行の先頭 start の直前の改行を除いた位置（"\\n".join で区切られていた部分の終わり）"""
+        return start - 1 if start > 0 else 0
+
+    def line(self, heading: Heading) -> str:
+        return self.text[heading.start:heading.line_end]
+
+    def strict_headings(self, level: int, start: int = 0, end: Optional[int] = None) -> List[int]:
+        """[start, end) にある、レベル level の厳密な見出しの開始オフセット"""
+        starts = self._strict_starts.get(level, [])
+        end = len(self.text) if end is None else end
+        return starts[bisect_left(starts, start):bisect_left(starts, end)]
+
+    def split_ranges(self, level: int, start: int = 0, end: Optional[int] = None) -> List[tuple[int, int]]:
+        """
+        [start, end) をレベル level の厳密な見出しの手前で区切った範囲
+
+        _split_by_heading_level と同じ区切り方（見出しの直前の改行は区切りとして除く。
+        範囲の先頭が見出しなら空の先頭部分は作らない）。
+        """
+        end = len(self.text) if end is None else end
+        ranges = []
+        current = start
+        for heading_start in self.strict_headings(level, start, end):
+            if heading_start == start:
+                continue
+            ranges.append((current, heading_start - 1))
+            current = heading_start
+        ranges.append((current, end))
+        return ranges
+
+    def split(self, level: int, start: int = 0, end: Optional[int] = None) -> List[str]:
+        return [self.text[a:b] for a, b in self.split_ranges(level, start, end)]
+
+    def filter_sections(self, line_filter: LineFilter) -> str:
+        """
+        line_filter（SectionFilter）が除く行を取り除いた文字列（前後の空白を除く）
+
+        行単位の判定の状態は見出しの行でしか変わらないため、見出しの行だけを判定し、
+        見出しから次の見出しの手前までをまとめて残すか除くかを決める。
+        """
+        text = self.text
+        # 残す範囲（隣り合う範囲はつなげる）
+        ranges: List[List[int]] = []
+        region_start, keep = 0, True
+        for heading in self.headings + [None]:
+            region_end = heading.start if heading is not None else len(text)
+            if keep and region_end > region_start:
+                if ranges and ranges[-1][1] == region_start:
+                    ranges[-1][1] = region_end
+                else:
+                    ranges.append([region_start, region_end])
+            if heading is not None:
+                region_start = heading.start
+                keep = line_filter.accept(self.line(heading))
+        # 前後の空白は複製する前にオフセットで除く
+        while ranges:
+            a, b = ranges[0]
+            while a < b and text[a].isspace():
+                a += 1
+            if a < b:
+                ranges[0][0] = a
+                break
+            ranges.pop(0)
+        while ranges:
+            a, b = ranges[-1]
+            while b > a and text[b - 1].isspace():
+                b -= 1
+            if b > a:
+                ranges[-1][1] = b
+                break
+            ranges.pop()
+        if len(ranges) == 1:
+            return text[ranges[0][0]:ranges[0][1]]
+        return "".join(text[a:b] for a, b in ranges)
+
+    def title(self) -> Optional[str]:
+        """先頭行が "# " で始まる見出しならその見出しの文字列"""
+        if not self.headings or self.headings[0].start != 0:
+            return None
+        first_line = self.line(self.headings[0]).strip()
+        if not first_line.startswith("# "):
+            return None
+        return first_line.replace("# ", "").strip()
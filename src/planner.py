@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+実行計画（--plan）: API を呼ばずに、呼び出し数・トークン数・推定費用・所要時間を見積もる
+
+ローカルの処理（読み込み・不要セクションの削除・チャンク分割）だけで見積もる。
+構造化後の Markdown はまだないため、原文を PaperProcessorSkills.plan_chunks で分けた結果を翻訳チャンクの代わりに使う。
+
+- 入力トークン: プロンプトのテンプレート + 本文 + 毎回付与するレジュメ（summary_context。SELECT_RESUME_CONTEXT なら論旨と1セクション分）・チャンクに現れる用語集の行
+- 出力トークン: 本文 × 出力比率（TRANSLATION_OUTPUT_RATIO / STRUCTURING_OUTPUT_RATIO）、レジュメは PLAN_RESUME_OUTPUT_TOKENS
+- 所要時間: 1回の呼び出しを「固定のオーバーヘッド + 出力トークン ÷ 生成速度」とみなし、
+  RateLimiter と同じ規則（同時実行ウィンドウの AIMD 拡大・RPM / TPM のトークンバケット）で呼び出しを並べて求める
+"""
+import copy
+import heapq
+from typing import List, Optional, TYPE_CHECKING
+
+from .constants import (
+    SUMMARY_PROMPT, STRUCTURING_WITH_HINT_PROMPT, TRANSLATION_PROMPT, EXCLUDE_SECTION_KEYWORDS,
+    STRUCTURING_OUTPUT_RATIO, TRANSLATION_OUTPUT_RATIO, MAX_OUTPUT_TOKENS, OUTPUT_TOKEN_SAFETY_RATIO,
+    LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_INITIAL_CONCURRENCY, LLM_MAX_CONCURRENCY,
+    LLM_INPUT_PRICE_PER_MILLION, LLM_OUTPUT_PRICE_PER_MILLION, TRANSLATION_LONGEST_FIRST,
+    PLAN_RESUME_OUTPUT_TOKENS, PLAN_OUTPUT_TOKENS_PER_SECOND, PLAN_CALL_OVERHEAD_SECONDS
+)
+from .scheduling import longest_first
+from .glossary import GlossaryIndex
+from .utils import Utils
+
+if TYPE_CHECKING:
+    from .skills import PaperProcessorSkills
+
+
+class PlannedCall:
+    """見積もった LLM 呼び出し1回"""
+
+    def __init__(self, input_tokens: int, output_tokens: int, release: float = 0.0):
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.release = release          # 投入できるようになる時刻（パイプライン実行で構造化の進み具合に合わせる）
+        self.started = 0.0
+        self.finished = 0.0
+
+    @property
+    def duration(self) -> float:
+        return PLAN_CALL_OVERHEAD_SECONDS + self.output_tokens / PLAN_OUTPUT_TOKENS_PER_SECOND
+
+
+class PhasePlan:
+    """フェーズ1つ分の見積もり"""
+
+    def __init__(self, name: str, calls: List[PlannedCall]):
+        self.name = name
+        self.calls = calls
+        self.started = 0.0
+        self.finished = 0.0
+
+    @property
+    def input_tokens(self) -> int:
+        return sum(c.input_tokens for c in self.calls)
+
+    @property
+    def output_tokens(self) -> int:
+        return sum(c.output_tokens for c in self.calls)
+
+    @property
+    def cost(self) -> float:
+        return estimate_cost(self.input_tokens, self.output_tokens)
+
+    @property
+    def wall(self) -> float:
+        return self.finished - self.started
+
+
+class RunPlan:
+    """1文書の実行計画"""
+
+    def __init__(self, name: str, phases: List[PhasePlan], warnings: Optional[List[str]] = None,
+                 notes: Optional[List[str]] = None):
+        self.name = name
+        self.phases = phases
+        self.warnings = warnings or []
+        self.notes = notes or []
+
+    @property
+    def calls(self) -> int:
+        return sum(len(p.calls) for p in self.phases)
+
+    @property
+    def input_tokens(self) -> int:
+        return sum(p.input_tokens for p in self.phases)
+
+    @property
+    def output_tokens(self) -> int:
+        return sum(p.output_tokens for p in self.phases)
+
+    @property
+    def cost(self) -> float:
+        return sum(p.cost for p in self.phases)
+
+    @property
+    def wall(self) -> float:
+        return max((p.finished for p in self.phases), default=0.0)
+
+    def format_report(self) -> str:
+        """実行レポート（Telemetry.format_report）と同じ列で見積もりを表示する"""
+        row = "{:<24}{:>7}{:>11}{:>11}{:>9}{:>10}"
+        lines = [
+            f"=== 実行計画: {self.name} ===",
+            row.format("phase", "calls", "in_tok", "out_tok", "wall_s", "cost_$"),
+        ]
+        for p in self.phases:
+            lines.append(row.format(p.name, len(p.calls), p.input_tokens, p.output_tokens, f"{p.wall:.0f}", f"{p.cost:.4f}"))
+        lines.append(row.format("total", self.calls, self.input_tokens, self.output_tokens, f"{self.wall:.0f}", f"{self.cost:.4f}"))
+        lines.extend(self.notes)
+        lines.extend(f"注意: {w}" for w in self.warnings)
+        return "\n".join(lines)
+
+
+def estimate_cost(input_tokens: int, output_tokens: int) -> float:
+    """推定費用（ドル）。Telemetry.cost と同じ単価"""
+    return (input_tokens * LLM_INPUT_PRICE_PER_MILLION + output_tokens * LLM_OUTPUT_PRICE_PER_MILLION) / 1_000_000
+
+
+class LimiterModel:
+    """
+    RateLimiter の振る舞いを時刻の計算だけで再現する
+
+    同時実行ウィンドウは initial_concurrency から成功ごとに 1/ウィンドウ ずつ広がる。
+    枠の確保時に RPM を1つ、TPM を入力トークン分消費し、完了時に出力トークン分を精算する（429 は起きないものとする）。
+    フェーズをまたいで同じインスタンスを使うと、ウィンドウの広がりが引き継がれる。
+    """
+
+    def __init__(self, requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+                 initial_concurrency: int = LLM_INITIAL_CONCURRENCY,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self.window = float(min(max(initial_concurrency, 1), max_concurrency))
+        # (容量, 1秒あたりの補充量, 残量, 残量を計算した時刻)
+        self._buckets = {
+            "requests": [float(requests_per_minute), requests_per_minute / 60.0, float(requests_per_minute), 0.0],
+            "tokens": [float(tokens_per_minute), tokens_per_minute / 60.0, float(tokens_per_minute), 0.0],
+        }
+
+    def _level(self, name: str, now: float) -> float:
+        capacity, rate, level, updated = self._buckets[name]
+        return min(capacity, level + (now - updated) * rate)
+
+    def _consume(self, name: str, now: float, amount: float) -> None:
+        bucket = self._buckets[name]
+        bucket[2] = self._level(name, now) - amount
+        bucket[3] = now
+
+    def _ready_at(self, name: str, now: float, amount: float) -> float:
+        capacity, rate, _, _ = self._buckets[name]
+        shortage = min(amount, capacity) - self._level(name, now)
+        return now if shortage <= 0 else now + shortage / rate
+
+    def run(self, calls: List[PlannedCall], start: float, order: Optional[List[int]] = None) -> float:
+        """
+        calls を order の順（release を過ぎたものから）に start 以降で実行し、最後の完了時刻を返す
+
+        各 PlannedCall の started / finished を設定する。
+        """
+        pending = [calls[i] for i in (order if order is not None else range(len(calls)))]
+        running: list[tuple[float, int]] = []  # (完了時刻, 識別番号) のヒープ
+        by_id: dict[int, PlannedCall] = {}
+        now = start
+        finished_at = start
+        while pending or running:
+            released = [c for c in pending if c.release <= now]
+            if released and len(running) < max(1, int(self.window)):
+                call = released[0]
+                ready = max(self._ready_at("requests", now, 1), self._ready_at("tokens", now, call.input_tokens))
+                if ready <= now + 1e-9:
+                    pending.remove(call)
+                    self._consume("requests", now, 1)
+                    self._consume("tokens", now, call.input_tokens)
+                    call.started, call.finished = now, now + call.duration
+                    by_id[id(call)] = call
+                    heapq.heappush(running, (call.finished, id(call)))
+                    continue
+                next_time = ready
+            elif pending and not released:
+                next_time = min(c.release for c in pending)
+            else:
+                next_time = float("inf")
+            if running and running[0][0] <= next_time:
+                now, key = heapq.heappop(running)
+                done = by_id.pop(key)
+                self._consume("tokens", now, done.output_tokens)
+                self.window = min(float(self.max_concurrency), self.window + 1.0 / self.window)
+                finished_at = max(finished_at, now)
+            else:
+                now = max(now, next_time)
+        return finished_at
+
+
+def plan_document(name: str, raw_text: str, skills: "PaperProcessorSkills", glossary_text: "str | GlossaryIndex" = "",
+                  structuring_chunking: bool = False, pipelined: bool = False,
+                  limiter: Optional[LimiterModel] = None) -> RunPlan:
+    """
+    1文書の実行計画を立てる（API は呼ばない）
+
+    Args:
+        skills: チャンク分割とトークン数の推定に使う（LLM クライアントは作成しない）
+        structuring_chunking: --chunked-structuring（窓ごとの並列構造化）
+        pipelined: --pipelined（Phase 2 と Phase 3 を重ねる）
+    """
+    estimate = skills.token_estimator.estimate
+    limiter = limiter or LimiterModel()
+    warnings: List[str] = []
+    raw_tokens = estimate(raw_text)
+    resume_tokens = PLAN_RESUME_OUTPUT_TOKENS
+    output_limit = int(MAX_OUTPUT_TOKENS * OUTPUT_TOKEN_SAFETY_RATIO)
+
+    # Phase 1: レジュメ（原文全体を1回で読む）
+    summary_template = estimate(SUMMARY_PROMPT.format(text="", context_guide=""))
+    resume = PhasePlan("resume", [PlannedCall(summary_template + raw_tokens, resume_tokens)])
+
+    # Phase 2: 構造化（窓ごと、または1回）。ヒントはレジュメから抜き出した構成（レジュメの大きさで上から見積もる）
+    structuring_template = estimate(STRUCTURING_WITH_HINT_PROMPT.format(raw_text="", summary_hint="", context_guide=""))
+    windows = skills.structuring_windows(raw_text) if structuring_chunking else [raw_text]
+    structuring_calls = []
+    for window in windows:
+        window_tokens = raw_tokens if len(windows) == 1 else estimate(window)
+        structuring_calls.append(PlannedCall(
+            structuring_template + resume_tokens + window_tokens, int(window_tokens * STRUCTURING_OUTPUT_RATIO)
+        ))
+    if any(c.output_tokens > output_limit for c in structuring_calls):
+        warnings.append(
+            f"構造化の予想出力が出力上限（{output_limit:,} トークン）を超えるため、途中で打ち切られます。"
+            "--chunked-structuring を指定してください"
+        )
+
+    # Phase 3: 翻訳（原文をチャンク分割した結果で代用）。毎回レジュメと用語集を付与する
+    chunks, packing = skills.plan_chunks(Utils.remove_unwanted_sections(raw_text, EXCLUDE_SECTION_KEYWORDS))
+    notes = [packing] if packing else []
+    overhead = estimate(TRANSLATION_PROMPT.format(summary_content="", chunk_text="", glossary_content="", context_guide=""))
+    context_tokens = resume_tokens
+    if skills.select_resume_context and len(chunks) > 1:
+        # レジュメは論旨（2部分）とチャンク数ぶんのセクションに均等に分かれ、各チャンクには論旨と1セクションが付くとみなす
+        context_tokens = int(resume_tokens * 3 / (2 + len(chunks)))
+    overhead += context_tokens
+    # 用語集は各チャンクに現れる用語の行だけが付く
+    glossary = glossary_text if isinstance(glossary_text, GlossaryIndex) else GlossaryIndex.from_text(glossary_text)
+    chunk_tokens = [estimate(chunk) for chunk in chunks]
+    translation_calls = [
+        PlannedCall(overhead + t + estimate(glossary.for_chunk(chunk)), int(t * TRANSLATION_OUTPUT_RATIO))
+        for chunk, t in zip(chunks, chunk_tokens)
+    ]
+    order = longest_first([c.output_tokens for c in translation_calls]) if TRANSLATION_LONGEST_FIRST else None
+
+    resume.started = 0.0
+    resume.finished = limiter.run(resume.calls, 0.0)
+    if pipelined:
+        # 構造化の出力の進み具合に比例して、各チャンクのセクションが閉じた時点で投入できるとみなす。
+        # 構造化の所要時間は、枠の状態を写したリミッタで構造化だけを流して求める
+        phase = PhasePlan("structuring+translation", structuring_calls + translation_calls)
+        phase.started = resume.finished
+        span = copy.deepcopy(limiter).run(copy.deepcopy(structuring_calls), phase.started) - phase.started
+        total = sum(chunk_tokens) or 1
+        seen = 0
+        for call, tokens in zip(translation_calls, chunk_tokens):
+            seen += tokens
+            call.release = phase.started + span * seen / total
+        # セクションは文書順に閉じるため、翻訳は文書順に投入する（構造化を先に）
+        phase.finished = limiter.run(phase.calls, phase.started)
+        phases = [resume, phase]
+    else:
+        structuring = PhasePlan("structuring", structuring_calls)
+        structuring.started = resume.finished
+        structuring.finished = limiter.run(structuring_calls, structuring.started)
+        translation = PhasePlan("translation", translation_calls)
+        translation.started = structuring.finished
+        translation.finished = limiter.run(translation_calls, translation.started, order)
+        phases = [resume, structuring, translation]
+    return RunPlan(name, phases, warnings, notes)
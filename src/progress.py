@@ -0,0 +1,398 @@
+# -*- coding: utf-8 -*-
+"""
+進捗イベント: パイプラインの進捗を型付きのイベントとして通知し、スループットから残り時間を見積もる
+
+- ProgressEvent とその派生クラス: フェーズ開始・終了、チャンクの投入・開始・完了・リトライ、出力トークン、お知らせ
+- ProgressTracker: イベントから処理待ち・処理中・完了のチャンク数と、直近の出力トークン/秒による残り時間を求める
+- ProgressBus: イベントを ProgressTracker に反映してから各シンクへ配る
+- シンク: TTYProgressSink（1行のプログレスバー）、LineProgressSink（1イベント1行）、
+  JSONLProgressSink（JSON Lines）、CallbackProgressSink（任意の関数）
+- progress_scope / emit: 通知先を呼び出し側から引き継ぐ（telemetry_scope と同様に asyncio タスクへ引き継がれる）
+
+イベントの phase / chunk_id / document は、指定しなければ call_context の値が入る。
+"""
+import sys
+import json
+import time
+import threading
+import contextvars
+from collections import deque
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, TextIO
+
+from .telemetry import current_call_context
+
+# 出力トークン/秒を求める観測期間（秒）
+RATE_WINDOW_SECONDS = 60.0
+
+
+class ProgressEvent:
+    """進捗イベントの基底クラス"""
+
+    kind = "event"
+
+    def __init__(self, phase: str | None = None, chunk_id: int | None = None):
+        context = current_call_context()
+        self.phase = phase if phase is not None else context.get("phase")
+        self.chunk_id = chunk_id if chunk_id is not None else context.get("chunk_id")
+        self.document = context.get("document")
+        self.time = time.time()
+
+    def describe(self) -> str:
+        """人が読むための1行の説明"""
+        return self.kind
+
+    def _chunk_label(self) -> str:
+        return f"チャンク {self.chunk_id + 1} " if isinstance(self.chunk_id, int) else ""
+
+    def to_dict(self) -> dict:
+        return {"kind": self.kind, **vars(self)}
+
+
+class PhaseStarted(ProgressEvent):
+    kind = "phase_started"
+
+    def __init__(self, phase: str, description: str = ""):
+        super().__init__(phase)
+        self.description = description
+
+    def describe(self) -> str:
+        return self.description or f"{self.phase} を開始"
+
+
+class PhaseFinished(ProgressEvent):
+    kind = "phase_finished"
+
+    def __init__(self, phase: str, description: str = ""):
+        super().__init__(phase)
+        self.description = description
+
+    def describe(self) -> str:
+        return self.description or f"{self.phase} 完了"
+
+
+class ChunkQueued(ProgressEvent):
+    """チャンク（LLM 呼び出し1件）の投入。estimated_tokens は予想出力トークン数"""
+
+    kind = "chunk_queued"
+
+    def __init__(self, estimated_tokens: int = 0, chunk_id: int | None = None):
+        super().__init__(chunk_id=chunk_id)
+        self.estimated_tokens = estimated_tokens
+
+    def describe(self) -> str:
+        return f"{self._chunk_label()}投入"
+
+
+class ChunkStarted(ProgressEvent):
+    kind = "chunk_started"
+
+    def describe(self) -> str:
+        return f"{self._chunk_label()}処理中..."
+
+
+class ChunkFinished(ProgressEvent):
+    """チャンクの完了。tokens は出力トークン数（ストリーミングで通知済みの分を含む合計）"""
+
+    kind = "chunk_finished"
+
+    def __init__(self, tokens: int = 0, reused: bool = False):
+        super().__init__()
+        self.tokens = tokens
+        self.reused = reused
+
+    def describe(self) -> str:
+        return f"{self._chunk_label()}完了{'（前回の結果を再利用）' if self.reused else ''}"
+
+
+class ChunkRetried(ProgressEvent):
+    kind = "chunk_retried"
+
+    def __init__(self, attempt: int, reason: str):
+        super().__init__()
+        self.attempt = attempt
+        self.reason = reason
+
+    def describe(self) -> str:
+        return f"{self._chunk_label()}リトライ ({self.attempt}回目) - {self.reason}"
+
+
+class TokensProduced(ProgressEvent):
+    """ストリーミングで受信した出力トークン数（増分）"""
+
+    kind = "tokens"
+
+    def __init__(self, tokens: int):
+        super().__init__()
+        self.tokens = tokens
+
+    def describe(self) -> str:
+        return f"{self._chunk_label()}受信中..."
+
+
+class Notice(ProgressEvent):
+    """上記に当てはまらないお知らせ・警告"""
+
+    kind = "notice"
+
+    def __init__(self, message: str, warning: bool = False):
+        super().__init__()
+        self.message = message
+        self.warning = warning
+
+    def describe(self) -> str:
+        return f"警告: {self.message}" if self.warning else self.message
+
+
+ProgressCallback = Callable[[ProgressEvent], None]
+
+
+class ProgressStatus:
+    """ある時点の進捗の集計"""
+
+    def __init__(self, queued: int, running: int, finished: int, tokens: int, rate: float | None,
+                 eta: float | None, fraction: float | None):
+        self.queued = queued        # 投入済みで未開始のチャンク数（キューの深さ）
+        self.running = running
+        self.finished = finished
+        self.tokens = tokens        # 出力トークン数の累計（再利用分を除く）
+        self.rate = rate            # 直近の出力トークン/秒
+        self.eta = eta              # 残り時間の見積もり（秒）
+        self.fraction = fraction    # 完了したチャンクの割合（予想出力トークンで重み付け）
+
+    @property
+    def total(self) -> int:
+        return self.queued + self.running + self.finished
+
+    @property
+    def percentage(self) -> int | None:
+        return None if self.fraction is None else int(self.fraction * 100)
+
+    def to_dict(self) -> dict:
+        return {**vars(self), "total": self.total}
+
+
+class ProgressTracker:
+    """
+    イベントからチャンクの状態と出力トークンのスループットを集計する
+
+    残り時間は「未完了チャンクの予想出力トークン数 − 処理中チャンクが既に出力した分」を直近の出力トークン/秒で割って求める。
+    トークンの観測がまだない場合は、直近のチャンク完了ペースと未完了チャンク数（キューの深さ + 処理中）から求める。
+    """
+
+    def __init__(self, window: float = RATE_WINDOW_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.clock = clock
+        self._chunks: dict[tuple, dict] = {}
+        self._tokens = 0
+        self._token_samples: deque[tuple[float, int]] = deque()
+        self._finish_samples: deque[float] = deque()
+        self._started = clock()
+
+    def observe(self, event: ProgressEvent) -> None:
+        key = (event.document, event.phase, event.chunk_id)
+        now = self.clock()
+        if isinstance(event, ChunkQueued):
+            self._chunks[key] = {"state": "queued", "estimated": event.estimated_tokens, "produced": 0}
+        elif isinstance(event, ChunkStarted):
+            self._chunks.setdefault(key, {"estimated": 0, "produced": 0})["state"] = "running"
+        elif isinstance(event, TokensProduced):
+            self._chunks.setdefault(key, {"state": "running", "estimated": 0, "produced": 0})["produced"] += event.tokens
+            self._add_tokens(now, event.tokens)
+        elif isinstance(event, ChunkFinished):
+            chunk = self._chunks.setdefault(key, {"estimated": 0, "produced": 0})
+            chunk["state"] = "finished"
+            if not event.reused:
+                self._add_tokens(now, max(0, event.tokens - chunk["produced"]))
+                self._finish_samples.append(now)
+            chunk["produced"] = max(chunk["produced"], event.tokens)
+        self._trim(now)
+
+    def _add_tokens(self, now: float, tokens: int) -> None:
+        if tokens:
+            self._tokens += tokens
+            self._token_samples.append((now, tokens))
+
+    def _trim(self, now: float) -> None:
+        while self._token_samples and now - self._token_samples[0][0] > self.window:
+            self._token_samples.popleft()
+        while self._finish_samples and now - self._finish_samples[0] > self.window:
+            self._finish_samples.popleft()
+
+    def _span(self, now: float) -> float:
+        # 観測開始から観測期間が経つまでは、開始からの経過時間で割る
+        return max(1.0, min(self.window, now - self._started))
+
+    def status(self) -> ProgressStatus:
+        now = self.clock()
+        self._trim(now)
+        states = [c.get("state") for c in self._chunks.values()]
+        queued, running, finished = states.count("queued"), states.count("running"), states.count("finished")
+
+        span = self._span(now)
+        rate = sum(t for _, t in self._token_samples) / span if self._token_samples else None
+        remaining_tokens = sum(
+            max(0, c["estimated"] - c["produced"]) for c in self._chunks.values() if c.get("state") != "finished"
+        )
+        eta = None
+        if queued + running == 0:
+            eta = 0.0 if finished else None
+        elif rate and remaining_tokens:
+            eta = remaining_tokens / rate
+        elif self._finish_samples:
+            eta = (queued + running) / (len(self._finish_samples) / span)
+
+        estimated_total = sum(c["estimated"] for c in self._chunks.values())
+        fraction = None
+        if estimated_total:
+            fraction = sum(c["estimated"] for c in self._chunks.values() if c.get("state") == "finished") / estimated_total
+        elif self._chunks:
+            fraction = finished / len(self._chunks)
+        return ProgressStatus(queued, running, finished, self._tokens, rate, eta, fraction)
+
+
+class ProgressBus:
+    """イベントを集計してからシンクへ配る（ProgressCallback として呼び出せる）"""
+
+    def __init__(self, *sinks, tracker: ProgressTracker | None = None):
+        """
+        Args:
+            sinks: handle(event, status) を持つシンク
+            tracker: 集計器（テストで時計を差し替える場合に指定）
+        """
+        self.sinks = list(sinks)
+        self.tracker = tracker or ProgressTracker()
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink) -> None:
+        self.sinks.append(sink)
+
+    def __call__(self, event: ProgressEvent) -> None:
+        with self._lock:
+            self.tracker.observe(event)
+            status = self.tracker.status()
+            for sink in self.sinks:
+                sink.handle(event, status)
+
+    def status(self) -> ProgressStatus:
+        with self._lock:
+            return self.tracker.status()
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            close = getattr(sink, "close", None)
+            if close:
+                close()
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}秒"
+    if seconds < 3600:
+        return f"{seconds // 60}分{seconds % 60:02d}秒"
+    return f"{seconds // 3600}時間{seconds % 3600 // 60:02d}分"
+
+
+def format_status(status: ProgressStatus) -> str:
+    """「3/12 チャンク | 850 tok/s | 残り約 1分20秒」の形式"""
+    parts = []
+    if status.total:
+        parts.append(f"{status.finished}/{status.total} チャンク")
+    if status.rate:
+        parts.append(f"{status.rate:,.0f} tok/s")
+    if status.eta:
+        parts.append(f"残り約 {format_duration(status.eta)}")
+    return " | ".join(parts)
+
+
+class TTYProgressSink:
+    """端末の1行を上書きするプログレスバー。フェーズの区切り・お知らせ・リトライは行を改める"""
+
+    BAR_WIDTH = 20
+
+    def __init__(self, stream: TextIO | None = None):
+        self.stream = stream or sys.stdout
+        self._message = ""
+
+    def handle(self, event: ProgressEvent, status: ProgressStatus) -> None:
+        if not isinstance(event, (TokensProduced, ChunkQueued)):
+            self._message = event.describe()
+        fraction = status.fraction or 0.0
+        filled = int(fraction * self.BAR_WIDTH)
+        bar = "#" * filled + "-" * (self.BAR_WIDTH - filled)
+        detail = format_status(status)
+        line = f"[{bar}] {int(fraction * 100):3d}% {self._message}" + (f" ({detail})" if detail else "")
+        # :<100 で既存の長い行を空白で上書きクリアする
+        self.stream.write(f"\r{line:<100}")
+        if isinstance(event, (PhaseFinished, Notice, ChunkRetried)):
+            self.stream.write("\n")
+        self.stream.flush()
+
+
+class LineProgressSink:
+    """1イベント1行で書き出す（ログ・バッチ処理向け。受信中・投入のイベントは書かない）"""
+
+    def __init__(self, stream: TextIO | None = None):
+        self.stream = stream or sys.stdout
+
+    def handle(self, event: ProgressEvent, status: ProgressStatus) -> None:
+        if isinstance(event, (TokensProduced, ChunkQueued, ChunkStarted)):
+            return
+        prefix = f"[{event.document}] " if event.document else ""
+        detail = format_status(status)
+        self.stream.write(f"{prefix}{event.describe()}" + (f" ({detail})" if detail else "") + "\n")
+        self.stream.flush()
+
+
+class JSONLProgressSink:
+    """イベントと集計を1行の JSON として追記する"""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def handle(self, event: ProgressEvent, status: ProgressStatus) -> None:
+        record = {**event.to_dict(), "status": status.to_dict()}
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class CallbackProgressSink:
+    """任意の関数 callback(event, status) を呼ぶ"""
+
+    def __init__(self, callback: Callable[[ProgressEvent, ProgressStatus], None]):
+        self.callback = callback
+
+    def handle(self, event: ProgressEvent, status: ProgressStatus) -> None:
+        self.callback(event, status)
+
+
+_active_progress: contextvars.ContextVar[ProgressCallback | None] = contextvars.ContextVar("progress", default=None)
+
+
+@contextmanager
+def progress_scope(callback: ProgressCallback | None):
+    """このスコープ内の進捗イベントを callback（ProgressBus など）へ送る。None の場合は外側の送り先を引き継ぐ"""
+    if callback is None:
+        yield _active_progress.get()
+        return
+    token = _active_progress.set(callback)
+    try:
+        yield callback
+    finally:
+        _active_progress.reset(token)
+
+
+def emit(event: ProgressEvent) -> bool:
+    """現在のスコープの送り先へイベントを送る。送り先がなければ False"""
+    callback = _active_progress.get()
+    if callback is None:
+        return False
+    callback(event)
+    return True
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+RateLimiter: API クォータ（RPM / TPM）と同時実行数を管理するリミッタ
+
+- RPM・TPM をそれぞれトークンバケットで管理
+- 同時実行ウィンドウを AIMD で調整（成功で加算的に拡大、429 で乗算的に縮小）
+- プロセス内の全フェーズ・全ドキュメントで同じインスタンスを共有する
+"""
+import time
+import asyncio
+from collections import deque
+
+from .constants import (
+    LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE,
+    LLM_INITIAL_CONCURRENCY, LLM_MAX_CONCURRENCY
+)
+
+
+class TokenBucket:
+    """1分あたりの上限を連続的に補充するトークンバケット"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0  # 1秒あたりの補充量
+        self.tokens = self.capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """amount を消費できるまでの待ち時間（秒）。0 なら即時消費可能"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        """トークンを消費する（実績値の精算で負になることを許容）"""
+        self._refill()
+        self.tokens -= amount
+
+
+class RateLimiter:
+    """
+    クォータを考慮した非同期レートリミッタ
+
+    acquire() で枠を確保し、release() で実際の消費トークン数を精算する。
+    """
+
+    _shared: dict[str, "RateLimiter"] = {}
+
+    def __init__(self, requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+                 initial_concurrency: int = LLM_INITIAL_CONCURRENCY,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 min_concurrency: int = 1,
+                 decrease_factor: float = 0.5,
+                 decrease_cooldown: float = 1.0):
+        """
+        Args:
+            requests_per_minute: 1分あたりのリクエスト上限
+            tokens_per_minute: 1分あたりのトークン上限（入力+出力）
+            initial_concurrency: 同時実行ウィンドウの初期値
+            max_concurrency: 同時実行ウィンドウの上限
+            min_concurrency: 同時実行ウィンドウの下限
+            decrease_factor: 429 発生時にウィンドウへ掛ける係数
+            decrease_cooldown: 縮小を連続で適用しない間隔（秒）。同時に返る 429 の多重縮小を防ぐ
+        """
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+
+        self.window = float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @classmethod
+    def shared(cls, name: str = "default") -> "RateLimiter":
+        """プロセス全体で共有するリミッタを返す（API キーとモデルの組ごとに name で区別する）"""
+        if name not in cls._shared:
+            cls._shared[name] = cls()
+        return cls._shared[name]
+
+    @property
+    def concurrency_limit(self) -> int:
+        """現在の同時実行上限（ウィンドウの整数部）"""
+        return max(self.min_concurrency, int(self.window))
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        """同時実行枠・RPM・TPM がすべて空くまで待ってから枠を確保する"""
+        while True:
+            if self.in_flight < self.concurrency_limit:
+                wait = max(self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens))
+                if wait <= 0:
+                    self.requests.consume(1)
+                    self.tokens.consume(estimated_tokens)
+                    self.in_flight += 1
+                    return
+                await asyncio.sleep(wait)
+                continue
+
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # 起こされた直後にキャンセルされた場合、空き枠を次の待機者へ回す
+                self._wake()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    def release(self, estimated_tokens: int, actual_tokens: int | None = None) -> None:
+        """枠を解放し、実際の消費トークン数との差分を精算する"""
+        self.in_flight = max(0, self.in_flight - 1)
+        if actual_tokens is not None and actual_tokens > estimated_tokens:
+            self.tokens.consume(actual_tokens - estimated_tokens)
+        self._wake()
+
+    def on_success(self) -> None:
+        """成功時: ウィンドウを加算的に拡大する（1ウィンドウ分の成功で +1）"""
+        self.window = min(float(self.max_concurrency), self.window + 1.0 / self.window)
+        self._wake()
+
+    def on_throttle(self) -> None:
+        """429 / RESOURCE_EXHAUSTED 時: ウィンドウを乗算的に縮小する"""
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+        self._last_decrease = now
+        self.window = max(float(self.min_concurrency), self.window * self.decrease_factor)
+
+    def _wake(self) -> None:
+        """空き枠の数だけ待機中のタスクを起こす"""
+        free = self.concurrency_limit - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
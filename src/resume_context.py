@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+翻訳チャンクごとのレジュメの文脈（TRANSLATION_PROMPT の summary_content）の選択
+
+レジュメ全文を毎回付与すると、40 チャンクの論文では同じレジュメを 40 回送ることになる。
+チャンクには次の部分だけを付与する。
+- 全体の論旨: 「リサーチ・クエスチョン」「核心的主張（Thesis）」の見出しの部分（常に付与）
+- チャンクの見出しの経路（祖先の見出しとチャンク内の見出し）に一致するセクションの部分
+
+レジュメの見出しの分類は extract_structure_from_resume と同じ（RESUME_ANALYSIS_KEYWORDS / RESUME_EXCLUDE_SECTIONS）。
+各セクションの「中心的な主張」「論理展開」の見出しは、直前のセクションの一部として扱う。
+"""
+import re
+from typing import List, Optional
+
+from .utils import RESUME_ANALYSIS_KEYWORDS, RESUME_EXCLUDE_SECTIONS
+
+# 全体の論旨として常に付与する見出し
+GLOBAL_KEYWORDS = ["リサーチ・クエスチョン", "核心的主張"]
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)")
+_NUMBERING_RE = re.compile(r"^((\d+(\.\d+)*|[ivxlc]+|[a-z])[.)]\s+|\d+(\.\d+)*\s+)")
+
+
+def heading_key(title: str) -> str:
+    """
+    見出しの照合用の文字列（小文字化し、番号・記号・「：注記」「の論理展開」を除く）
+
+    "# ## 2. Ritual and Exchange：儀礼と交換" と "## Ritual and Exchange" は同じ "ritual and exchange" になる。
+    """
+    title = re.sub(r"^[#\s]+", "", title)
+    title = title.split("：", 1)[0]
+    title = title.removesuffix("の論理展開").strip().lower()
+    title = _NUMBERING_RE.sub("", title)
+    return " ".join(re.findall(r"\w+", title))
+
+
+def _matches(a: str, b: str) -> bool:
+    """同じ見出しか、短い方（4文字以上）が長い方に単語単位で含まれる"""
+    if not a or not b:
+        return False
+    shorter, longer = sorted((a, b), key=len)
+    return shorter == longer or (len(shorter) >= 4 and f" {shorter} " in f" {longer} ")
+
+
+class _ResumeBlock:
+    """見出しから次のセクション（または論旨）の見出しの手前までのレジュメの一部"""
+
+    def __init__(self, kind: str, key: str):
+        self.kind = kind  # "global" / "section" / "excluded"
+        self.key = key
+        self.lines: List[str] = []
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines).strip()
+
+
+class ResumeContext:
+    """レジュメを見出しで区切り、チャンクの見出しの経路に応じて必要な部分だけを返す"""
+
+    def __init__(self, resume_text: str):
+        self.resume_text = resume_text
+        self.blocks: List[_ResumeBlock] = []
+        current = _ResumeBlock("global", "")  # 最初の見出しの前（表題など）
+        for line in resume_text.splitlines():
+            stripped = line.strip()
+            if stripped.startswith("#"):
+                kind = self._kind(stripped)
+                if kind is not None:
+                    self.blocks.append(current)
+                    current = _ResumeBlock(kind, heading_key(stripped) if kind == "section" else "")
+            current.lines.append(line)
+        self.blocks.append(current)
+        self.blocks = [b for b in self.blocks if b.text]
+
+    @staticmethod
+    def _kind(heading: str) -> Optional[str]:
+        """新しい部分を始める見出しの種類（セクション内の「中心的な主張」「論理展開」は None）"""
+        if any(kw in heading for kw in GLOBAL_KEYWORDS):
+            return "global"
+        if any(kw in heading for kw in RESUME_ANALYSIS_KEYWORDS):
+            return None
+        if any(kw.lower() in heading.lower() for kw in RESUME_EXCLUDE_SECTIONS):
+            return "excluded"
+        return "section"
+
+    @property
+    def structured(self) -> bool:
+        """論旨の見出しがあり、セクションごとに選べる形式のレジュメか"""
+        return any(b.kind == "global" and b.lines[0].lstrip().startswith("#") for b in self.blocks)
+
+    def select(self, headings: List[str]) -> str:
+        """
+        見出しの経路 headings に対する文脈（レジュメでの順序のまま結合する）
+
+        論旨の見出しが見つからないレジュメは、選び方が分からないため全文を返す。
+        """
+        if not self.structured:
+            return self.resume_text
+        keys = [heading_key(h) for h in headings]
+        selected = [
+            b.text for b in self.blocks
+            if b.kind == "global" or (b.kind == "section" and any(_matches(b.key, k) for k in keys))
+        ]
+        return "\n\n".join(selected)
+
+
+class HeadingPath:
+    """
+    文書順に渡されるチャンクの見出しの経路
+
+    チャンクの途中から始まるセクション（段落で分割された長いセクションの後半など）にも、
+    それまでのチャンクで開いた祖先の見出しを引き継ぐ。
+    """
+
+    def __init__(self):
+        self._stack: List[tuple[int, str]] = []
+
+    def feed(self, chunk: str) -> List[str]:
+        """
+        チャンクの本文が始まる時点で開いている祖先の見出しと、チャンク内の見出し（文書順）
+
+        チャンクが見出しで始まる場合、その見出しが閉じる前のセクションの見出しは含めない。
+        """
+        inherited = list(self._stack)
+        headings: List[str] = []
+        has_body = False
+        for line in chunk.split("\n"):
+            match = _HEADING_RE.match(line)
+            if not match:
+                has_body = has_body or bool(line.strip())
+                continue
+            level, title = len(match.group(1)), match.group(2).strip()
+            while self._stack and self._stack[-1][0] >= level:
+                self._stack.pop()
+            if not has_body:
+                inherited = [(lv, t) for lv, t in inherited if lv < level]
+            self._stack.append((level, title))
+            headings.append(title)
+        return [title for _, title in inherited] + headings
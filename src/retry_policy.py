@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+リトライポリシー: LLM 呼び出しのエラー分類・バックオフ・期限・サーキットブレーカー
+
+- エラー分類: 一時的 (transient) / クォータ (quota) / 致命的 (fatal) / コンテンツブロック (content_blocked)
+- バックオフ: full jitter。サーバーの Retry-After / RetryInfo があればそれ以上待つ
+- 実行期限: deadline_scope() で設定した期限を超える待機はせずに打ち切る（asyncio タスクへ引き継がれる）
+- サーキットブレーカー: バックエンド障害時に待機中のチャンクを即座に失敗させる
+"""
+import re
+import time
+import random
+import threading
+import contextvars
+from enum import Enum
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+
+class ErrorClass(str, Enum):
+    TRANSIENT = "transient"
+    QUOTA = "quota"
+    FATAL = "fatal"
+    CONTENT_BLOCKED = "content_blocked"
+
+
+class LLMFatalError(RuntimeError):
+    """リトライしても成功しないエラー（不正な API キー、大きすぎるプロンプト等）"""
+
+
+class ContentBlockedError(LLMFatalError):
+    """安全性フィルタ等によりプロンプトまたは応答がブロックされた"""
+
+
+class CircuitOpenError(RuntimeError):
+    """サーキットブレーカーが開いているため呼び出しを行わなかった"""
+
+
+class DeadlineExceededError(TimeoutError):
+    """実行期限を超えた"""
+
+
+# 応答のブロックを示す終了理由
+BLOCKED_FINISH_REASONS = {"SAFETY", "RECITATION", "BLOCKLIST", "PROHIBITED_CONTENT", "SPII"}
+
+# 致命的とみなす HTTP ステータス（429 を除く 4xx の主なもの）
+FATAL_STATUS_CODES = {400, 401, 403, 404, 413}
+# バックエンド全体が使えないことを示す（1回で回路を開く）ステータス
+GLOBAL_FATAL_STATUS_CODES = {401, 403}
+
+
+def _error_code(error: BaseException) -> int | None:
+    code = getattr(error, "code", None)
+    return code if isinstance(code, int) else None
+
+
+def classify_error(error: BaseException) -> ErrorClass:
+    """例外をエラー分類に振り分ける"""
+    if isinstance(error, ContentBlockedError):
+        return ErrorClass.CONTENT_BLOCKED
+    if isinstance(error, LLMFatalError):
+        return ErrorClass.FATAL
+
+    code = _error_code(error)
+    if code == 429 or "RESOURCE_EXHAUSTED" in str(error):
+        return ErrorClass.QUOTA
+    if code in FATAL_STATUS_CODES:
+        return ErrorClass.FATAL
+    # 5xx・タイムアウト・接続断・空レスポンスなどは一時的とみなす
+    return ErrorClass.TRANSIENT
+
+
+def _parse_duration(value: str) -> float | None:
+    """'30', '1.5s', HTTP 日付のいずれかを秒数に変換する"""
+    value = value.strip()
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)s?", value)
+    if match:
+        return float(match.group(1))
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def retry_after(error: BaseException) -> float | None:
+    """サーバーが指定した再試行までの待ち時間（秒）。指定がなければ None"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        try:
+            header = headers.get("retry-after")
+        except Exception:
+            header = None
+        if header:
+            seconds = _parse_duration(str(header))
+            if seconds is not None:
+                return seconds
+
+    # Gemini API は google.rpc.RetryInfo の retryDelay で待ち時間を返す
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        details = details.get("error", details).get("details", [])
+    if isinstance(details, list):
+        for detail in details:
+            if isinstance(detail, dict) and "retryDelay" in detail:
+                seconds = _parse_duration(str(detail["retryDelay"]))
+                if seconds is not None:
+                    return seconds
+    return None
+
+
+_run_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("run_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(seconds: float | None):
+    """
+    このスコープ（およびここで作られた asyncio タスク）内の LLM 呼び出しに実行期限を設定する
+
+    Args:
+        seconds: 現在からの期限（秒）。None の場合は期限なし
+    """
+    deadline = None if seconds is None else time.monotonic() + seconds
+    token = _run_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _run_deadline.reset(token)
+
+
+def remaining_time() -> float | None:
+    """現在のスコープの期限までの残り時間（秒）。期限がなければ None"""
+    deadline = _run_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+class RetryPolicy:
+    """エラー分類に基づいてリトライ可否と待ち時間を決める"""
+
+    RETRYABLE = {ErrorClass.TRANSIENT, ErrorClass.QUOTA}
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 2.0, max_delay: float = 60.0,
+                 rng: random.Random | None = None):
+        """
+        Args:
+            max_attempts: 最大試行回数
+            base_delay: バックオフの基準時間（秒）
+            max_delay: バックオフの上限（秒）。Retry-After はこの上限を超えてもよい
+            rng: ジッター用の乱数生成器
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng or random.Random()
+
+    def should_retry(self, error_class: ErrorClass, attempt: int) -> bool:
+        """attempt 回目（0 始まり）の失敗後にリトライするか"""
+        return error_class in self.RETRYABLE and attempt < self.max_attempts - 1
+
+    def backoff(self, attempt: int, error: BaseException | None = None) -> float:
+        """full jitter によるバックオフ時間。サーバー指定の待ち時間があればそれ以上にする"""
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = self._rng.uniform(0, cap)
+        hinted = retry_after(error) if error is not None else None
+        if hinted is not None:
+            delay = max(delay, hinted)
+        return delay
+
+    @staticmethod
+    def check_deadline(delay: float = 0.0) -> None:
+        """delay 秒待つと実行期限を超える場合は DeadlineExceededError"""
+        remaining = remaining_time()
+        if remaining is not None and remaining < delay:
+            raise DeadlineExceededError("実行期限を超えるため LLM 呼び出しを打ち切りました")
+
+
+class CircuitBreaker:
+    """
+    連続した一時的エラーでバックエンド障害を検知し、一定時間呼び出しを遮断する
+
+    - closed: 通常
+    - open: 即座に CircuitOpenError（reset_timeout 経過後は half-open）
+    - half-open: 1件だけ試行を通し、成功すれば closed、失敗すれば再び open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_started = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """呼び出し前の確認。遮断中なら CircuitOpenError"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError("LLM バックエンドが利用できないため呼び出しを中止しました")
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                # 試行がキャンセル等で戻らない場合に備え、reset_timeout 経過後は次の試行を許す
+                if self._trial_in_flight and time.monotonic() - self._trial_started < self.reset_timeout:
+                    raise CircuitOpenError("LLM バックエンドの復旧確認中です")
+                self._trial_in_flight = True
+                self._trial_started = time.monotonic()
+
+    def is_available(self) -> bool:
+        """状態を変えずに、いま呼び出しが通る見込みがあるか返す"""
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self._opened_at >= self.reset_timeout
+            if self.state == self.HALF_OPEN:
+                return not self._trial_in_flight or time.monotonic() - self._trial_started >= self.reset_timeout
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self, error_class: ErrorClass, error: BaseException | None = None) -> None:
+        """失敗を記録する。一時的エラーの連続や認証エラーで回路を開く"""
+        with self._lock:
+            self._trial_in_flight = False
+            if error is not None and _error_code(error) in GLOBAL_FATAL_STATUS_CODES:
+                self._open()
+                return
+            if error_class != ErrorClass.TRANSIENT:
+                # クォータ・個別の致命的エラーはバックエンド障害ではない
+                if self.state == self.HALF_OPEN:
+                    self.state = self.CLOSED
+                return
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._failures = 0
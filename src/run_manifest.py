@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+RunManifest: 入力ファイルごとの実行マニフェスト（中断した実行の再開用）
+
+<入力名>_run/
+  manifest.json       入力テキストのハッシュ・完了済みフェーズとそのキー・直近の実行のチャンク順
+  input.txt           入力テキスト（差分更新で前回の原文と比較する）
+  resume.md           Phase 1 のレジュメ
+  structured_eng.md   Phase 2 の構造化 Markdown（不要セクション削除前）
+  chunks/<hash>.md    Phase 3 の翻訳済みチャンク（チャンク本文・用語集・プロンプト・モデル・文脈のハッシュがキー）
+
+すべて原子的に書き込むため、途中で強制終了しても書きかけのファイルは残らない。
+入力テキストが変わった場合は Phase 1/2 の結果を使わない（チャンクは内容のハッシュで照合するため再利用できる）。
+フェーズの結果は保存時のキー（プロンプトのテンプレート・モデル名などのハッシュ）が一致する場合のみ使う。
+前回の結果は previous_input() / previous_phase() で参照でき、差分更新（incremental.py）に使う。
+"""
+import json
+import shutil
+import hashlib
+from pathlib import Path
+
+from .utils import Utils
+
+
+def content_hash(*parts: str) -> str:
+    """テキスト（複数可）の SHA-256"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class RunManifest:
+    """入力1件分の途中結果の保存先"""
+
+    VERSION = 2
+    PHASE_FILES = {
+        "resume": "resume.md",
+        "structured": "structured_eng.md",
+    }
+
+    def __init__(self, directory: str | Path, input_text: str):
+        """
+        Args:
+            directory: マニフェストのディレクトリ
+            input_text: 入力テキスト（前回の実行と同じ入力か判定する）
+        """
+        self.directory = Path(directory)
+        self.input_text = input_text
+        self.input_hash = content_hash(input_text)
+        self._manifest_path = self.directory / "manifest.json"
+        self._input_path = self.directory / "input.txt"
+        self._chunk_dir = self.directory / "chunks"
+
+        manifest = self._read_manifest()
+        if manifest.get("version") != self.VERSION:
+            manifest = {}
+        # フェーズ名 -> 保存時のキー
+        self._previous_completed: dict[str, str] = dict(manifest.get("completed", {}))
+        self.previous_chunk_keys: list[str] = manifest.get("chunks", [])
+        self.input_changed = bool(manifest) and manifest.get("input_hash") != self.input_hash
+        self._completed = {} if self.input_changed else dict(self._previous_completed)
+        self._chunk_keys = [] if self.input_changed else list(self.previous_chunk_keys)
+        self._input_saved = bool(manifest) and not self.input_changed
+
+    @classmethod
+    def for_input(cls, input_file: Path, input_text: str) -> "RunManifest":
+        """入力ファイルと同じディレクトリの <入力名>_run/ を使う"""
+        return cls(input_file.parent / f"{input_file.stem}_run", input_text)
+
+    def _read_manifest(self) -> dict:
+        try:
+            return json.loads(self._manifest_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_manifest(self) -> None:
+        manifest = {
+            "version": self.VERSION,
+            "input_hash": self.input_hash,
+            "completed": dict(sorted(self._completed.items())),
+            "chunks": self._chunk_keys,
+        }
+        if not self._input_saved:
+            Utils.write_text_file_atomic(self._input_path, self.input_text)
+            self._input_saved = True
+        Utils.write_text_file_atomic(self._manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2))
+
+    def previous_input(self) -> str | None:
+        """入力が前回から変わった場合の前回の入力テキスト。変わっていない・記録がない場合は None"""
+        if not self.input_changed or self._input_saved:
+            return None
+        try:
+            return self._input_path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def previous_phase(self, name: str, key: str = "") -> str | None:
+        """前回の入力に対するフェーズの結果（キーが一致し、今回のフェーズを保存する前のみ参照できる）"""
+        if self._previous_completed.get(name) != key or name in self._completed:
+            return None
+        try:
+            return (self.directory / self.PHASE_FILES[name]).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def load_phase(self, name: str, key: str = "") -> str | None:
+        """完了済みフェーズの結果。未完了・入力が変わった・キーが異なる場合は None"""
+        if self._completed.get(name) != key:
+            return None
+        try:
+            return (self.directory / self.PHASE_FILES[name]).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def save_phase(self, name: str, text: str, key: str = "") -> None:
+        """フェーズの結果を保存し、キーとともに完了として記録する"""
+        Utils.write_text_file_atomic(self.directory / self.PHASE_FILES[name], text)
+        self._completed[name] = key
+        self._write_manifest()
+
+    @staticmethod
+    def chunk_key(chunk: str, *context: str) -> str:
+        """翻訳済みチャンクのキー（付与する用語集・プロンプト・文脈などの context が変われば別のキーになる）"""
+        return content_hash(chunk, *context)
+
+    def load_chunk(self, key: str) -> str | None:
+        try:
+            return (self._chunk_dir / f"{key}.md").read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def save_chunk(self, key: str, text: str) -> None:
+        Utils.write_text_file_atomic(self._chunk_dir / f"{key}.md", text)
+
+    def has_chunk(self, key: str) -> bool:
+        return (self._chunk_dir / f"{key}.md").exists()
+
+    def set_chunk_keys(self, keys: list[str]) -> None:
+        """今回の実行のチャンク順を記録する"""
+        self._chunk_keys = list(keys)
+        self._write_manifest()
+
+    def prune_chunks(self) -> int:
+        """今回のチャンク順に含まれない翻訳済みチャンクを削除し、削除数を返す"""
+        keep = set(self._chunk_keys)
+        removed = 0
+        for path in self._chunk_dir.glob("*.md"):
+            if path.stem not in keep:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    def clear(self) -> None:
+        """保存済みの途中結果をすべて削除する"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._completed = {}
+        self._previous_completed = {}
+        self.previous_chunk_keys = []
+        self._chunk_keys = []
+        self.input_changed = False
+        self._input_saved = False
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+常駐ジョブサーバー（serve モード）と、そのクライアント
+
+CLI を起動するたびに Python の起動・google.genai の読み込み・プロンプト設定の解析・TLS 接続の確立がかかる。
+serve モードでは PaperProcessorSkills と LLM クライアントを保持したまま、ローカルの JSON API でジョブを受け付ける。
+
+  POST /jobs               {"input_file": ..., "fresh": false, "incremental": false, "pipelined": false}
+                           -> 202 {"id": ..., "status": "queued"}（キューが満杯なら 503）
+  GET  /jobs/<id>          -> ジョブの状態（queued / running / done / failed）と最新の進捗
+  GET  /jobs/<id>/result   -> 完了したジョブの成果物（未完了なら 409）
+  GET  /health             -> キューの状況
+
+アドレスは "127.0.0.1:8765"・"[::1]:8765" のような TCP アドレス、または "unix:/path/to/socket" の Unix ソケット。
+ローカルの利用に限るため、TCP はループバックアドレス以外では待ち受けない。
+ブラウザ上のページからの要求（CSRF・DNS リバインディング）を受け付けないよう、Host がループバック以外の要求と、
+Content-Type が application/json 以外の POST は断る（application/json の送信にはブラウザがプリフライトを要する）。
+"""
+import json
+import uuid
+import time
+import asyncio
+import ipaddress
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from .progress import ProgressEvent, ProgressStatus, TokensProduced, ChunkQueued
+
+MAX_REQUEST_BYTES = 1024 * 1024
+REQUEST_TIMEOUT_SECONDS = 10.0  # 要求の読み込みを待つ上限（止まったクライアントが接続を占有しないように）
+_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed", 408: "Request Timeout",
+            409: "Conflict", 413: "Payload Too Large", 415: "Unsupported Media Type", 503: "Service Unavailable"}
+
+
+class Job:
+    """投入されたジョブ1件"""
+
+    def __init__(self, input_file: Path, fresh: bool = False, incremental: bool = False, pipelined: bool = False):
+        self.input_file = input_file
+        self.fresh = fresh
+        self.incremental = incremental
+        self.pipelined = pipelined
+        self.id = uuid.uuid4().hex[:12]
+        self.status = "queued"
+        self.message = ""
+        self.percentage: Optional[int] = None
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.output_file: Optional[Path] = None
+        self.error: Optional[str] = None
+        self.rate: Optional[float] = None
+        self.eta: Optional[float] = None
+
+    def handle(self, event: ProgressEvent, status: ProgressStatus) -> None:
+        """進捗イベントを記録する（CallbackProgressSink に渡す）"""
+        if not isinstance(event, (TokensProduced, ChunkQueued)):
+            self.message = event.describe()
+        if status.percentage is not None:
+            self.percentage = status.percentage
+        self.rate = status.rate
+        self.eta = status.eta
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "input_file": str(self.input_file),
+            "status": self.status,
+            "message": self.message,
+            "percentage": self.percentage,
+            "rate": self.rate,
+            "eta": self.eta,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "output_file": str(self.output_file) if self.output_file else None,
+            "error": self.error,
+        }
+
+
+JobRunner = Callable[[Job], Awaitable[Path]]
+
+
+def parse_address(address: str) -> tuple[str, str | int]:
+    """アドレスを ("unix", パス) または (ホスト, ポート) に分解する（IPv6 は "[::1]:8765" の形式）"""
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    address = address.removeprefix("http://")
+    host, _, port = address.rpartition(":")
+    if host.startswith("[") and host.endswith("]"):
+        host = host[1:-1]
+    if not host or not port.isdigit():
+        raise ValueError(f"サーバーのアドレスが不正です: {address}（例: 127.0.0.1:8765, [::1]:8765, unix:/tmp/p2workflowy.sock）")
+    return host, int(port)
+
+
+def is_loopback_host(host: str) -> bool:
+    """localhost またはループバックアドレスか"""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _host_of(header: str) -> str:
+    """Host ヘッダーからポートを除いたホスト名"""
+    header = header.strip().lower()
+    if header.startswith("["):
+        return header[1:].partition("]")[0]
+    host, _, port = header.rpartition(":")
+    return host if host and port.isdigit() else header
+
+
+class JobServer:
+    """上限付きのキューとワーカーでジョブを処理するローカル HTTP サーバー"""
+
+    def __init__(self, runner: JobRunner, max_queue: int, workers: int, max_history: int = 1000,
+                 request_timeout: float = REQUEST_TIMEOUT_SECONDS):
+        """
+        Args:
+            runner: ジョブを1件処理して成果物のパスを返すコルーチン関数（run_pipeline を包んだもの）
+            max_queue: 処理待ちのジョブ数の上限（超えた投入は 503 で断る）
+            workers: 同時に処理するジョブ数
+            max_history: 状態を保持する終了済みジョブ数の上限（古いものから忘れる）
+            request_timeout: 1件の要求の読み込みを待つ秒数（超えたら 408 を返して接続を閉じる）
+        """
+        self.runner = runner
+        self.max_history = max_history
+        self.request_timeout = request_timeout
+        self.jobs: dict[str, Job] = {}
+        self._queue: asyncio.Queue[Job] = asyncio.Queue(maxsize=max_queue)
+        self._workers = workers
+        self._tasks: list[asyncio.Task] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, address: str) -> None:
+        host, port = parse_address(address)
+        if host == "unix":
+            Path(port).unlink(missing_ok=True)
+            self._server = await asyncio.start_unix_server(self._handle, path=str(port))
+        else:
+            if not is_loopback_host(host):
+                raise ValueError(f"ループバックアドレス以外では待ち受けません: {host}")
+            self._server = await asyncio.start_server(self._handle, host, port)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self._workers)]
+
+    @property
+    def port(self) -> Optional[int]:
+        """TCP で待ち受けている場合の実際のポート番号（ポート 0 を指定した場合に使う）"""
+        if self._server is None or not self._server.sockets:
+            return None
+        name = self._server.sockets[0].getsockname()
+        return name[1] if isinstance(name, tuple) else None
+
+    async def serve_forever(self) -> None:
+        assert self._server is not None
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def submit(self, job: Job) -> bool:
+        """ジョブをキューに入れる。キューが満杯なら False"""
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            return False
+        self.jobs[job.id] = job
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started = time.time()
+            try:
+                job.output_file = await self.runner(job)
+                job.status = "done"
+            except Exception as e:
+                job.status = "failed"
+                job.error = f"{type(e).__name__}: {e}"
+            finally:
+                job.finished = time.time()
+                self._queue.task_done()
+                self._forget_old_jobs()
+
+    def _forget_old_jobs(self) -> None:
+        finished = [job for job in self.jobs.values() if job.finished is not None]
+        for job in sorted(finished, key=lambda j: j.finished)[:max(0, len(finished) - self.max_history)]:
+            del self.jobs[job.id]
+
+    # --- HTTP ---
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            status, body = await asyncio.wait_for(self._respond(reader), self.request_timeout)
+        except asyncio.TimeoutError:
+            status, body = 408, {"error": "リクエストの読み込みがタイムアウトしました"}
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: close\r\n\r\n".encode("ascii") + payload
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _respond(self, reader: asyncio.StreamReader) -> tuple[int, dict]:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) < 2:
+            return 400, {"error": "不正なリクエストです"}
+        method, path = request_line[0], request_line[1].split("?", 1)[0]
+
+        headers: dict[str, str] = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length_header = headers.get("content-length", "0")
+        if not length_header.isdigit():
+            return 400, {"error": "Content-Length が不正です"}
+        length = int(length_header)
+        if length > MAX_REQUEST_BYTES:
+            return 413, {"error": "リクエストが大きすぎます"}
+        body = await reader.readexactly(length) if length else b""
+
+        # ブラウザ経由の要求（DNS リバインディングではループバック以外の Host が付く）を断る
+        if not is_loopback_host(_host_of(headers.get("host", ""))):
+            return 403, {"error": "Host がループバックアドレスではありません"}
+        if method == "POST" and headers.get("content-type", "").split(";")[0].strip().lower() != "application/json":
+            return 415, {"error": "Content-Type は application/json にしてください"}
+
+        parts = [p for p in path.split("/") if p]
+        if parts == ["health"]:
+            return 200, {"queued": self._queue.qsize(), "jobs": len(self.jobs)}
+        if parts == ["jobs"]:
+            if method != "POST":
+                return 405, {"error": "POST のみ受け付けます"}
+            return self._submit_request(body)
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return 404, {"error": f"ジョブが見つかりません: {parts[1]}"}
+            if len(parts) == 2:
+                return 200, job.to_dict()
+            if parts[2] == "result":
+                return self._result(job)
+        return 404, {"error": f"不明なパスです: {path}"}
+
+    def _submit_request(self, body: bytes) -> tuple[int, dict]:
+        try:
+            request = json.loads(body or b"{}")
+            input_file = Path(request["input_file"]).resolve()
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": "input_file を含む JSON を送ってください"}
+        if not input_file.is_file():
+            return 400, {"error": f"ファイルが見つかりません: {input_file}"}
+        job = Job(
+            input_file,
+            fresh=bool(request.get("fresh")),
+            incremental=bool(request.get("incremental")),
+            pipelined=bool(request.get("pipelined")),
+        )
+        if not self.submit(job):
+            return 503, {"error": "ジョブのキューが満杯です。しばらくしてから再投入してください"}
+        return 202, job.to_dict()
+
+    def _result(self, job: Job) -> tuple[int, dict]:
+        if job.status == "failed":
+            return 200, job.to_dict()
+        if job.status != "done" or job.output_file is None:
+            return 409, {"error": "ジョブはまだ完了していません", "status": job.status}
+        result = job.to_dict()
+        result["content"] = job.output_file.read_text(encoding="utf-8")
+        return 200, result
+
+
+class JobClient:
+    """serve モードのサーバーにジョブを投入するクライアント"""
+
+    def __init__(self, address: str, timeout: float = 30.0):
+        host, port = parse_address(address)
+        if host == "unix":
+            self._client = httpx.Client(transport=httpx.HTTPTransport(uds=str(port)), base_url="http://localhost", timeout=timeout)
+        else:
+            netloc = f"[{host}]" if ":" in str(host) else host
+            self._client = httpx.Client(base_url=f"http://{netloc}:{port}", timeout=timeout)
+
+    def close(self) -> None:
+        self._client.close()
+
+    def _request(self, method: str, path: str, **kwargs) -> dict:
+        response = self._client.request(method, path, **kwargs)
+        body = response.json()
+        if response.status_code >= 400:
+            raise RuntimeError(f"サーバーエラー ({response.status_code}): {body.get('error')}")
+        return body
+
+    def submit(self, input_file: Path, fresh: bool = False, incremental: bool = False, pipelined: bool = False) -> dict:
+        return self._request("POST", "/jobs", json={
+            "input_file": str(Path(input_file).resolve()),
+            "fresh": fresh,
+            "incremental": incremental,
+            "pipelined": pipelined,
+        })
+
+    def status(self, job_id: str) -> dict:
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def result(self, job_id: str) -> dict:
+        return self._request("GET", f"/jobs/{job_id}/result")
+
+    def wait(self, job_id: str, interval: float = 1.0, on_status: Optional[Callable[[dict], None]] = None) -> dict:
+        """ジョブの完了（成功・失敗）までポーリングし、最終的な状態を返す"""
+        while True:
+            status = self.status(job_id)
+            if on_status:
+                on_status(status)
+            if status["status"] in ("done", "failed"):
+                return status
+            time.sleep(interval)
@@ -1,156 +1,680 @@
 import asyncio
+import contextlib
 from .constants import (
-    STRUCTURING_WITH_HINT_PROMPT, SUMMARY_PROMPT, TRANSLATION_PROMPT, 
-    MAX_TRANSLATION_CHUNK_SIZE
+    STRUCTURING_WITH_HINT_PROMPT, SUMMARY_PROMPT, TRANSLATION_PROMPT,
+    MAX_TRANSLATION_CHUNK_TOKENS, TRANSLATION_OUTPUT_RATIO, USE_EXACT_TOKEN_COUNT,
+    TRANSLATION_HEDGE_PERCENTILE, TRANSLATION_HEDGE_BUDGET_RATIO, TRANSLATION_LONGEST_FIRST, ENABLE_TRANSLATION_PACKING, SELECT_RESUME_CONTEXT,
+    MAX_OUTPUT_TOKENS, OUTPUT_TOKEN_SAFETY_RATIO, TRANSLATION_MEMORY_MAX_REFERENCES,
+    MAX_STRUCTURING_CHUNK_TOKENS, STRUCTURING_OUTPUT_RATIO, STRUCTURING_OVERLAP_TOKENS, ENABLE_STRUCTURING_CHUNKING
 )
-from .llm_processor import LLMProcessor
-from .utils import Utils
-import json
-import re
-from typing import List, Dict, Any, cast, Optional
+from .llm_stream import LLMStream
+from .token_estimator import TokenEstimator
+from .hedging import LatencyTracker, HedgeBudget, hedged_call
+from .telemetry import call_context
+from .progress import (
+    ProgressCallback, progress_scope, emit,
+    ChunkQueued, ChunkStarted, ChunkFinished, TokensProduced, Notice
+)
+from .run_manifest import RunManifest, content_hash
+from .utils import SectionFilter
+from .stitching import split_into_windows, stitch
+from .scheduling import longest_first
+from .markdown_index import MarkdownIndex
+from .resume_context import ResumeContext, HeadingPath
+from .glossary import GlossaryIndex
+from .translation_memory import TranslationMemory, MemoryPlan
+from typing import List, AsyncIterator, Optional, TYPE_CHECKING
 from pathlib import Path
 
+if TYPE_CHECKING:
+    from .llm_backends import LLMBackend
+
 class PaperProcessorSkills:
-    def __init__(self):
-        self.llm = LLMProcessor()
+    # チェックポイントのキーに含める、フェーズごとのプロンプトのテンプレート
+    PHASE_PROMPTS = {
+        "resume": SUMMARY_PROMPT,
+        "structured": STRUCTURING_WITH_HINT_PROMPT,
+        "translation": TRANSLATION_PROMPT,
+    }
 
-    async def generate_resume(self, raw_text: str, context_guide: str = "", progress_callback=None) -> str:
+    def __init__(self, llm: Optional["LLMBackend"] = None, hedge_percentile: Optional[float] = TRANSLATION_HEDGE_PERCENTILE):
         """
-        【Phase 1】原文からレジュメ（Resume）を生成する
+        Args:
+            llm: LLM バックエンド（LLMBackend プロトコル）。Noneの場合は Gemini API (LLMProcessor) を使用
+            hedge_percentile: Phase 3 のヘッジリクエストを発動するレイテンシのパーセンタイル。None で無効
         """
+        # llm を省略した場合、LLMProcessor（google.genai）は最初に LLM を使うときに作成する。
+        # チャンク計画の表示など LLM を呼ばない処理では SDK を読み込まない
+        self._llm = llm
+        self.hedge_percentile = hedge_percentile
+        # Phase 2 で長い原文を窓に分割して並列に構造化するか（run_pipeline が enable_chunking として渡す）
+        self.structuring_chunking = ENABLE_STRUCTURING_CHUNKING
+        # Phase 3 で隣り合う小さなセクションを予算に収まる範囲で1チャンクにまとめるか
+        self.pack_chunks = ENABLE_TRANSLATION_PACKING
+        # Phase 3 の各チャンクに、レジュメのうち論旨と見出しが一致するセクションだけを付与するか
+        self.select_resume_context = SELECT_RESUME_CONTEXT
+        # 文書をまたいだ段落単位の翻訳メモリ（None なら使わない。CLI では create_skills が設定する）
+        self.translation_memory: Optional[TranslationMemory] = None
+        # USE_EXACT_TOKEN_COUNT の場合は count_tokens API の実測値でチャンクを見積もる
+        counter = None
+        if USE_EXACT_TOKEN_COUNT:
+            counter = getattr(llm, "count_tokens", None) if llm is not None else (lambda text: self.llm.count_tokens(text))
+        self.token_estimator = TokenEstimator(counter)
+
+    @property
+    def llm(self) -> "LLMBackend":
+        if self._llm is None:
+            from .llm_processor import LLMProcessor
+            self._llm = LLMProcessor()
+        return self._llm
+
+    @llm.setter
+    def llm(self, llm: "LLMBackend") -> None:
+        self._llm = llm
+
+    def checkpoint_key(self, phase: str, *context: str) -> str:
+        """フェーズの結果を左右する条件（プロンプトのテンプレート・モデル名・文脈）のハッシュ"""
+        return content_hash(self.PHASE_PROMPTS[phase], self.llm.model_name, *context)
+
+    async def aclose(self) -> None:
+        """LLM クライアントと翻訳メモリを閉じる"""
+        await self.llm.aclose()
+        if self.translation_memory is not None:
+            self.translation_memory.close()
+
+    async def generate_resume(self, raw_text: str, context_guide: str = "", progress_callback: Optional[ProgressCallback] = None) -> str:
+        """【Phase 1】原文からレジュメ（Resume）を生成する"""
         fmt_args = {
             "text": raw_text,
             "context_guide": context_guide
         }
         prompt = SUMMARY_PROMPT.format(**fmt_args)
-        return await asyncio.to_thread(self.llm.call_api, prompt, progress_callback)
+        with progress_scope(progress_callback):
+            emit(ChunkQueued())
+            return await self._tracked_call(prompt)
 
-    async def structure_text_with_hint(self, raw_text: str, summary_text: str, context_guide: str = "", progress_callback=None, enable_chunking: bool = False) -> str:
-        """
-        【Phase 2】要約をヒントにして、生テキストを構造化する
-        """
-        # 書籍モード以前の状態を尊重し、デフォルトでは一括処理を行う
+    async def structure_text_with_hint(self, raw_text: str, summary_text: str, context_guide: str = "", progress_callback: Optional[ProgressCallback] = None, enable_chunking: bool = False, output_path: Optional[Path] = None) -> str:
+        """【Phase 2】要約をヒントにして、生テキストを構造化する"""
+        windows = self.structuring_windows(raw_text) if enable_chunking else [raw_text]
+        with progress_scope(progress_callback):
+            if output_path is not None:
+                return await self._stream_structure_to_file(raw_text, summary_text, output_path, context_guide, windows)
+
+            if len(windows) > 1:
+                parts = [fragment async for fragment in self._structure_windows(windows, summary_text, context_guide)]
+                return "".join(parts)
+
+            # 書籍モード以前の状態を尊重し、デフォルトでは一括処理を行う
+            prompt = self._build_structuring_prompt(raw_text, summary_text, context_guide)
+            emit(ChunkQueued(self._expected_output_tokens(raw_text, STRUCTURING_OUTPUT_RATIO)))
+            return await self._tracked_call(prompt)
+
+    def _expected_output_tokens(self, text: str, output_ratio: float) -> int:
+        return int(self.token_estimator.estimate(text) * output_ratio)
+
+    async def _tracked_call(self, prompt: str, dedupe: bool = True) -> str:
+        """LLM を呼び出し、開始と完了（出力トークン数の概算）を進捗イベントとして送る"""
+        emit(ChunkStarted())
+        result = await self.llm.acall_api(prompt, None, dedupe=dedupe)
+        emit(ChunkFinished(self.token_estimator.estimate(str(result))))
+        return result
+
+    async def _tracked_fragments(self, fragments: AsyncIterator[str], expected_tokens: int) -> AsyncIterator[str]:
+        """ストリーミングの断片を中継しながら、開始・受信トークン数・完了を進捗イベントとして送る"""
+        emit(ChunkQueued(expected_tokens))
+        emit(ChunkStarted())
+        parts: List[str] = []
+        async for fragment in fragments:
+            emit(TokensProduced(self.token_estimator.estimate(fragment)))
+            parts.append(fragment)
+            yield fragment
+        emit(ChunkFinished(self.token_estimator.estimate("".join(parts))))
+
+    def stream_structure_text_with_hint(self, raw_text: str, summary_text: str, context_guide: str = "",
+                                        progress_callback: Optional[ProgressCallback] = None) -> LLMStream:
+        """【Phase 2】構造化をストリーミングで実行し、テキスト断片を返す LLMStream を得る"""
+        prompt = self._build_structuring_prompt(raw_text, summary_text, context_guide)
+        inner = self.llm.astream_api(prompt, None)
+        expected = self._expected_output_tokens(raw_text, STRUCTURING_OUTPUT_RATIO)
+
+        async def fragments(stream: LLMStream) -> AsyncIterator[str]:
+            tracked = self._tracked_fragments(inner, expected)
+            while True:
+                # 断片を受け取る間だけ送り先を設定する（呼び出し側が断片を処理する間には及ばない）
+                with progress_scope(progress_callback):
+                    try:
+                        fragment = await tracked.__anext__()
+                    except StopAsyncIteration:
+                        break
+                stream.finish_reason = inner.finish_reason
+                yield fragment
+            stream.finish_reason = inner.finish_reason
+
+        return LLMStream(fragments)
+
+    def _build_structuring_prompt(self, raw_text: str, summary_text: str, context_guide: str = "") -> str:
         fmt_args = {
             "raw_text": raw_text,
             "summary_hint": summary_text,
             "context_guide": context_guide
         }
-        prompt = STRUCTURING_WITH_HINT_PROMPT.format(**fmt_args)
-        return await asyncio.to_thread(self.llm.call_api, prompt, progress_callback)
+        return STRUCTURING_WITH_HINT_PROMPT.format(**fmt_args)
+
+    def structuring_windows(self, raw_text: str) -> List[str]:
+        """原文を構造化の窓に分割する（入力 + 予想出力が MAX_STRUCTURING_CHUNK_TOKENS に収まる大きさ）"""
+        max_input_tokens = int(MAX_STRUCTURING_CHUNK_TOKENS / (1.0 + STRUCTURING_OUTPUT_RATIO))
+        if self.token_estimator.estimate(raw_text) <= max_input_tokens:
+            return [raw_text]
+        return split_into_windows(raw_text, self.token_estimator, max_input_tokens, STRUCTURING_OVERLAP_TOKENS)
+
+    async def _structure_windows(self, windows: List[str], summary_text: str, context_guide: str = "") -> AsyncIterator[str]:
+        """窓をすべて並列に構造化し、先頭の窓から順に継ぎ目を縫い合わせた断片を返す"""
+        emit(Notice(f"原文を {len(windows)} 個の窓に分割して並列に構造化します"))
+        tasks = []
+        for i, window in enumerate(windows):
+            prompt = self._build_structuring_prompt(window, summary_text, context_guide)
+            with call_context(chunk_id=i):
+                emit(ChunkQueued(self._expected_output_tokens(window, STRUCTURING_OUTPUT_RATIO)))
+                tasks.append(asyncio.create_task(self._tracked_call(prompt)))
+
+        structured = ""
+        try:
+            for i, task in enumerate(tasks):
+                result = (await task).strip()
+                piece = stitch(structured, result).strip() if structured else result
+                if piece:
+                    fragment = f"\n\n{piece}" if structured else piece
+                    structured += fragment
+                    yield fragment
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _structured_fragments(self, raw_text: str, summary_text: str, context_guide: str,
+                              windows: List[str]) -> tuple[AsyncIterator[str], Optional[LLMStream]]:
+        """構造化結果の断片（窓が複数なら縫い合わせた断片）と、1回の呼び出しの場合はその LLMStream"""
+        if len(windows) > 1:
+            return self._structure_windows(windows, summary_text, context_guide), None
+        stream = self.stream_structure_text_with_hint(raw_text, summary_text, context_guide)
+        return aiter(stream), stream
+
+    async def _stream_structure_to_file(self, raw_text: str, summary_text: str, output_path: Path, context_guide: str = "",
+                                        windows: Optional[List[str]] = None) -> str:
+        """ストリーミング構造化（窓が複数なら縫い合わせた断片）をファイルへ逐次追記し、全文を返す"""
+        fragments, stream = self._structured_fragments(raw_text, summary_text, context_guide, windows or [raw_text])
+        parts: List[str] = []
+
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            async for fragment in fragments:
+                f.write(fragment)
+                f.flush()
+                parts.append(fragment)
 
-    async def translate_academic(self, clean_markdown: str, glossary_text: str = "", summary_context: str = "", context_guide: str = "", progress_callback=None) -> str:
+        if stream is not None and stream.truncated:
+            emit(Notice("出力トークン上限 (MAX_TOKENS) により構造化結果が途中で打ち切られました", warning=True))
+
+        return "".join(parts)
+
+    async def translate_academic(self, clean_markdown: str, glossary_text: "str | GlossaryIndex" = "", summary_context: str = "", context_guide: str = "", progress_callback: Optional[ProgressCallback] = None, checkpoint: Optional[RunManifest] = None) -> str:
+        """【Phase 3】Markdownをセクション単位で分割し、並列翻訳する（checkpoint があれば翻訳済みチャンクを再利用）"""
+        with progress_scope(progress_callback):
+            # 1. セクション単位での分割（小さなセクションはまとめる）
+            sections = await self._asection_chunks(clean_markdown)
+            chunks = self._pack(sections)
+            if not chunks:
+                return ""
+            if len(chunks) < len(sections):
+                emit(Notice(self._packing_summary(sections, chunks)))
+            # 並列数は LLMProcessor 側の共有レートリミッタ（RPM/TPM・AIMD）が制御する
+            run = _TranslationRun(self, glossary_text, summary_context, context_guide, checkpoint)
+            await run.submit_all(chunks)
+            if checkpoint is not None:
+                # チャンクのハッシュを前回までの翻訳と照合し、新規・変更のあったチャンクだけを翻訳する
+                checkpoint.set_chunk_keys(run.keys)
+                pending = sum(1 for key in run.keys if not checkpoint.has_chunk(key))
+                if pending < len(chunks):
+                    emit(Notice(f"新規・変更のあるチャンク {pending}/{len(chunks)} を翻訳します（{len(chunks) - pending} チャンクは前回の翻訳を再利用）"))
+            return await run.finish()
+
+    async def structure_and_translate(self, raw_text: str, summary_text: str, glossary_text: "str | GlossaryIndex" = "", summary_context: str = "",
+                                      exclude_keywords: Optional[List[str]] = None, context_guide: str = "",
+                                      progress_callback: Optional[ProgressCallback] = None, output_path: Optional[Path] = None,
+                                      checkpoint: Optional[RunManifest] = None, enable_chunking: bool = False) -> tuple[str, str]:
         """
-        【Phase 3】Markdownをセクション単位で分割し、並列翻訳する
+        【Phase 2 + 3】構造化をストリーミングで受け取り、閉じた H2 セクションから順に翻訳する
+
+        Returns:
+            (構造化 Markdown（不要セクション削除前）, 翻訳結果)
         """
-        # 1. セクション単位での分割
-        chunks = self._split_markdown_hierarchically(clean_markdown)
-        
-        prompts = []
-        for chunk in chunks:
+        with progress_scope(progress_callback):
+            return await self._structure_and_translate(raw_text, summary_text, glossary_text, summary_context, exclude_keywords,
+                                                       context_guide, output_path, checkpoint, enable_chunking)
+
+    async def _structure_and_translate(self, raw_text: str, summary_text: str, glossary_text: "str | GlossaryIndex", summary_context: str,
+                                       exclude_keywords: Optional[List[str]], context_guide: str, output_path: Optional[Path],
+                                       checkpoint: Optional[RunManifest], enable_chunking: bool) -> tuple[str, str]:
+        run = _TranslationRun(self, glossary_text, summary_context, context_guide, checkpoint)
+        # remove_unwanted_sections と同じ判定を行単位で適用してから H2 セクションに切り出す
+        splitter = _H2SectionSplitter(SectionFilter(exclude_keywords or []))
+        # 閉じたセクションを順にまとめるため、まとめ方は一括の _translatable_chunks と同じになる
+        packer = self._chunk_packer()
+        started = False
+
+        async def submit_sections(sections: List[str], last: bool = False) -> None:
+            nonlocal started
+            for i, section in enumerate(sections):
+                # remove_unwanted_sections は全体の前後の空白を除くため、最初と最後のセクションで同様にする
+                if not started:
+                    section = section.lstrip()
+                    if not section:
+                        continue
+                    started = True
+                if last and i == len(sections) - 1:
+                    section = section.rstrip()
+                chunks = await self._asection_chunks(section)
+                await run.submit_all(packer.feed(chunks) if packer is not None else chunks)
+
+        windows = self.structuring_windows(raw_text) if enable_chunking else [raw_text]
+        fragments, stream = self._structured_fragments(raw_text, summary_text, context_guide, windows)
+        parts: List[str] = []
+        try:
+            with contextlib.ExitStack() as stack:
+                f = None
+                if output_path is not None:
+                    output_path = Path(output_path)
+                    output_path.parent.mkdir(parents=True, exist_ok=True)
+                    f = stack.enter_context(open(output_path, "w", encoding="utf-8"))
+                async for fragment in fragments:
+                    if f is not None:
+                        f.write(fragment)
+                        f.flush()
+                    parts.append(fragment)
+                    await submit_sections(splitter.feed(fragment))
+            await submit_sections(splitter.close(), last=True)
+            if packer is not None:
+                await run.submit_all(packer.close())
+        except BaseException:
+            await run.cancel()
+            raise
+
+        if stream is not None and stream.truncated:
+            emit(Notice("出力トークン上限 (MAX_TOKENS) により構造化結果が途中で打ち切られました", warning=True))
+
+        structured = "".join(parts)
+        if checkpoint is not None:
+            # 翻訳が失敗しても再実行時に構造化をやり直さないよう、先に構造化結果を保存する
+            checkpoint.save_phase("structured", structured, self.checkpoint_key("structured", summary_text, context_guide))
+            checkpoint.set_chunk_keys(run.keys)
+        return structured, await run.finish()
+
+    def plan_chunks(self, markdown: str) -> tuple[List[str], Optional[str]]:
+        """Phase 3 と同じ規則で翻訳チャンクに分け、(チャンク, まとめた場合の充填率のお知らせ または None) を返す"""
+        sections = self._section_chunks(markdown)
+        chunks = self._pack(sections)
+        return chunks, self._packing_summary(sections, chunks) if len(chunks) < len(sections) else None
+
+    def _translatable_chunks(self, markdown: str) -> List[str]:
+        """翻訳単位に分割する（空・見出しのみのチャンクを除き、pack_chunks なら小さなセクションをまとめる）"""
+        return self._pack(self._section_chunks(markdown))
+
+    def _chunk_packer(self) -> Optional["_ChunkPacker"]:
+        if not self.pack_chunks:
+            return None
+        return _ChunkPacker(self.token_estimator, MAX_TRANSLATION_CHUNK_TOKENS, TRANSLATION_OUTPUT_RATIO)
+
+    def _pack(self, sections: List[str]) -> List[str]:
+        packer = self._chunk_packer()
+        if packer is None:
+            return sections
+        return packer.feed(sections) + packer.close()
+
+    def _packing_summary(self, sections: List[str], chunks: List[str]) -> str:
+        """「翻訳チャンク: セクション 24 件 → 6 チャンク（充填率 82%）」の形式"""
+        packer = _ChunkPacker(self.token_estimator, MAX_TRANSLATION_CHUNK_TOKENS, TRANSLATION_OUTPUT_RATIO)
+        return f"翻訳チャンク: セクション {len(sections)} 件 → {len(chunks)} チャンク（充填率 {packer.efficiency(chunks):.0%}）"
+
+    def _section_chunks(self, markdown: str) -> List[str]:
+        """見出し階層で予算内に分割し、空のチャンクと見出しのみのチャンクを除く"""
+        chunks = []
+        for chunk in self._split_markdown_hierarchically(markdown):
             if not chunk or not str(chunk).strip():
                 continue
-            
+
             # 見出しのみのチャンクを除外
             lines = chunk.strip().splitlines()
             if all(line.strip().startswith('#') for line in lines):
                 continue
-            
-            format_args = {
-                "summary_content": summary_context,
-                "chunk_text": chunk,
-                "glossary_content": glossary_text,
-                "context_guide": context_guide
-            }
-            p = TRANSLATION_PROMPT.format(**format_args)
-            prompts.append(p)
-
-        if not prompts:
-            return ""
-
-        # セマフォで並列数を制限 (以前の標準である 3 に戻す)
-        semaphore = asyncio.Semaphore(3)
-
-        total = len(prompts)
-        completed = 0
-
-        async def call_with_logging(i, prompt_text):
-            nonlocal completed
-            async with semaphore:
-                # チャンクごとの進捗表示
-                if progress_callback:
-                    progress_callback(f"チャンク {i+1}/{total} 翻訳中...")
-                
-                res_text = await asyncio.to_thread(self.llm.call_api, prompt_text, None)
-                
-                completed += 1
-                if progress_callback:
-                    progress_callback(f"チャンク {completed}/{total} 完了")
-                
-                return str(res_text).strip()
-
-        tasks = [call_with_logging(i, p) for i, p in enumerate(prompts)]
-        results = await asyncio.gather(*tasks)
-        
-        return "\n\n".join([r for r in results if r])
+            chunks.append(chunk)
+        return chunks
 
-    def _split_markdown_hierarchically(self, text: str, max_length: int = MAX_TRANSLATION_CHUNK_SIZE) -> List[str]:
-        """
-        Markdownの見出し階層を考慮して構成。
-        """
-        sections = self._split_by_heading_level(text, level=2)
-        final_chunks = []
-        for section in sections:
-            if len(section) <= max_length:
-                final_chunks.append(section)
-                continue
-            
-            subsections = self._split_by_heading_level(section, level=3)
-            for sub in subsections:
-                if len(sub) <= max_length:
-                    final_chunks.append(sub)
+    async def _asection_chunks(self, markdown: str) -> List[str]:
+        """_section_chunks と同じ分割。count_tokens API で数える場合はイベントループを止めないようスレッドで行う"""
+        if self.token_estimator.counter is None:
+            return self._section_chunks(markdown)
+        return await asyncio.to_thread(self._section_chunks, markdown)
+
+    def _split_markdown_hierarchically(self, text: str, max_tokens: int = MAX_TRANSLATION_CHUNK_TOKENS, output_ratio: float = TRANSLATION_OUTPUT_RATIO) -> List[str]:
+        """Markdownの見出し階層（H2 → H3 → H4 → 段落）で、入力 + 予想出力が max_tokens 以下になるよう分割する"""
+        index = MarkdownIndex(text)
+        final_chunks: List[str] = []
+        # (開始, 終了, 次に分割する見出しレベル, 予算超えが判定済みの文字列)。文書順に取り出すため逆順に積む
+        stack: List[tuple[int, int, int, Optional[str]]] = [
+            (start, end, 3, None) for start, end in reversed(index.split_ranges(2))
+        ]
+        while stack:
+            start, end, next_level, chunk = stack.pop()
+            # chunk が渡された範囲は、1つ上のレベルで見出しがなく、予算を超えることが判定済み
+            if chunk is None:
+                chunk = text[start:end]
+                if self.token_estimator.fits(chunk, max_tokens, output_ratio):
+                    final_chunks.append(chunk)
                     continue
-                
-                subsubsections = self._split_by_heading_level(sub, level=4)
-                for subsub in subsubsections:
-                    if len(subsub) <= max_length:
-                        final_chunks.append(subsub)
-                        continue
-                    
-                    paragraphs = self._split_by_paragraph(subsub, max_length)
-                    final_chunks.extend(paragraphs)
-                    
+            if next_level > 4:
+                final_chunks.extend(self._split_by_paragraph(chunk, max_tokens, output_ratio))
+                continue
+            ranges = index.split_ranges(next_level, start, end)
+            stack.extend(
+                (sub_start, sub_end, next_level + 1, chunk if len(ranges) == 1 else None)
+                for sub_start, sub_end in reversed(ranges)
+            )
         return final_chunks
 
     def _split_by_heading_level(self, text: str, level: int) -> List[str]:
-        marker = "#" * level + " "
-        lines = text.split('\n')
-        chunks = []
-        current_chunk = []
-        for line in lines:
-            if line.startswith(marker):
-                if current_chunk:
-                    chunks.append("\n".join(current_chunk))
-                current_chunk = [line]
-            else:
-                current_chunk.append(line)
-        if current_chunk:
-            chunks.append("\n".join(current_chunk))
-        return chunks
+        return MarkdownIndex(text).split(level)
 
-    def _split_by_paragraph(self, text: str, max_length: int) -> List[str]:
+    def _split_by_paragraph(self, text: str, max_tokens: int, output_ratio: float = TRANSLATION_OUTPUT_RATIO) -> List[str]:
+        # 段落単位の積み上げはローカル概算で行う（段落ごとに count_tokens を呼ばない）
+        budget = max_tokens / (1.0 + output_ratio)
         paragraphs = text.split('\n\n')
         chunks = []
         current_chunk: List[str] = []
-        current_len = 0
+        current_tokens = 0
         for p in paragraphs:
-            p_len = len(p) + 2
-            if current_len + p_len > max_length and current_chunk:
+            p_tokens = self.token_estimator.estimate(p) + 1
+            if current_tokens + p_tokens > budget and current_chunk:
                 chunks.append("\n\n".join(current_chunk))
                 current_chunk = [p]
-                current_len = p_len
+                current_tokens = p_tokens
             else:
                 current_chunk.append(p)
-                current_len += p_len
+                current_tokens += p_tokens
         if current_chunk:
             chunks.append("\n\n".join(current_chunk))
         return chunks
+
+
+class _TranslationRun:
+    """Phase 3 の1回分の並列翻訳（推定コストの大きい順に開始し、文書順に結合する）"""
+
+    def __init__(self, skills: PaperProcessorSkills, glossary_text: "str | GlossaryIndex", summary_context: str, context_guide: str,
+                 checkpoint: Optional[RunManifest] = None):
+        self.skills = skills
+        # 用語集は各チャンクに現れる用語の行だけを付与する（プロンプトの大きさが用語集の大きさによらない）
+        self.glossary = glossary_text if isinstance(glossary_text, GlossaryIndex) else GlossaryIndex.from_text(glossary_text)
+        self.summary_context = summary_context
+        # レジュメのうち、論旨とチャンクの見出しの経路に一致するセクションだけを各チャンクに付与する
+        self.resume_context = ResumeContext(summary_context) if skills.select_resume_context and summary_context else None
+        self.heading_path = HeadingPath()
+        self.context_tokens = 0
+        self.memory = skills.translation_memory
+        self.memory_chunks = 0
+        self.memory_paragraphs = 0
+        self.memory_references = 0
+        self.context_guide = context_guide
+        self.checkpoint = checkpoint
+        # チェックポイント・翻訳メモリの照合に使う、プロンプトのテンプレート・モデル名のハッシュ
+        self.prompt_key = skills.checkpoint_key("translation", context_guide) if checkpoint is not None or self.memory is not None else ""
+        self.keys: List[str] = []
+        self.tasks: List[asyncio.Task] = []
+        self.completed = 0
+        # ヘッジ: 送信開始からの経過時間が観測レイテンシのパーセンタイルを超えたチャンクに重複リクエストを送る
+        self.latency_tracker = LatencyTracker()
+        self.hedge_budget = HedgeBudget(1)
+
+    @property
+    def total(self) -> int:
+        return len(self.tasks)
+
+    async def submit(self, chunk: str) -> None:
+        """チャンクの翻訳を開始する"""
+        await self.submit_all([chunk])
+
+    async def submit_all(self, chunks: List[str], longest_first_order: bool = TRANSLATION_LONGEST_FIRST) -> None:
+        """チャンクをまとめて投入する（longest_first_order なら推定コストの大きい順に開始）"""
+        first = len(self.tasks)
+        glossaries = [self.glossary.for_chunk(chunk) for chunk in chunks]
+        # 見出しの経路は文書順にたどる必要があるため、開始順に並べる前に文脈を決める
+        contexts = [self._summary_for(chunk) for chunk in chunks]
+        # チャンクに付与する用語・文脈が変わらなければ、用語集のほかの行を編集しても翻訳済みチャンクを再利用できる
+        self.keys.extend(
+            RunManifest.chunk_key(chunk, glossary, self.prompt_key, summary)
+            for chunk, glossary, summary in zip(chunks, glossaries, contexts)
+        )
+        plans = await self._memory_plans(chunks, self.keys[first:])
+        # 翻訳メモリで賄える段落は、予想出力（進捗の残り時間・実行順序のコスト）から除く
+        expected = [
+            0 if plan is not None and plan.complete else
+            self.skills._expected_output_tokens(plan.source_text() if plan is not None else chunk, TRANSLATION_OUTPUT_RATIO)
+            for chunk, plan in zip(chunks, plans)
+        ]
+        # 重複リクエストの上限は投入済みチャンク数に比例させる
+        self.hedge_budget.max_hedges = max(1, int((first + len(chunks)) * TRANSLATION_HEDGE_BUDGET_RATIO))
+
+        for j in range(len(chunks)):
+            with call_context(chunk_id=first + j):
+                emit(ChunkQueued(expected[j]))
+
+        order: List[int] = list(range(len(chunks)))
+        if longest_first_order:
+            costs = [0 if self.checkpoint is not None and self.checkpoint.has_chunk(self.keys[first + j]) else expected[j]
+                     for j in range(len(chunks))]
+            order = longest_first(costs)
+        started = {j: self._start(first + j, chunks[j], contexts[j], glossaries[j], plans[j]) for j in order}
+        # 開始順にかかわらず、finish() では文書順に結合する
+        self.tasks.extend(started[j] for j in range(len(chunks)))
+
+    def _summary_for(self, chunk: str) -> str:
+        if self.resume_context is None:
+            return self.summary_context
+        summary = self.resume_context.select(self.heading_path.feed(chunk))
+        self.context_tokens += self.skills.token_estimator.estimate(summary)
+        return summary
+
+    async def _memory_plans(self, chunks: List[str], keys: List[str]) -> List[Optional[MemoryPlan]]:
+        """翻訳メモリとの照合結果（翻訳メモリがない・チェックポイントから再利用するチャンクは None）"""
+        if self.memory is None:
+            return [None] * len(chunks)
+        # MinHash と SQLite の処理はイベントループを止めないようスレッドで行う
+        plans = await asyncio.to_thread(lambda: [
+            None if self.checkpoint is not None and self.checkpoint.has_chunk(key) else
+            self.memory.plan(chunk, TRANSLATION_MEMORY_MAX_REFERENCES, self._memory_context)
+            for chunk, key in zip(chunks, keys)
+        ])
+        for plan in plans:
+            if plan is not None:
+                self.memory_paragraphs += plan.reused
+                self.memory_chunks += plan.complete
+                self.memory_references += len(plan.references)
+        return plans
+
+    def _memory_context(self, paragraph: str) -> str:
+        """翻訳メモリの完全一致の条件（段落に付与する用語集の行・プロンプト・モデルのハッシュ）"""
+        return content_hash(self.prompt_key, self.glossary.for_chunk(paragraph))
+
+    def _prompt(self, text: str, summary: str, glossary: str, references: List[tuple[str, str]]) -> str:
+        if references:
+            # 参考訳は用語集の後ろに付ける（チェックポイントのキーには含めない）
+            lines = ["[Reference Translations]", "以下は類似した段落の過去の訳です。訳語と文体の参考にし、出力には含めないでください。"]
+            for source, translation in references:
+                lines.extend(["", f"原文: {source}", f"訳文: {translation}"])
+            glossary = (glossary + "\n\n" if glossary else "") + "\n".join(lines)
+        return TRANSLATION_PROMPT.format(
+            summary_content=summary,
+            chunk_text=text,
+            glossary_content=glossary,
+            context_guide=self.context_guide,
+        )
+
+    def _start(self, i: int, chunk: str, summary: str, glossary: str, plan: Optional[MemoryPlan] = None) -> asyncio.Task:
+        # タスクごとにコンテキストがコピーされるため、ここで設定した chunk_id はこのチャンクの呼び出しにだけ付く
+        with call_context(chunk_id=i):
+            return asyncio.create_task(self._translate(i, chunk, summary, glossary, plan))
+
+    async def _call(self, i: int, prompt_text: str) -> str:
+        skills = self.skills
+        if skills.hedge_percentile:
+            def on_hedge():
+                emit(Notice(f"チャンク {i+1}/{self.total} の応答が遅いため重複リクエストを送信"))
+
+            res_text = await hedged_call(
+                lambda is_hedge: skills.llm.acall_api(prompt_text, None, dedupe=not is_hedge),
+                self.latency_tracker, self.hedge_budget, skills.hedge_percentile, on_hedge
+            )
+        else:
+            res_text = await skills.llm.acall_api(prompt_text, None)
+        return str(res_text).strip()
+
+    async def _translate(self, i: int, chunk: str, summary: str, glossary: str, plan: Optional[MemoryPlan]) -> str:
+        skills = self.skills
+        key = self.keys[i]
+        if self.checkpoint is not None:
+            saved = self.checkpoint.load_chunk(key)
+            if saved is not None:
+                self.completed += 1
+                emit(ChunkFinished(skills.token_estimator.estimate(saved), reused=True))
+                return saved
+
+        merged = plan.merge() if plan is not None and plan.complete else None
+        if merged is None:
+            emit(ChunkStarted())
+            references = plan.references if plan is not None else []
+            if plan is not None and plan.partial:
+                # 完全一致した段落を除いて翻訳し、元の順序に戻す
+                translated = await self._call(i, self._prompt(plan.source_text(), summary, glossary, references))
+                merged = plan.merge(translated)
+                if merged is not None and self.memory is not None:
+                    await asyncio.to_thread(self.memory.add_translation, plan.source_text(), translated, self._memory_context)
+            if merged is None:
+                merged = await self._call(i, self._prompt(chunk, summary, glossary, references))
+                if self.memory is not None:
+                    await asyncio.to_thread(self.memory.add_translation, chunk, merged, self._memory_context)
+
+        result = merged
+        if self.checkpoint is not None:
+            self.checkpoint.save_chunk(key, result)
+
+        self.completed += 1
+        emit(ChunkFinished(skills.token_estimator.estimate(result), reused=plan is not None and plan.complete))
+        return result
+
+    async def cancel(self) -> None:
+        """未完了の翻訳を中止する"""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def finish(self) -> str:
+        """すべてのチャンクの完了を待ち、投入順に結合する"""
+        if self.resume_context is not None and self.total:
+            full = self.skills.token_estimator.estimate(self.summary_context)
+            emit(Notice(f"レジュメの文脈: チャンクあたり平均 {self.context_tokens // self.total:,} トークン（全文 {full:,} トークン）"))
+        if self.memory_paragraphs or self.memory_references:
+            emit(Notice(f"翻訳メモリ: 完全一致 {self.memory_paragraphs} 段落を再利用（{self.memory_chunks} チャンクは API を呼ばずに再利用）、"
+                        f"類似段落の訳 {self.memory_references} 件を参考訳として付与"))
+        if self.checkpoint is None:
+            try:
+                results = await asyncio.gather(*self.tasks)
+            except BaseException:
+                await self.cancel()
+                raise
+        else:
+            # 完了したチャンクを保存し切るため、失敗があっても全チャンクの終了を待つ
+            results = await asyncio.gather(*self.tasks, return_exceptions=True)
+            errors = [r for r in results if isinstance(r, BaseException)]
+            if errors:
+                emit(Notice(f"{len(errors)}/{self.total} チャンクの翻訳に失敗しました（再実行時は失敗したチャンクのみ翻訳します）", warning=True))
+                raise errors[0]
+            self.checkpoint.prune_chunks()
+
+        return "\n\n".join([r for r in results if r])
+
+
+class _ChunkPacker:
+    """隣り合う小さなチャンクを翻訳の予算に収まる範囲で1つにまとめる（next-fit。feed() / close() で逐次）"""
+
+    def __init__(self, token_estimator: TokenEstimator, max_tokens: int, output_ratio: float):
+        self.token_estimator = token_estimator
+        # 入力 + 予想出力が max_tokens 以下、かつ出力が安全マージン込みの出力上限以下になる入力トークン数
+        self.budget = min(max_tokens / (1.0 + output_ratio), MAX_OUTPUT_TOKENS * OUTPUT_TOKEN_SAFETY_RATIO / output_ratio)
+        self._parts: List[str] = []
+        self._tokens = 0
+
+    def _cost(self, chunk: str) -> int:
+        # 段落単位の積み上げと同様にローカル概算で積み上げる（区切りの空行の分として +1）
+        return self.token_estimator.estimate(chunk) + 1
+
+    def feed(self, chunks: List[str]) -> List[str]:
+        """チャンクを追加し、まとめ終わったチャンクを返す"""
+        packed = []
+        for chunk in chunks:
+            tokens = self._cost(chunk)
+            if self._parts and self._tokens + tokens > self.budget:
+                packed.append(self._flush())
+            self._parts.append(chunk)
+            self._tokens += tokens
+        return packed
+
+    def close(self) -> List[str]:
+        """残りをまとめて返す"""
+        return [self._flush()] if self._parts else []
+
+    def _flush(self) -> str:
+        parts, self._parts, self._tokens = self._parts, [], 0
+        if len(parts) == 1:
+            return parts[0]
+        return "\n\n".join(part.strip("\n") for part in parts)
+
+    def efficiency(self, chunks: List[str]) -> float:
+        """充填率: チャンクの入力トークン数の合計 ÷ (チャンク数 × 予算)"""
+        if not chunks:
+            return 0.0
+        return min(1.0, sum(self._cost(chunk) for chunk in chunks) / (len(chunks) * self.budget))
+
+
+class _H2SectionSplitter:
+    """ストリーミングで届く Markdown を H2 セクション単位に切り出す（_split_by_heading_level(level=2) と同じ境界）"""
+
+    def __init__(self, section_filter: Optional[SectionFilter] = None):
+        self.section_filter = section_filter
+        self._pending = ""            # 改行が届いていない行の断片
+        self._section: List[str] = []
+
+    def _feed_line(self, line: str) -> List[str]:
+        if self.section_filter is not None and not self.section_filter.accept(line):
+            return []
+        closed = []
+        if line.startswith("## ") and self._section:
+            closed.append("\n".join(self._section))
+            self._section = []
+        self._section.append(line)
+        return closed
+
+    def feed(self, fragment: str) -> List[str]:
+        """断片を追加し、閉じたセクションを返す"""
+        *lines, self._pending = (self._pending + fragment).split("\n")
+        closed = []
+        for line in lines:
+            closed.extend(self._feed_line(line))
+        return closed
+
+    def close(self) -> List[str]:
+        """ストリームの終端。残りのセクションを返す"""
+        closed = self._feed_line(self._pending) if self._pending else []
+        self._pending = ""
+        if self._section:
+            closed.append("\n".join(self._section))
+            self._section = []
+        return closed
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+並列構造化のための窓分割と継ぎ目の縫合
+
+- split_into_windows: 原文を段落境界で、前の窓の末尾段落と重なる窓に分割する
+- stitch: 前の窓までの構造化結果に次の窓の構造化結果をつなぐ。重なり部分の本文と、
+  直前の見出しを繰り返しただけの見出しを決定的に取り除く
+"""
+import re
+import difflib
+from typing import List
+
+from .token_estimator import TokenEstimator
+
+_PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+_HEADING_RE = re.compile(r"^(#{1,10})\s+(.*)")
+_SPACE_RE = re.compile(r"\s+")
+
+# 継ぎ目で同じ段落とみなす類似度（構造化で空白や句読点がわずかに変わることがある）
+SIMILARITY_THRESHOLD = 0.9
+# 重なりを探す範囲（前の結果の末尾の行数）
+SEAM_SEARCH_LINES = 200
+
+
+def _paragraphs(text: str) -> List[str]:
+    """段落に分割する。空行のない OCR テキストは行を段落とみなす"""
+    paragraphs = [p for p in _PARAGRAPH_BREAK_RE.split(text) if p.strip()]
+    if len(paragraphs) <= 1:
+        paragraphs = [line for line in text.splitlines() if line.strip()]
+    return paragraphs
+
+
+def split_into_windows(text: str, estimator: TokenEstimator, max_input_tokens: int,
+                       overlap_tokens: int) -> List[str]:
+    """
+    原文を段落境界で窓に分割する
+
+    Args:
+        text: 原文
+        estimator: トークン数の推定器
+        max_input_tokens: 1つの窓の入力トークン数の上限（重なり部分を含む）
+        overlap_tokens: 前の窓から引き継ぐ末尾段落のトークン数の目安
+
+    Returns:
+        窓のリスト。2つ目以降の窓は前の窓の末尾段落から始まる
+    """
+    paragraphs = _paragraphs(text)
+    costs = [estimator.estimate(p) + 1 for p in paragraphs]
+
+    windows: List[str] = []
+    start = 0
+    while start < len(paragraphs):
+        # 前の窓の末尾段落を重なりとして含める（窓の半分を超えないようにする）
+        overlap_start = start
+        overlap = 0
+        while (windows and overlap_start > 0
+               and overlap + costs[overlap_start - 1] <= min(overlap_tokens, max_input_tokens // 2)):
+            overlap_start -= 1
+            overlap += costs[overlap_start]
+
+        end = start
+        used = overlap
+        while end < len(paragraphs) and (end == start or used + costs[end] <= max_input_tokens):
+            used += costs[end]
+            end += 1
+        windows.append("\n\n".join(paragraphs[overlap_start:end]))
+        start = end
+    return windows
+
+
+def _normalize(line: str) -> str:
+    return _SPACE_RE.sub(" ", line.strip()).lower()
+
+
+def _similar(a: str, b: str) -> bool:
+    if a == b:
+        return True
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio() >= SIMILARITY_THRESHOLD
+
+
+def _heading(line: str) -> tuple[int, str] | None:
+    match = _HEADING_RE.match(line.strip())
+    if not match:
+        return None
+    return len(match.group(1)), _normalize(match.group(2))
+
+
+def _body_lines(lines: List[str]) -> List[tuple[int, str]]:
+    """見出しと空行を除いた本文行（行番号, 正規化した本文）"""
+    return [(i, _normalize(line)) for i, line in enumerate(lines) if line.strip() and _heading(line) is None]
+
+
+def _overlap_length(tail: List[tuple[int, str]], head: List[tuple[int, str]], match) -> int:
+    for k in range(min(len(tail), len(head)), 0, -1):
+        if all(match(tail[-k + j][1], head[j][1]) for j in range(k)):
+            return k
+    return 0
+
+
+def _heading_path(lines: List[str]) -> dict[int, str]:
+    """末尾時点で有効な見出し（レベル -> 見出し）"""
+    path: dict[int, str] = {}
+    for line in lines:
+        heading = _heading(line)
+        if heading is None:
+            continue
+        level, title = heading
+        path = {lvl: t for lvl, t in path.items() if lvl < level}
+        path[level] = title
+    return path
+
+
+def stitch(previous: str, addition: str) -> str:
+    """
+    前の窓までの構造化結果 previous に続けるべき、addition のうち新しい部分を返す
+
+    1. addition の先頭から、previous の末尾と同じ並びの本文行（重なり部分）を取り除く
+    2. 続く見出しのうち、previous の末尾で有効な見出しと同じもの（節の続きを示すための繰り返し）を取り除く
+    """
+    previous_lines = previous.splitlines()
+    lines = addition.splitlines()
+    tail = _body_lines(previous_lines[-SEAM_SEARCH_LINES:])
+    head = _body_lines(lines)[:len(tail)]
+
+    # 1. 重なり部分: previous の末尾 k 本文行と addition の先頭 k 本文行が順に一致する最大の k。
+    #    似た段落が続く文書で重なりを取りすぎないよう、完全一致で見つからない場合のみ類似度で照合する
+    cut = 0
+    for match in (str.__eq__, _similar):
+        k = _overlap_length(tail, head, match)
+        if k:
+            cut = head[k - 1][0] + 1
+            break
+    rest = lines[cut:]
+
+    # 2. 継ぎ目の直後で、現在の節の見出しを繰り返しているだけの見出しを取り除く
+    path = _heading_path(previous_lines)
+    while rest:
+        if not rest[0].strip():
+            rest.pop(0)
+            continue
+        heading = _heading(rest[0])
+        if heading is None or path.get(heading[0]) != heading[1]:
+            break
+        rest.pop(0)
+    return "\n".join(rest)
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+テレメトリ: LLM 呼び出しごとの計測値（トークン数・待ち時間・レイテンシ・リトライ・費用）
+
+- CallStats: 1回の呼び出し（リトライを含む）の計測値
+- Telemetry: 計測値を JSON Lines に書き出し、フェーズ別の集計・クリティカルパス・チャンクの makespan と下限・推定費用をまとめる
+- telemetry_scope / call_context: 記録先と「どのフェーズのどのチャンクか」を呼び出し側から引き継ぐ
+  （deadline_scope と同様に asyncio タスクへ引き継がれる）
+"""
+import json
+import time
+import threading
+import contextvars
+from pathlib import Path
+from contextlib import contextmanager
+
+from .constants import LLM_INPUT_PRICE_PER_MILLION, LLM_OUTPUT_PRICE_PER_MILLION
+from .scheduling import schedule_stats
+
+
+_active_telemetry: contextvars.ContextVar["Telemetry | None"] = contextvars.ContextVar("telemetry", default=None)
+_call_context: contextvars.ContextVar[dict] = contextvars.ContextVar("llm_call_context", default={})
+
+
+@contextmanager
+def telemetry_scope(telemetry: "Telemetry | None"):
+    """このスコープ内の LLM 呼び出しを telemetry に記録する"""
+    token = _active_telemetry.set(telemetry)
+    try:
+        yield telemetry
+    finally:
+        _active_telemetry.reset(token)
+
+
+def current_telemetry() -> "Telemetry | None":
+    """現在のスコープの記録先。なければ None"""
+    return _active_telemetry.get()
+
+
+@contextmanager
+def call_context(**fields):
+    """このスコープ内の LLM 呼び出しの記録に付与する項目（phase, chunk_id など）を設定する"""
+    token = _call_context.set({**_call_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _call_context.reset(token)
+
+
+def current_call_context() -> dict:
+    """現在のスコープの call_context の項目"""
+    return _call_context.get()
+
+
+def _int_or_zero(value) -> int:
+    return value if isinstance(value, int) else 0
+
+
+class CallStats:
+    """1回の LLM 呼び出し（リトライ・フェイルオーバーを含む）の計測値"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.finished: float | None = None
+        self.attempts = 0
+        self.queue_wait = 0.0   # レートリミッタの枠待ち（秒、全試行の合計）
+        self.latency = 0.0      # API 呼び出しの所要時間（秒、全試行の合計）
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.finish_reason: str | None = None
+        self.model: str | None = None
+        self.endpoint: str | None = None
+        self.cached = False
+        self.error: str | None = None
+        self._attempt_started: float | None = None
+
+    @property
+    def retries(self) -> int:
+        return max(0, self.attempts - 1)
+
+    def start_attempt(self, model: str, endpoint: str | None = None) -> None:
+        """API への送信直前に呼ぶ"""
+        self.attempts += 1
+        self.model = model
+        self.endpoint = endpoint
+        self._attempt_started = time.monotonic()
+
+    def end_attempt(self, usage=None, finish_reason: str | None = None) -> None:
+        """応答の受信後（または失敗時）に呼び、レイテンシ・トークン数・終了理由を記録する"""
+        if self._attempt_started is not None:
+            self.latency += time.monotonic() - self._attempt_started
+            self._attempt_started = None
+        self.add_usage(usage)
+        if finish_reason is not None:
+            self.finish_reason = finish_reason
+
+    def add_usage(self, usage) -> None:
+        """usage_metadata のトークン数を記録する（思考トークンは出力として課金されるため出力に含める）"""
+        if usage is None:
+            return
+        prompt_tokens = _int_or_zero(getattr(usage, "prompt_token_count", None))
+        response_tokens = (
+            _int_or_zero(getattr(usage, "candidates_token_count", None))
+            + _int_or_zero(getattr(usage, "thoughts_token_count", None))
+        )
+        # ストリーミングでは累積値が断片ごとに届くため、大きい方を採用する
+        self.prompt_tokens = max(self.prompt_tokens, prompt_tokens)
+        self.response_tokens = max(self.response_tokens, response_tokens)
+
+
+class Telemetry:
+    """
+    LLM 呼び出しの計測値を集める
+
+    path を指定した場合は1呼び出しにつき1行の JSON として書き出す（ファイルは作成時に空にする）。
+    """
+
+    def __init__(self, path: str | Path | None = None,
+                 input_price_per_million: float = LLM_INPUT_PRICE_PER_MILLION,
+                 output_price_per_million: float = LLM_OUTPUT_PRICE_PER_MILLION):
+        """
+        Args:
+            path: 書き出し先の JSON Lines ファイル。None の場合はメモリ上にのみ保持
+            input_price_per_million: 入力 100 万トークンあたりの料金（ドル）
+            output_price_per_million: 出力 100 万トークンあたりの料金（ドル）
+        """
+        self.path = Path(path) if path is not None else None
+        self.input_price_per_million = input_price_per_million
+        self.output_price_per_million = output_price_per_million
+        self.records: list[dict] = []
+        self.phases: dict[str, tuple[float, float]] = {}  # フェーズ名 -> (開始, 終了)（run 開始からの秒）
+        self._origin = time.monotonic()
+        self._lock = threading.Lock()
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text("", encoding="utf-8")
+
+    def cost(self, prompt_tokens: int, response_tokens: int) -> float:
+        """推定費用（ドル）"""
+        return (
+            prompt_tokens * self.input_price_per_million
+            + response_tokens * self.output_price_per_million
+        ) / 1_000_000
+
+    @contextmanager
+    def phase(self, name: str):
+        """フェーズの経過時間を計測し、スコープ内の呼び出しを phase 付きでこのテレメトリに記録する"""
+        started = time.monotonic() - self._origin
+        try:
+            with telemetry_scope(self), call_context(phase=name):
+                yield
+        finally:
+            self.phases[name] = (started, time.monotonic() - self._origin)
+
+    def record(self, stats: CallStats) -> dict:
+        """呼び出し1回分の計測値を記録する"""
+        finished = stats.finished if stats.finished is not None else time.monotonic()
+        context = _call_context.get()
+        entry = {
+            "phase": context.get("phase"),
+            "chunk_id": context.get("chunk_id"),
+            "model": stats.model,
+            "endpoint": stats.endpoint,
+            "started": round(stats.started - self._origin, 3),
+            "duration": round(finished - stats.started, 3),
+            "queue_wait": round(stats.queue_wait, 3),
+            "latency": round(stats.latency, 3),
+            "retries": stats.retries,
+            "prompt_tokens": stats.prompt_tokens,
+            "response_tokens": stats.response_tokens,
+            "finish_reason": stats.finish_reason,
+            "cached": stats.cached,
+            "error": stats.error,
+            "cost_usd": round(self.cost(stats.prompt_tokens, stats.response_tokens), 6),
+        }
+        with self._lock:
+            self.records.append(entry)
+            if self.path is not None:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return entry
+
+    def summary(self) -> dict:
+        """
+        フェーズ別の集計とクリティカルパスを返す
+
+        フェーズは順に実行されるため、実行全体のクリティカルパスは各フェーズで最後に終わった呼び出しの連なりになる。
+        チャンク（chunk_id 付き）の呼び出しが複数あるフェーズには、その makespan と理論上の下限（schedule）を付ける。
+        """
+        with self._lock:
+            records = list(self.records)
+
+        phases: dict[str, dict] = {}
+        for name in list(self.phases) + [r["phase"] or "-" for r in records]:
+            phases.setdefault(name, {
+                "calls": 0, "cached": 0, "retries": 0, "prompt_tokens": 0, "response_tokens": 0,
+                "queue_wait": 0.0, "latency": 0.0, "cost_usd": 0.0, "wall": 0.0, "critical_call": None,
+                "schedule": None,
+            })
+
+        for r in records:
+            p = phases[r["phase"] or "-"]
+            p["calls"] += 1
+            p["cached"] += int(r["cached"])
+            p["retries"] += r["retries"]
+            p["prompt_tokens"] += r["prompt_tokens"]
+            p["response_tokens"] += r["response_tokens"]
+            p["queue_wait"] += r["queue_wait"]
+            p["latency"] += r["latency"]
+            p["cost_usd"] += r["cost_usd"]
+            critical = p["critical_call"]
+            if critical is None or r["started"] + r["duration"] > critical["started"] + critical["duration"]:
+                p["critical_call"] = r
+
+        for name, p in phases.items():
+            if name in self.phases:
+                started, finished = self.phases[name]
+                p["wall"] = finished - started
+            elif p["critical_call"] is not None:
+                first = min(r["started"] for r in records if (r["phase"] or "-") == name)
+                last = p["critical_call"]
+                p["wall"] = last["started"] + last["duration"] - first
+
+            # 枠待ちを除いた処理区間（リトライの待機は処理時間に含める）
+            p["schedule"] = schedule_stats([
+                (r["started"] + r["queue_wait"], r["started"] + r["duration"])
+                for r in records if (r["phase"] or "-") == name and r["chunk_id"] is not None
+            ])
+
+        critical_path = [
+            {"phase": name, "wall": p["wall"], "call": p["critical_call"]}
+            for name, p in phases.items()
+        ]
+        return {
+            "phases": phases,
+            "critical_path": critical_path,
+            "calls": sum(p["calls"] for p in phases.values()),
+            "prompt_tokens": sum(p["prompt_tokens"] for p in phases.values()),
+            "response_tokens": sum(p["response_tokens"] for p in phases.values()),
+            "cost_usd": sum(p["cost_usd"] for p in phases.values()),
+            "wall": sum(p["wall"] for p in phases.values()),
+        }
+
+    def format_report(self) -> str:
+        """実行レポート（フェーズ別内訳・クリティカルパス・推定費用）の文字列"""
+        summary = self.summary()
+        row = "{:<14}{:>7}{:>9}{:>11}{:>11}{:>9}{:>9}{:>9}{:>10}"
+        lines = [
+            "=== 実行レポート ===",
+            row.format("phase", "calls", "retries", "in_tok", "out_tok", "queue_s", "api_s", "wall_s", "cost_$"),
+        ]
+        for name, p in summary["phases"].items():
+            lines.append(row.format(
+                name, p["calls"], p["retries"], p["prompt_tokens"], p["response_tokens"],
+                f"{p['queue_wait']:.1f}", f"{p['latency']:.1f}", f"{p['wall']:.1f}", f"{p['cost_usd']:.4f}",
+            ))
+        lines.append(row.format(
+            "total", summary["calls"], "", summary["prompt_tokens"], summary["response_tokens"],
+            "", "", f"{summary['wall']:.1f}", f"{summary['cost_usd']:.4f}",
+        ))
+
+        steps = []
+        for step in summary["critical_path"]:
+            call = step["call"]
+            if call is None:
+                steps.append(f"{step['phase']} {step['wall']:.1f}s")
+                continue
+            chunk = f" チャンク{call['chunk_id']}" if call["chunk_id"] is not None else ""
+            steps.append(
+                f"{step['phase']} {step['wall']:.1f}s"
+                f"（最長{chunk}: 待機 {call['queue_wait']:.1f}s + 通信 {call['latency']:.1f}s, 再試行 {call['retries']}）"
+            )
+        lines.append("クリティカルパス: " + " → ".join(steps))
+        for name, p in summary["phases"].items():
+            schedule = p["schedule"]
+            if schedule is not None:
+                lines.append(
+                    f"{name} のチャンク: makespan {schedule['makespan']:.1f}s / 下限 {schedule['lower_bound']:.1f}s"
+                    f"（並列 {schedule['workers']}, 効率 {schedule['efficiency']:.0%}）"
+                )
+        if self.path is not None:
+            lines.append(f"呼び出しごとの記録: {self.path}")
+        return "\n".join(lines)
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+TokenEstimator: API を呼ばずにテキストのトークン数を見積もる
+
+- 文字種（ラテン文字・CJK・かな等）ごとの「1トークンあたり文字数」で概算
+- 任意で count_tokens API による正確な値を取得（チャンクごとにキャッシュ）し、
+  概算の補正係数を実測値で更新する
+"""
+import re
+import string
+import hashlib
+import threading
+from typing import Callable
+
+from .constants import MAX_OUTPUT_TOKENS, OUTPUT_TOKEN_SAFETY_RATIO
+from .progress import emit, Notice
+
+
+class TokenEstimator:
+    """文字種別の較正済みモデルによるトークン数推定器"""
+
+    # 1トークンあたりの文字数（Gemini のトークナイザで英語論文・日本語訳を計測した目安）
+    CHARS_PER_TOKEN = {
+        "latin": 4.0,       # 英字・数字
+        "space": 8.0,       # 空白・改行（単語境界にまとめて吸収されることが多い）
+        "punct": 1.5,       # ASCII 記号（Markdown の # や - を含む）
+        "cjk": 1.2,         # 漢字
+        "kana": 1.6,        # ひらがな・カタカナ
+        "hangul": 1.5,
+        "other": 2.0,       # その他（アクセント付き文字・全角記号など）
+    }
+
+    def __init__(self, counter: Callable[[str], int] | None = None):
+        """
+        Args:
+            counter: 正確なトークン数を返す関数（例: LLMProcessor.count_tokens）。
+                     指定した場合、count() はこの関数の結果をチャンクごとにキャッシュして返す
+        """
+        self.counter = counter
+        self.correction = 1.0  # 実測値に基づく補正係数
+        self._exact_cache: dict[str, int] = {}
+        self._observed_exact = 0
+        self._observed_raw = 0.0
+        self._lock = threading.Lock()
+
+    _LATIN_BYTES = (string.ascii_letters + string.digits).encode("ascii")
+    _SPACE_BYTES = string.whitespace.encode("ascii")
+    _NON_ASCII_RE = re.compile(r"[^\x00-\x7F]+")
+    # 非ASCII文字の文字種（連続部分にマッチ）。いずれにも該当しない文字は "other"
+    _NON_ASCII_SCRIPTS = {
+        "cjk": re.compile(r"[\u3400-\u4DBF\u4E00-\u9FFF\uF900-\uFAFF]+"),
+        "kana": re.compile(r"[\u3040-\u30FF\uFF66-\uFF9F]+"),
+        "hangul": re.compile(r"[\uAC00-\uD7AF]+"),
+    }
+
+    def _raw_estimate(self, text: str) -> float:
+        # 書籍サイズの入力でも高速に数えられるよう、ASCII 部分は bytes.translate で文字種を数える
+        if text.isascii():
+            ascii_part = text.encode("ascii")
+            non_ascii = ""
+        else:
+            ascii_part = self._NON_ASCII_RE.sub("", text).encode("ascii")
+            non_ascii = "".join(self._NON_ASCII_RE.findall(text))
+
+        latin = len(ascii_part) - len(ascii_part.translate(None, self._LATIN_BYTES))
+        space = len(ascii_part) - len(ascii_part.translate(None, self._SPACE_BYTES))
+        counts = {"latin": latin, "space": space, "punct": len(ascii_part) - latin - space}
+
+        remaining = len(non_ascii)
+        for script, pattern in self._NON_ASCII_SCRIPTS.items():
+            n = sum(len(run) for run in pattern.findall(non_ascii))
+            counts[script] = n
+            remaining -= n
+        counts["other"] = remaining
+
+        return sum(n / self.CHARS_PER_TOKEN[script] for script, n in counts.items())
+
+    def estimate(self, text: str) -> int:
+        """ローカルのモデルでトークン数を概算する（API 呼び出しなし）"""
+        if not text:
+            return 0
+        return int(self._raw_estimate(text) * self.correction) + 1
+
+    def count(self, text: str) -> int:
+        """
+        トークン数を返す。counter があれば正確な値（チャンクごとにキャッシュ）、なければ概算値
+
+        counter は同期のネットワーク呼び出しになりうるため、非同期の処理からはスレッドで呼ぶこと。
+        """
+        if self.counter is None or not text:
+            return self.estimate(text)
+
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            cached = self._exact_cache.get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            exact = self.counter(text)
+        except Exception as e:
+            emit(Notice(f"count_tokens に失敗したため概算値を使用します: {e}", warning=True))
+            return self.estimate(text)
+
+        with self._lock:
+            self._exact_cache[key] = exact
+            # 実測値で補正係数を更新する
+            self._observed_exact += exact
+            self._observed_raw += self._raw_estimate(text)
+            if self._observed_raw > 0:
+                self.correction = self._observed_exact / self._observed_raw
+        return exact
+
+    def chunk_cost(self, text: str, output_ratio: float, exact: bool = True) -> tuple[int, int]:
+        """
+        チャンクの（入力トークン数, 予想出力トークン数）を返す
+
+        Args:
+            text: チャンク本文
+            output_ratio: 入力トークン数に対する出力トークン数の比（英→日の膨張率など）
+            exact: False の場合は counter を使わず概算のみ
+        """
+        input_tokens = self.count(text) if exact else self.estimate(text)
+        return input_tokens, int(input_tokens * output_ratio) + 1
+
+    def fits(self, text: str, max_tokens: int, output_ratio: float, exact: bool = True) -> bool:
+        """
+        チャンクが予算内に収まるか判定する
+
+        入力+出力の合計が max_tokens 以下で、かつ出力が安全マージン込みの出力上限以下であること。
+        """
+        input_tokens, output_tokens = self.chunk_cost(text, output_ratio, exact)
+        return (
+            input_tokens + output_tokens <= max_tokens
+            and output_tokens <= MAX_OUTPUT_TOKENS * OUTPUT_TOKEN_SAFETY_RATIO
+        )
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+TranslationMemory: 文書をまたいだ段落単位の翻訳メモリ（SQLite）
+
+方法の説明・倫理に関する記述・データセットの説明など、論文間で共通する定型の段落を毎回翻訳し直さないよう、
+完了した翻訳の「原文の段落 → 訳文の段落」を保存し、翻訳の前に照合する。
+
+- 完全一致: 正規化（NFKC・空白の圧縮。大文字と小文字は区別する）した原文のハッシュで引く。訳文をそのまま再利用する（見出しも含む）。
+  保存時の文脈（段落に付与する用語集の行・プロンプト・モデルのハッシュ）が一致する場合に限る
+- 類似: TRANSLATION_MEMORY_MIN_CHARS 文字以上の本文の段落について、単語 3-gram の MinHash（64 個）を
+  16 バンドに分けた LSH で候補を引き、推定 Jaccard 係数が TRANSLATION_MEMORY_FUZZY_THRESHOLD 以上の段落の訳を
+  参考訳としてプロンプトに付与する
+- 保存: 翻訳結果の段落数が原文と同じで、どの段落の組も長さの比が妥当なチャンクだけ、段落ごとに対応づけて保存する
+  （段落の統合と分割が重なると段落数は合っても対応がずれるため）
+"""
+import re
+import time
+import array
+import random
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from .constants import (
+    TRANSLATION_MEMORY_FUZZY_THRESHOLD, TRANSLATION_MEMORY_MIN_CHARS, TRANSLATION_MEMORY_MAX_LENGTH_RATIO,
+    TRANSLATION_OUTPUT_RATIO
+)
+from .token_estimator import TokenEstimator
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240611)
+# 固定の乱数で作るハッシュ関数の係数（保存した署名と照合するため、プロセスをまたいで同じ値にする）
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def normalize(text: str) -> str:
+    """照合用の正規化（NFKC・空白の圧縮）。略語や固有名詞を区別するため大文字と小文字はそのまま"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def paragraphs(text: str) -> List[str]:
+    """空行で区切った段落（空の段落は除く）"""
+    return [p.strip("\n") for p in text.split("\n\n") if p.strip()]
+
+
+def minhash(text: str) -> List[int]:
+    """正規化して小文字にした文の単語 3-gram の MinHash 署名"""
+    words = re.findall(r"\w+", normalize(text).lower())
+    shingles = {" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+    values = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles]
+    return [min((a * x + b) % _PRIME for x in values) for a, b in _PERMUTATIONS]
+
+
+def _no_context(text: str) -> str:
+    return ""
+
+
+def _bands(signature: List[int]) -> List[bytes]:
+    return [
+        hashlib.blake2b(array.array("Q", signature[i * ROWS:(i + 1) * ROWS]).tobytes(), digest_size=8).digest()
+        for i in range(BANDS)
+    ]
+
+
+class MemoryPlan:
+    """
+    チャンクの段落ごとの照合結果
+
+    hits[i] は段落 i の完全一致の訳（なければ None）。references は類似段落の (原文, 訳文)。
+    """
+
+    def __init__(self, chunk: str, hits: List[Optional[str]], references: List[Tuple[str, str]]):
+        self.paragraphs = paragraphs(chunk)
+        self.hits = hits
+        self.references = references
+
+    @property
+    def complete(self) -> bool:
+        """すべての段落が完全一致（API を呼ばずに再利用できる）"""
+        return bool(self.hits) and all(h is not None for h in self.hits)
+
+    @property
+    def partial(self) -> bool:
+        return any(h is not None for h in self.hits) and not self.complete
+
+    @property
+    def reused(self) -> int:
+        return sum(h is not None for h in self.hits)
+
+    def source_text(self) -> str:
+        """翻訳に送る本文（完全一致した段落を除く）"""
+        return "\n\n".join(p for p, h in zip(self.paragraphs, self.hits) if h is None)
+
+    def merge(self, translated: Optional[str] = None) -> Optional[str]:
+        """
+        完全一致の訳と、残りの段落の訳 translated を元の順序で結合する
+
+        translated の段落数が送った段落数と異なる場合は対応が取れないため None。
+        """
+        pieces = paragraphs(translated) if translated is not None else []
+        if len(pieces) != len(self.hits) - self.reused:
+            return None
+        it = iter(pieces)
+        return "\n\n".join(h if h is not None else next(it) for h in self.hits)
+
+
+class TranslationMemory:
+    """
+    段落単位の翻訳メモリを SQLite に保存する
+
+    同一プロセス内の複数スレッドから利用できるよう、接続はロックで保護する。
+    """
+
+    SCHEMA_VERSION = 2
+    LENGTH_SLACK_TOKENS = 4  # 長さの比の判定で許す誤差（短い見出しは比が大きく揺れるため）
+
+    def __init__(self, path: str | Path, min_chars: int = TRANSLATION_MEMORY_MIN_CHARS,
+                 fuzzy_threshold: float = TRANSLATION_MEMORY_FUZZY_THRESHOLD,
+                 max_length_ratio: float = TRANSLATION_MEMORY_MAX_LENGTH_RATIO):
+        """
+        Args:
+            path: SQLite ファイルのパス（親ディレクトリは自動作成）
+            min_chars: 類似段落として扱う最小文字数（見出しや短い行は類似しても訳の参考にならない）
+            fuzzy_threshold: 参考訳とする推定 Jaccard 係数の下限
+            max_length_ratio: 訳文のトークン数が予想（原文 × TRANSLATION_OUTPUT_RATIO）から外れてよい倍率
+        """
+        self.path = Path(path)
+        self.min_chars = min_chars
+        self.fuzzy_threshold = fuzzy_threshold
+        self.max_length_ratio = max_length_ratio
+        self.token_estimator = TokenEstimator()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS segments (
+                key TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                context TEXT NOT NULL DEFAULT '',
+                signature BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS lsh (band INTEGER NOT NULL, bucket BLOB NOT NULL, key TEXT NOT NULL, "
+            "PRIMARY KEY (band, bucket, key))"
+        )
+        self._migrate()
+        self._conn.commit()
+
+    def _migrate(self) -> None:
+        """
+        以前の形式を更新する（以前の訳は完全一致では再利用せず、参考訳にだけ使う）
+
+        版 1 までは文脈の列がなく、キーは小文字化した原文のハッシュだった。
+        """
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] >= self.SCHEMA_VERSION:
+            return
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(segments)")]
+        if "context" not in columns:
+            self._conn.execute("ALTER TABLE segments ADD COLUMN context TEXT NOT NULL DEFAULT ''")
+            # 署名のない段落がすべて入っていた空の署名のバケットを削除する
+            self._conn.execute("DELETE FROM lsh WHERE bucket = ?", (_bands([])[0],))
+        self._conn.execute("UPDATE segments SET context = 'legacy'")
+        self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    @staticmethod
+    def make_key(text: str) -> str:
+        """正規化した原文のハッシュ"""
+        return hashlib.sha256(normalize(text).encode("utf-8")).hexdigest()
+
+    def _fuzzy(self, text: str) -> bool:
+        """類似段落の照合の対象か（見出しと短い段落は除く）"""
+        return len(normalize(text)) >= self.min_chars and not text.lstrip().startswith("#")
+
+    def lookup(self, text: str, context: str = "") -> Optional[str]:
+        """完全一致の訳（なければ、または保存時の文脈が異なれば None）"""
+        key = self.make_key(text)
+        with self._lock:
+            translation = self._exact(key, context)
+            if translation is not None:
+                self._touch([key])
+        return translation
+
+    def _exact(self, key: str, context: str) -> Optional[str]:
+        row = self._conn.execute("SELECT translation, context FROM segments WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None and row[1] == context else None
+
+    def _touch(self, keys: List[str]) -> None:
+        """使用日時をまとめて更新する（コミットは1回）"""
+        now = time.time()
+        self._conn.executemany("UPDATE segments SET used_at = ? WHERE key = ?", [(now, key) for key in keys])
+        self._conn.commit()
+
+    def similar(self, text: str, limit: int = 1) -> List[Tuple[float, str, str]]:
+        """類似段落の (推定 Jaccard 係数, 原文, 訳文)。係数の大きい順に limit 件"""
+        if not self._fuzzy(text):
+            return []
+        signature = minhash(text)
+        key = self.make_key(text)
+        with self._lock:
+            candidates = set()
+            for band, bucket in enumerate(_bands(signature)):
+                rows = self._conn.execute("SELECT key FROM lsh WHERE band = ? AND bucket = ?", (band, bucket)).fetchall()
+                candidates.update(row[0] for row in rows)
+            candidates.discard(key)
+            results = []
+            for candidate in candidates:
+                row = self._conn.execute(
+                    "SELECT source, translation, signature FROM segments WHERE key = ?", (candidate,)
+                ).fetchone()
+                if row is None:
+                    continue
+                stored = array.array("Q", row[2])
+                score = sum(a == b for a, b in zip(signature, stored)) / NUM_PERM
+                if score >= self.fuzzy_threshold:
+                    results.append((score, row[0], row[1]))
+        results.sort(key=lambda r: -r[0])
+        return results[:limit]
+
+    def plan(self, chunk: str, max_references: int, context_of: Callable[[str], str] = _no_context) -> MemoryPlan:
+        """
+        チャンクの段落ごとに完全一致を引き、一致しなかった段落の類似段落を最大 max_references 件集める
+
+        context_of は段落の文脈（用語集の行・プロンプト・モデルのハッシュ）を返す。類似段落は文脈によらず参考訳にする。
+        """
+        pieces = paragraphs(chunk)
+        keys = [self.make_key(p) for p in pieces]
+        contexts = [context_of(p) for p in pieces]
+        with self._lock:
+            hits = [self._exact(key, context) for key, context in zip(keys, contexts)]
+            used = [key for key, hit in zip(keys, hits) if hit is not None]
+            if used:
+                self._touch(used)
+        references: List[Tuple[str, str]] = []
+        for piece, hit in zip(pieces, hits):
+            if len(references) >= max_references:
+                break
+            if hit is None:
+                references.extend((source, translation) for _, source, translation in self.similar(piece))
+        return MemoryPlan(chunk, hits, references[:max_references])
+
+    def add(self, pairs: Iterable[Tuple[str, str]], context_of: Callable[[str], str] = _no_context) -> int:
+        """(原文の段落, 訳文の段落) を文脈とともに保存する（同じ原文は新しい訳で置き換える）。保存した件数を返す"""
+        now = time.time()
+        rows = []
+        for source, translation in pairs:
+            if not normalize(source) or not translation.strip():
+                continue
+            signature = minhash(source) if self._fuzzy(source) else []
+            rows.append((self.make_key(source), source, translation, context_of(source), signature))
+        with self._lock:
+            for key, source, translation, context, signature in rows:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO segments (key, source, translation, context, signature, created_at, used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, source, translation, context, array.array("Q", signature).tobytes(), now, now),
+                )
+                if not signature:
+                    continue
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO lsh (band, bucket, key) VALUES (?, ?, ?)",
+                    [(band, bucket, key) for band, bucket in enumerate(_bands(signature))],
+                )
+            self._conn.commit()
+        return len(rows)
+
+    def _plausible(self, source: str, translation: str) -> bool:
+        """訳文の長さが原文に対して妥当か"""
+        expected = self.token_estimator.estimate(source) * TRANSLATION_OUTPUT_RATIO
+        actual = self.token_estimator.estimate(translation)
+        slack = self.LENGTH_SLACK_TOKENS
+        return expected / self.max_length_ratio - slack <= actual <= expected * self.max_length_ratio + slack
+
+    def add_translation(self, chunk: str, translated: str, context_of: Callable[[str], str] = _no_context) -> int:
+        """チャンクとその訳を段落ごとに対応づけて保存する（段落数が異なる・長さの比が妥当でない組がある場合は保存しない）"""
+        sources, targets = paragraphs(chunk), paragraphs(translated)
+        if len(sources) != len(targets):
+            return 0
+        if not all(self._plausible(source, target) for source, target in zip(sources, targets)):
+            return 0
+        return self.add(zip(sources, targets), context_of)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+
+    def close(self) -> None:
+        """接続を閉じる"""
+        with self._lock:
+            self._conn.close()
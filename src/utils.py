@@ -2,10 +2,62 @@
 """
 utils.py: 汎用ユーティリティ（ファイルIO、辞書読み込み、Workflowy形式への整形）
 """
+import os
 import re
 import csv
+import tempfile
 from pathlib import Path
 
+from .markdown_index import MarkdownIndex
+
+# レジュメの見出しの分類（extract_structure_from_resume と ResumeContext で共有）
+# 分析項目
+RESUME_ANALYSIS_KEYWORDS = ["リサーチ・クエスチョン", "核心的主張", "中心的な主張", "論理展開"]
+# 物理的に除外したいセクション（ただし Abstract, Notes は含めない）
+RESUME_EXCLUDE_SECTIONS = ["References", "Bibliography", "Acknowledgements", "Index", "参考文献", "謝辞"]
+
+
+class SectionFilter:
+    """
+    remove_unwanted_sections の行単位の判定
+
+    除外キーワードを含む見出しから、同じかより浅いレベルの次の見出しまでを除く。
+    'Abstract' と 'Notes' は除外キーワードに含まれていても保護する。
+    状態を行ごとに更新するため、ストリーミングで届く Markdown にもそのまま適用できる。
+    """
+
+    # 保護すべきキーワード
+    PROTECTED = {"abstract", "notes", "注釈", "抄録"}
+    HEADING_RE = re.compile(r'^(#{1,10})\s+(.*)')
+
+    def __init__(self, exclude_keywords: list[str]):
+        self.exclude_keywords = [kw.lower() for kw in exclude_keywords]
+        self.skipping = False
+        self.current_skip_level = 0
+
+    def accept(self, line: str) -> bool:
+        """この行を残す場合は True"""
+        header_match = self.HEADING_RE.match(line.strip())
+
+        if header_match:
+            level = len(header_match.group(1))
+            title = header_match.group(2).lower()
+
+            # スキップ判定
+            should_exclude = any(kw in title for kw in self.exclude_keywords)
+            is_protected = any(p in title for p in self.PROTECTED)
+
+            if should_exclude and not is_protected:
+                self.skipping = True
+                self.current_skip_level = level
+                return False
+            # 新しい見出しが、スキップ中の見出しレベルと同じかそれより浅い場合はスキップ終了
+            if self.skipping and level <= self.current_skip_level:
+                self.skipping = False
+
+        return not self.skipping
+
+
 class Utils:
     """ユーティリティクラス"""
 
@@ -29,23 +81,17 @@ class Utils:
         lines = resume_text.splitlines()
         outline_lines = []
         
-        # フィルタリング用のキーワード
-        # 分析項目
-        analysis_keywords = ["リサーチ・クエスチョン", "核心的主張", "中心的な主張", "論理展開"]
-        # 物理的に除外したいセクション（ただし Abstract, Notes は含めない）
-        exclude_sections = ["References", "Bibliography", "Acknowledgements", "Index", "参考文献", "謝辞"]
-        
         for line in lines:
             stripped = line.strip()
             
             # 見出し行（# で始まる行）のみを対象とする
             if stripped.startswith('#'):
                 # 1. 分析項目を含む見出しは除外
-                if any(kw in stripped for kw in analysis_keywords):
+                if any(kw in stripped for kw in RESUME_ANALYSIS_KEYWORDS):
                     continue
                 
                 # 2. 参考文献などの不要セクションを除外
-                if any(kw.lower() in stripped.lower() for kw in exclude_sections):
+                if any(kw.lower() in stripped.lower() for kw in RESUME_EXCLUDE_SECTIONS):
                     continue
                 
                 outline_lines.append(stripped)
@@ -61,41 +107,8 @@ class Utils:
         if not markdown_text:
             return ""
 
-        # 保護すべきキーワード
-        protected = {"abstract", "notes", "注釈", "抄録"}
-        
-        lines = markdown_text.splitlines()
-        new_lines = []
-        skipping = False
-        current_skip_level = 0
-
-        heading_re = re.compile(r'^(#{1,10})\s+(.*)')
-
-        for line in lines:
-            stripped = line.strip()
-            header_match = heading_re.match(stripped)
-
-            if header_match:
-                level = len(header_match.group(1))
-                title = header_match.group(2).lower()
-
-                # スキップ判定
-                should_exclude = any(kw.lower() in title for kw in exclude_keywords)
-                is_protected = any(p in title for p in protected)
-
-                if should_exclude and not is_protected:
-                    skipping = True
-                    current_skip_level = level
-                    continue
-                else:
-                    # 新しい見出しが、スキップ中の見出しレベルと同じかそれより浅い場合はスキップ終了
-                    if skipping and level <= current_skip_level:
-                        skipping = False
-            
-            if not skipping:
-                new_lines.append(line)
-
-        return "\n".join(new_lines).strip()
+        # 判定の状態が変わるのは見出しの行だけなので、見出しの索引から残す範囲をスライスで集める
+        return MarkdownIndex(markdown_text).filter_sections(SectionFilter(exclude_keywords))
 
 
     @staticmethod
@@ -110,14 +123,40 @@ class Utils:
         path.parent.mkdir(parents=True, exist_ok=True)
         path.write_text(content, encoding="utf-8")
 
+    @staticmethod
+    def write_text_file_atomic(path: str | Path, content: str) -> None:
+        """
+        テキストファイルを原子的に書き込む。
+        同じディレクトリの一時ファイルへ書いて fsync してから置き換えるため、中断されても書きかけのファイルが残らない。
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
     @staticmethod
     def load_glossary(path: str | Path) -> str:
         """
         glossary.csv を読み込み、プロンプト挿入用のテキスト形式に変換する。
         """
+        return "\n".join(f"{term}: {translation}" for term, translation in Utils.load_glossary_entries(path))
+
+    @staticmethod
+    def load_glossary_entries(path: str | Path) -> list[tuple[str, str]]:
+        """
+        glossary.csv を (用語, 訳語) の組のリストとして読み込む。
+        """
         path = Path(path)
         if not path.exists():
-            return ""
+            return []
         
         glossary_items = []
         try:
@@ -126,11 +165,11 @@ class Utils:
                 for row in reader:
                     if len(row) >= 2:
                         # 用語, 訳語 の形式を想定
-                        glossary_items.append(f"{row[0].strip()}: {row[1].strip()}")
-            return "\n".join(glossary_items)
+                        glossary_items.append((row[0].strip(), row[1].strip()))
+            return glossary_items
         except Exception as e:
             print(f"Warning: Failed to load glossary: {e}")
-            return ""
+            return []
 
     @staticmethod
     def normalize_markdown_headings(markdown_text: str) -> str:
@@ -0,0 +1,99 @@
+"""
+テスト共通のフィクスチャとテスト用バックエンド
+
+- FakeBackend: LLMBackend プロトコルを満たすテスト用バックエンド（respond / arespond を上書きして使う）
+- target_text: 翻訳プロンプトから [Target Text] の本文を取り出す
+- llm_response: google.genai の応答を模した MagicMock
+- processor: ネットワークに出ない LLMProcessor
+"""
+import pytest
+from unittest.mock import MagicMock
+
+from src.hedging import notify_request_started
+from src.llm_stream import LLMStream
+
+RESUME = "# リサーチ・クエスチョン\n問い\n# ## Introduction：導入"
+STRUCTURED = "# Paper Title\n\n## Introduction\nThis is the intro.\n\n## Method\nWe did things."
+TRANSLATION = "## 翻訳\nこれは翻訳です。"
+
+
+def target_text(prompt: str) -> str:
+    """翻訳プロンプトの [Target Text] の本文"""
+    return prompt.rsplit("[Target Text]", 1)[1].rsplit("[Glossary Instructions]", 1)[0].strip()
+
+
+class FakeBackend:
+    """
+    受け取ったプロンプトを記録し、respond(prompt) の結果を返すテスト用バックエンド
+
+    既定ではプロンプトの種類（要約・構造化・翻訳）に応じた固定の応答を返す。
+    astream_api は応答全体を1つの断片として返す。
+    """
+
+    model_name = "fake-model"
+
+    def __init__(self):
+        self.prompts = []
+
+    @property
+    def calls(self) -> int:
+        return len(self.prompts)
+
+    def respond(self, prompt: str) -> str:
+        if "Summary Outline" in prompt:
+            return STRUCTURED
+        if "[Target Text]" in prompt:
+            return TRANSLATION
+        return RESUME
+
+    async def arespond(self, prompt: str) -> str:
+        return self.respond(prompt)
+
+    def call_api(self, prompt, progress_callback=None):
+        self.prompts.append(prompt)
+        return self.respond(prompt)
+
+    async def acall_api(self, prompt, progress_callback=None, dedupe=True):
+        self.prompts.append(prompt)
+        notify_request_started()
+        return await self.arespond(prompt)
+
+    def astream_api(self, prompt, progress_callback=None):
+        async def fragments(stream):
+            text = await self.acall_api(prompt)
+            stream.finish_reason = "STOP"
+            yield text
+        return LLMStream(fragments)
+
+    async def aclose(self):
+        return None
+
+
+def llm_response(text, finish_reason="STOP", prompt_tokens=None, response_tokens=None):
+    """generate_content の応答を模した MagicMock（トークン数を指定すると usage_metadata を付ける）"""
+    response = MagicMock()
+    response.text = text
+    response.prompt_feedback = None
+    response.candidates = [MagicMock(finish_reason=finish_reason)]
+    response.usage_metadata = None
+    if prompt_tokens is not None:
+        response.usage_metadata = MagicMock(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=response_tokens,
+            thoughts_token_count=None,
+            total_token_count=prompt_tokens + (response_tokens or 0),
+        )
+    return response
+
+
+@pytest.fixture
+def processor(monkeypatch):
+    """ネットワークに出ない LLMProcessor を用意する"""
+    from src.llm_processor import LLMProcessor
+    from src.rate_limiter import RateLimiter
+
+    monkeypatch.setenv("GOOGLE_API_KEY", "dummy_key")
+    proc = LLMProcessor(use_cache=False, rate_limiter=RateLimiter())
+    proc.retry_policy.base_delay = 0
+    proc.client = MagicMock()
+    return proc
@@ -0,0 +1,66 @@
+import asyncio
+import pytest
+from conftest import FakeBackend
+from src.skills import PaperProcessorSkills
+from src.main import collect_inputs, is_batch_input, run_batch
+
+
+class BatchBackend(FakeBackend):
+    """「FAIL」を含む文書の要約で失敗し、翻訳は他の文書の要約が始まるまで待つテスト用バックエンド"""
+
+    def __init__(self):
+        super().__init__()
+        self.resume_calls = 0
+        self.second_resume_started = asyncio.Event()
+
+    async def arespond(self, prompt):
+        if "[Target Text]" in prompt:
+            # 文書をまたいで Phase 1 と Phase 3 が重ならなければここで待ち続ける
+            await asyncio.wait_for(self.second_resume_started.wait(), timeout=2)
+        elif "Summary Outline" not in prompt:
+            self.resume_calls += 1
+            if self.resume_calls >= 2:
+                self.second_resume_started.set()
+            if "FAIL" in prompt:
+                raise RuntimeError("boom")
+        return self.respond(prompt)
+
+
+def test_collect_inputs_skips_generated_files(tmp_path):
+    (tmp_path / "a.txt").write_text("a", encoding="utf-8")
+    (tmp_path / "b.md").write_text("b", encoding="utf-8")
+    (tmp_path / "a_output.txt").write_text("out", encoding="utf-8")
+    (tmp_path / "a_structured_eng.md").write_text("out", encoding="utf-8")
+    (tmp_path / "notes.csv").write_text("x", encoding="utf-8")
+    (tmp_path / "a_telemetry.jsonl").write_text("{}", encoding="utf-8")
+    (tmp_path / "a_run" / "chunks").mkdir(parents=True)
+    (tmp_path / "a_run" / "manifest.json").write_text("{}", encoding="utf-8")
+    (tmp_path / "a_run" / "input.txt").write_text("a", encoding="utf-8")
+    (tmp_path / "a_run" / "chunks" / "abc.md").write_text("訳", encoding="utf-8")
+
+    assert collect_inputs(str(tmp_path)) == [tmp_path / "a.txt", tmp_path / "b.md"]
+    assert collect_inputs(str(tmp_path / "*.txt")) == [tmp_path / "a.txt"]
+    # グロブでもディレクトリ指定と同じく拡張子で絞り、成果物と中間結果を除く
+    assert collect_inputs(str(tmp_path / "*")) == [tmp_path / "a.txt", tmp_path / "b.md"]
+    assert collect_inputs(str(tmp_path / "a_run" / "*")) == []
+    assert collect_inputs(str(tmp_path / "a_run" / "chunks" / "*")) == []
+    assert is_batch_input(str(tmp_path)) and is_batch_input("papers/*.txt")
+    assert not is_batch_input(str(tmp_path / "a.txt"))
+
+
+@pytest.mark.asyncio
+async def test_run_batch_overlaps_documents_and_isolates_failures(tmp_path):
+    """文書間でフェーズが重なり、1件の失敗が他の文書を止めないことを確認"""
+    files = []
+    for name, text in [("a.txt", "Paper A"), ("b.txt", "Paper B"), ("c.txt", "FAIL paper")]:
+        path = tmp_path / name
+        path.write_text(text, encoding="utf-8")
+        files.append(path)
+
+    results = await run_batch(files, PaperProcessorSkills(llm=BatchBackend()), "", max_documents=3)
+
+    assert results[files[0]] is None and results[files[1]] is None
+    assert isinstance(results[files[2]], RuntimeError)
+    assert (tmp_path / "a_output.txt").exists()
+    assert (tmp_path / "b_output.txt").exists()
+    assert not (tmp_path / "c_output.txt").exists()
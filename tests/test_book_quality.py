@@ -44,7 +44,7 @@ async def test_translate_academic_meta_commentary_filtering():
     
     # モックの応答: メタコメンタリー
     mock_response = "申し訳ありませんが、ご提示いただいたテキストは翻訳対象となる本文が含まれていないようです。"
-    skills.llm.call_api = MagicMock(return_value=mock_response)
+    skills.llm.acall_api = AsyncMock(return_value=mock_response)
 
     # チャンクを用意
     chunk = "# Heading\nSome text."
@@ -72,7 +72,7 @@ async def test_translate_academic_valid_translation():
     skills.llm = MagicMock()
     
     mock_response = "# Heading\nこれは翻訳です。"
-    skills.llm.call_api = MagicMock(return_value=mock_response)
+    skills.llm.acall_api = AsyncMock(return_value=mock_response)
 
     chunk = "# Heading\nThis is translation."
     result = await skills.translate_academic(chunk)
@@ -0,0 +1,48 @@
+from unittest.mock import MagicMock
+from src.skills import PaperProcessorSkills, _ChunkPacker
+
+PARAGRAPH = "This sentence is part of a long academic paragraph. " * 20
+
+
+def _skills() -> PaperProcessorSkills:
+    return PaperProcessorSkills(llm=MagicMock())
+
+
+def test_small_sections_are_packed_within_budget():
+    """小さな H2 セクションが予算に収まる範囲でまとめられ、見出しの境界と順序が保たれることを確認"""
+    skills = _skills()
+    text = "# Title\n\n" + "\n\n".join(f"## Section {i}\n\nShort body {i}." for i in range(40))
+
+    chunks, packing = skills.plan_chunks(text)
+
+    assert len(chunks) == 1
+    assert packing.startswith("翻訳チャンク: セクション 40 件 → 1 チャンク")
+    headings = [line for line in chunks[0].splitlines() if line.startswith("## ")]
+    assert headings == [f"## Section {i}" for i in range(40)]
+
+
+def test_oversized_sections_are_still_split_and_neighbours_packed():
+    skills = _skills()
+    packer = _ChunkPacker(skills.token_estimator, 3000, 1.4)
+    text = "## Long\n\n" + "\n\n".join([PARAGRAPH] * 30) + "".join(f"\n\n## Small {i}\n\nTiny." for i in range(5))
+
+    sections = skills._split_markdown_hierarchically(text, max_tokens=3000, output_ratio=1.4)
+    chunks = packer.feed(sections) + packer.close()
+
+    assert len(chunks) < len(sections)
+    for chunk in chunks:
+        assert skills.token_estimator.fits(chunk, 3000, 1.4)
+    # 予算を超える節は段落で分割したまま、小さな節は直前の断片の残りの予算に詰められる
+    assert chunks[0].startswith("## Long")
+    assert chunks[-2].startswith("This sentence") and "## Small 0" in chunks[-2]
+    assert sum(f"## Small {i}" in chunk for chunk in chunks for i in range(5)) == 5
+    assert "".join(chunks).replace("\n", "") == text.replace("\n", "")
+    assert 0.5 < packer.efficiency(chunks) <= 1.0
+
+
+def test_packing_can_be_disabled():
+    skills = _skills()
+    skills.pack_chunks = False
+    text = "## A\n\nOne.\n\n## B\n\nTwo."
+
+    assert skills._translatable_chunks(text) == ["## A\n\nOne.\n", "## B\n\nTwo."]
@@ -0,0 +1,71 @@
+import asyncio
+import random
+import pytest
+from conftest import FakeBackend
+from src.skills import PaperProcessorSkills
+from src.stitching import split_into_windows, stitch
+from src.token_estimator import TokenEstimator
+
+PARAGRAPHS = [f"Paragraph {i} " + "word " * 20 for i in range(40)]
+RAW_TEXT = "\n\n".join(PARAGRAPHS)
+
+
+class WindowBackend(FakeBackend):
+    """窓の原文を段落ごとの行として返す構造化の代用。各窓の先頭で現在の節の見出しを繰り返す"""
+
+    async def arespond(self, prompt):
+        window = prompt.rsplit("[Raw OCR Text]", 1)[1].strip()
+        paragraphs = window.split("\n\n")
+        # 完了順を入れ替えても結果が変わらないことを確かめるため、ばらばらの遅延で返す
+        await asyncio.sleep(random.random() * 0.01)
+        lines = ["# Title", ""] if paragraphs[0].startswith("Paragraph 0 ") else ["# Title", "", "## Body", ""]
+        for p in paragraphs:
+            if p.startswith("Paragraph 0 "):
+                lines += ["## Body", ""]
+            lines += [p.strip(), ""]
+        return "\n".join(lines)
+
+
+def test_split_into_windows_overlaps_at_paragraph_boundaries():
+    estimator = TokenEstimator()
+    windows = split_into_windows(RAW_TEXT, estimator, max_input_tokens=200, overlap_tokens=40)
+
+    assert len(windows) > 2
+    for previous, current in zip(windows, windows[1:]):
+        # 次の窓は前の窓の末尾段落から始まる
+        assert previous.endswith(current.split("\n\n")[0])
+    covered = []
+    for window in windows:
+        for p in window.split("\n\n"):
+            if p not in covered:
+                covered.append(p)
+    assert covered == PARAGRAPHS
+
+
+def test_stitch_drops_overlap_and_repeated_heading():
+    previous = "# Title\n\n## Body\n\nalpha one\n\nbeta  two"
+    addition = "# Title\n\n## Body\n\nBeta two\n\ngamma three\n\n## Next\n\ndelta"
+
+    assert stitch(previous, addition) == "gamma three\n\n## Next\n\ndelta"
+
+
+@pytest.mark.asyncio
+async def test_chunked_structuring_matches_single_pass(tmp_path, monkeypatch):
+    """窓ごとに並列に構造化した結果が、1回で構造化した場合と同じ Markdown になることを確認"""
+    backend = WindowBackend()
+    skills = PaperProcessorSkills(llm=backend)
+    skills.token_estimator.estimate = lambda t: len(t.split())
+
+    expected = (await backend.acall_api(f"[Raw OCR Text]\n{RAW_TEXT}")).strip()
+    backend.prompts.clear()
+
+    output = tmp_path / "structured.md"
+    monkeypatch.setattr("src.skills.MAX_STRUCTURING_CHUNK_TOKENS", 400)
+    result = await skills.structure_text_with_hint(RAW_TEXT, "outline", enable_chunking=True, output_path=output)
+    unchunked = await skills.structure_text_with_hint("Paragraph 0 short", "outline", enable_chunking=True)
+
+    assert backend.calls > 2
+    assert result == expected
+    assert output.read_text(encoding="utf-8") == expected
+    # 1つの窓に収まる原文は分割しない
+    assert unchunked.count("Paragraph 0 short") == 1
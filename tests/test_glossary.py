@@ -0,0 +1,66 @@
+import os
+import pytest
+from conftest import FakeBackend
+from src import glossary as glossary_module
+from src.glossary import GlossaryIndex
+from src.skills import PaperProcessorSkills
+from src.utils import Utils
+
+ENTRIES = [("exchange", "交換"), ("gift exchange", "贈与交換"), ("change", "変化"), ("art", "芸術"), ("Kula ring", "クラ交易")]
+
+
+def test_lookup_matches_whole_words_case_insensitively():
+    index = GlossaryIndex(ENTRIES)
+
+    found = index.lookup("The KULA RING is a form of gift exchange; particular rituals surround exchanges.")
+
+    assert [index.terms[i] for i in found] == ["exchange", "gift exchange", "kula ring"]
+    assert index.lookup("Art and the arts.") == [3]
+    assert index.lookup("") == []
+    assert GlossaryIndex([]).lookup("anything") == []
+
+
+def test_for_chunk_keeps_glossary_order_and_notes():
+    index = GlossaryIndex.from_text("Kula ring: クラ交易\n訳語は括弧で原語を併記する\nexchange: 交換")
+
+    assert index.for_chunk("Exchange in the Kula ring.") == "訳語は括弧で原語を併記する\nKula ring: クラ交易\nexchange: 交換"
+    assert index.for_chunk("Nothing relevant.") == "訳語は括弧で原語を併記する"
+
+
+def test_index_is_cached_on_disk_until_the_file_changes(tmp_path, monkeypatch):
+    csv_path = tmp_path / "glossary.csv"
+    csv_path.write_text("exchange,交換\n", encoding="utf-8")
+    cache_dir = tmp_path / "cache"
+
+    first = GlossaryIndex.load(csv_path, cache_dir)
+    assert first.lookup("exchange") == [0]
+    assert list(cache_dir.glob("*.pickle"))
+
+    # プロセス内の索引を捨てても、ファイルが同じなら CSV を読まずに保存済みの索引を使う
+    glossary_module._loaded.clear()
+    monkeypatch.setattr(Utils, "load_glossary_entries", lambda path: pytest.fail("CSV を読み直した"))
+    assert GlossaryIndex.load(csv_path, cache_dir).lines == ["exchange: 交換"]
+
+    monkeypatch.undo()
+    csv_path.write_text("exchange,交換\nritual,儀礼\n", encoding="utf-8")
+    os.utime(csv_path, ns=(0, 10**9))
+    assert GlossaryIndex.load(csv_path, cache_dir).for_chunk("Rituals of exchange.") == "exchange: 交換\nritual: 儀礼"
+
+
+@pytest.mark.asyncio
+async def test_prompt_size_does_not_depend_on_glossary_size():
+    """用語集に無関係な用語を 2 万語足しても、翻訳のプロンプトが変わらないことを確認"""
+    markdown = "# Title\n\n## Exchange\n\nThe Kula ring links islands.\n\n## Ritual\n\nNo glossary terms here."
+    unrelated = [(f"unrelatedterm{i}", f"無関係{i}") for i in range(20000)]
+    prompts = []
+    for entries in (ENTRIES, ENTRIES + unrelated):
+        backend = FakeBackend()
+        skills = PaperProcessorSkills(llm=backend, hedge_percentile=None)
+        skills.pack_chunks = False
+        await skills.translate_academic(markdown, GlossaryIndex(entries))
+        prompts.append(sorted(backend.prompts))
+
+    assert prompts[0] == prompts[1]
+    exchange_prompt, ritual_prompt = prompts[0]
+    assert exchange_prompt.endswith("[Glossary Instructions]\nexchange: 交換\nKula ring: クラ交易\n")
+    assert ritual_prompt.endswith("[Glossary Instructions]\n\n")
@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+from src.hedging import LatencyTracker, HedgeBudget, hedged_call, notify_request_started
+
+
+def test_percentile_requires_min_samples():
+    tracker = LatencyTracker(min_samples=3)
+    tracker.record(1.0)
+    tracker.record(2.0)
+    assert tracker.percentile(90) is None
+    tracker.record(3.0)
+    assert tracker.percentile(90) == 3.0
+    assert tracker.percentile(50) == 2.0
+
+
+@pytest.mark.asyncio
+async def test_straggler_is_hedged_and_loser_cancelled():
+    """しきい値を超えたリクエストが重複送信され、先に返った結果が採用されることを確認"""
+    tracker = LatencyTracker(min_samples=1)
+    tracker.record(0.01)
+    budget = HedgeBudget(1)
+    cancelled = []
+
+    async def call(is_hedge):
+        notify_request_started()
+        try:
+            await asyncio.sleep(0.01 if is_hedge else 5)
+            return "hedge" if is_hedge else "primary"
+        except asyncio.CancelledError:
+            cancelled.append(is_hedge)
+            raise
+
+    result = await hedged_call(call, tracker, budget, 90, poll_interval=0.01)
+
+    assert result == "hedge"
+    assert budget.used == 1
+    assert cancelled == [False]
+
+
+@pytest.mark.asyncio
+async def test_budget_caps_hedges():
+    """予算を使い切った後は重複リクエストを送らないことを確認"""
+    tracker = LatencyTracker(min_samples=1)
+    tracker.record(0.001)
+    budget = HedgeBudget(0)
+    calls = []
+
+    async def call(is_hedge):
+        calls.append(is_hedge)
+        notify_request_started()
+        await asyncio.sleep(0.02)
+        return "primary"
+
+    assert await hedged_call(call, tracker, budget, 90, poll_interval=0.005) == "primary"
+    assert calls == [False]
+
+
+@pytest.mark.asyncio
+async def test_hedge_falls_back_when_one_side_fails():
+    """重複リクエストが失敗しても、もう一方の成功結果が返ることを確認"""
+    tracker = LatencyTracker(min_samples=1)
+    tracker.record(0.001)
+
+    async def call(is_hedge):
+        notify_request_started()
+        if is_hedge:
+            raise RuntimeError("hedge failed")
+        await asyncio.sleep(0.03)
+        return "primary"
+
+    assert await hedged_call(call, tracker, HedgeBudget(1), 90, poll_interval=0.005) == "primary"
+
+
+@pytest.mark.asyncio
+async def test_queued_request_is_not_hedged():
+    """レートリミッタの枠待ちの間はヘッジせず、送信開始から完了までを記録することを確認"""
+    tracker = LatencyTracker(min_samples=1)
+    tracker.record(0.01)
+    budget = HedgeBudget(1)
+    calls = []
+
+    async def call(is_hedge):
+        calls.append(is_hedge)
+        await asyncio.sleep(0.05)  # 枠待ち
+        notify_request_started()
+        return "primary"
+
+    assert await hedged_call(call, tracker, budget, 90, poll_interval=0.005) == "primary"
+    assert calls == [False]
+    assert budget.used == 0
+    assert tracker.percentile(100) < 0.05
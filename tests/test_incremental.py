@@ -0,0 +1,67 @@
+import pytest
+from conftest import FakeBackend
+from src.incremental import patch_structured_text
+from src.skills import PaperProcessorSkills
+from src.main import run_pipeline
+
+
+def test_patch_replaces_edited_line():
+    old_raw = "Page 1\nThe resu1ts were clear.\nWe conclude."
+    new_raw = "Page 1\nThe results were clear.\nWe conclude."
+    structured = "# Title\n\n## Results\nThe resu1ts were clear.\nWe conclude."
+
+    assert patch_structured_text(old_raw, new_raw, structured) == (
+        "# Title\n\n## Results\nThe results were clear.\nWe conclude."
+    )
+
+
+def test_patch_inserts_after_anchor_line():
+    old_raw = "First paragraph.\nLast paragraph."
+    new_raw = "First paragraph.\nInserted paragraph.\nLast paragraph."
+    structured = "## A\nFirst paragraph.\nLast paragraph."
+
+    assert patch_structured_text(old_raw, new_raw, structured) == (
+        "## A\nFirst paragraph.\nInserted paragraph.\nLast paragraph."
+    )
+
+
+def test_patch_gives_up_when_location_is_ambiguous():
+    old_raw = "x\nSame line.\ny\nSame line."
+    new_raw = "x\nSame line.\ny\nChanged line."
+    structured = "Same line.\ny\nSame line.\ny\nSame line."
+
+    assert patch_structured_text(old_raw, new_raw, structured) is None
+
+
+class EchoBackend(FakeBackend):
+    """構造化では原文をそのまま節に入れ、翻訳では固定文を返すテスト用バックエンド"""
+
+    def respond(self, prompt):
+        if "[Raw OCR Text]" in prompt:
+            intro, method = prompt.split("[Raw OCR Text]")[1].strip().split("\n")[:2]
+            return f"# Paper Title\n\n## Introduction\n{intro}\n\n## Method\n{method}"
+        if "[Target Text]" in prompt:
+            return "これは翻訳です。"
+        return super().respond(prompt)
+
+
+@pytest.mark.asyncio
+async def test_incremental_run_translates_only_changed_chunk(tmp_path):
+    """原文の1行を修正して差分更新すると、変更された節の翻訳1回だけで済むことを確認"""
+    input_file = tmp_path / "paper.txt"
+    input_file.write_text("This is the intro.\nWe did th1ngs.", encoding="utf-8")
+    backend = EchoBackend()
+    skills = PaperProcessorSkills(llm=backend)
+    skills.token_estimator.estimate = lambda text: len(text) * 1000  # 節ごとに分割させる
+
+    await run_pipeline(input_file, skills, "")
+    first_run_calls = len(backend.prompts)
+
+    input_file.write_text("This is the intro.\nWe did things.", encoding="utf-8")
+    await run_pipeline(input_file, skills, "", incremental=True)
+
+    rerun_prompts = backend.prompts[first_run_calls:]
+    assert len(rerun_prompts) == 1
+    assert "We did things." in rerun_prompts[0]
+    structured = (tmp_path / "paper_structured_eng.md").read_text(encoding="utf-8")
+    assert "We did things." in structured
@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from conftest import llm_response
+from unittest.mock import MagicMock, AsyncMock
+from src.llm_cache import LLMResponseCache
+from src.llm_processor import LLMProcessor
+from src.rate_limiter import RateLimiter
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMResponseCache(tmp_path / "cache.sqlite3", max_bytes=1024, ttl_seconds=3600)
+
+
+def test_make_key_depends_on_model_config_and_prompt():
+    """キーがモデル名・生成設定・プロンプトすべてに依存することを確認"""
+    base = LLMResponseCache.make_key("m", {"temperature": 0.0}, "p")
+    assert base == LLMResponseCache.make_key("m", {"temperature": 0.0}, "p")
+    assert base != LLMResponseCache.make_key("m2", {"temperature": 0.0}, "p")
+    assert base != LLMResponseCache.make_key("m", {"temperature": 0.5}, "p")
+    assert base != LLMResponseCache.make_key("m", {"temperature": 0.0}, "p2")
+
+
+def test_get_returns_none_after_ttl(tmp_path):
+    """有効期限を過ぎたエントリはヒットしないことを確認"""
+    cache = LLMResponseCache(tmp_path / "cache.sqlite3", max_bytes=1024, ttl_seconds=-1)
+    cache.put("k", "v")
+    assert cache.get("k") is None
+
+
+def test_lru_eviction_keeps_recently_used(cache):
+    """上限を超えた場合、最近使われていないエントリから削除されることを確認"""
+    cache.put("a", "x" * 400)
+    cache.put("b", "y" * 400)
+    assert cache.get("a") is not None  # a を最近使用に更新
+    cache.put("c", "z" * 400)
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+@pytest.mark.asyncio
+async def test_acall_api_uses_cache_and_single_flight(monkeypatch, cache):
+    """同時の同一プロンプトは 1 回だけ API を呼び、再実行はキャッシュから返ることを確認"""
+    monkeypatch.setenv("GOOGLE_API_KEY", "dummy_key")
+    processor = LLMProcessor(cache=cache, rate_limiter=RateLimiter())
+    processor.client = MagicMock()
+
+    async def slow_call(**kwargs):
+        await asyncio.sleep(0.01)
+        return llm_response("translated")
+
+    processor.client.aio.models.generate_content = AsyncMock(side_effect=slow_call)
+
+    results = await asyncio.gather(*[processor.acall_api("same prompt") for _ in range(5)])
+    assert results == ["translated"] * 5
+    assert processor.client.aio.models.generate_content.await_count == 1
+
+    assert await processor.acall_api("same prompt") == "translated"
+    assert processor.client.aio.models.generate_content.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_truncated_response_is_not_cached(monkeypatch, cache):
+    """MAX_TOKENS で打ち切られた応答はキャッシュせず、次の呼び出しで API を呼び直すことを確認"""
+    monkeypatch.setenv("GOOGLE_API_KEY", "dummy_key")
+    processor = LLMProcessor(cache=cache, rate_limiter=RateLimiter())
+    processor.client = MagicMock()
+    processor.client.aio.models.generate_content = AsyncMock(return_value=llm_response("truncated", "MAX_TOKENS"))
+    processor.client.models.generate_content = MagicMock(return_value=llm_response("truncated", "MAX_TOKENS"))
+
+    assert await processor.acall_api("prompt") == "truncated"
+    assert await processor.acall_api("prompt", dedupe=False) == "truncated"
+    assert processor.call_api("prompt") == "truncated"
+    assert processor.client.aio.models.generate_content.await_count == 2
+    assert processor.client.models.generate_content.call_count == 1
+    assert cache.get(processor._cache_key("prompt")) is None
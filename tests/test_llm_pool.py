@@ -0,0 +1,72 @@
+import pytest
+from conftest import llm_response
+from unittest.mock import MagicMock, AsyncMock
+from src.llm_processor import LLMProcessor
+from src.rate_limiter import RateLimiter
+
+
+class QuotaError(Exception):
+    code = 429
+
+
+@pytest.fixture
+def pool():
+    """2つのエンドポイントを持つ、ネットワークに出ない LLMProcessor を用意する"""
+    proc = LLMProcessor(use_cache=False, endpoints=[("key-a", "model-a"), ("key-b", "model-b")])
+    proc.retry_policy.base_delay = 0
+    for endpoint in proc.endpoints:
+        endpoint.rate_limiter = RateLimiter()
+        endpoint.client = MagicMock()
+    return proc
+
+
+def test_endpoints_from_env(monkeypatch):
+    """GOOGLE_API_KEYS の "key[:model]" 形式を解釈することを確認"""
+    monkeypatch.setenv("GOOGLE_API_KEYS", "k1, k2:gemini-x")
+    proc = LLMProcessor(use_cache=False, model_name="default-model")
+
+    assert [(e.api_key, e.model_name) for e in proc.endpoints] == [
+        ("k1", "default-model"), ("k2", "gemini-x")
+    ]
+
+
+@pytest.mark.asyncio
+async def test_routes_to_least_loaded_endpoint(pool):
+    """実行中のリクエストが少ないエンドポイントへ振り分けることを確認"""
+    first, second = pool.endpoints
+    first.rate_limiter.in_flight = 2
+    second.client.aio.models.generate_content = AsyncMock(return_value=llm_response("from b"))
+
+    result = await pool.acall_api("prompt", lambda msg: None)
+
+    assert result == "from b"
+    first.client.aio.models.generate_content.assert_not_called()
+    assert second.client.aio.models.generate_content.call_args.kwargs["model"] == "model-b"
+
+
+@pytest.mark.asyncio
+async def test_fails_over_on_quota_without_consuming_attempts(pool):
+    """429 のエンドポイントから待たずに別のエンドポイントへ切り替えることを確認"""
+    first, second = pool.endpoints
+    first.client.aio.models.generate_content = AsyncMock(side_effect=QuotaError("RESOURCE_EXHAUSTED"))
+    second.client.aio.models.generate_content = AsyncMock(return_value=llm_response("ok"))
+    # 先頭が選ばれるよう後者を混ませておく
+    second.rate_limiter.in_flight = 1
+    messages = []
+
+    result = await pool.acall_api("prompt", messages.append)
+
+    assert result == "ok"
+    assert first.client.aio.models.generate_content.await_count == 1
+    assert any("切り替えます" in m for m in messages)
+    assert not any("リトライ中" in m for m in messages)
+
+
+def test_sync_call_skips_open_circuit(pool):
+    """回路が開いたエンドポイントを避けて呼び出すことを確認"""
+    first, second = pool.endpoints
+    first.circuit_breaker._open()
+    second.client.models.generate_content = MagicMock(return_value=llm_response("ok"))
+
+    assert pool.call_api("prompt", lambda msg: None) == "ok"
+    first.client.models.generate_content.assert_not_called()
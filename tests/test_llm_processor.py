@@ -0,0 +1,67 @@
+import asyncio
+import pytest
+from conftest import llm_response
+from unittest.mock import AsyncMock
+from src.rate_limiter import RateLimiter
+
+
+@pytest.mark.asyncio
+async def test_acall_api_retries_then_succeeds(processor):
+    """acall_api が失敗後に非同期でリトライし、成功したレスポンスを返すことを確認"""
+    processor.client.aio.models.generate_content = AsyncMock(
+        side_effect=[RuntimeError("boom"), llm_response("ok")]
+    )
+    messages = []
+
+    result = await processor.acall_api("prompt", messages.append)
+
+    assert result == "ok"
+    assert processor.client.aio.models.generate_content.await_count == 2
+    assert any("リトライ中" in m for m in messages)
+
+
+@pytest.mark.asyncio
+async def test_acall_api_raises_after_max_retries(processor):
+    """空レスポンスが続く場合は RuntimeError になることを確認"""
+    processor.client.aio.models.generate_content = AsyncMock(return_value=llm_response(""))
+
+    with pytest.raises(RuntimeError):
+        await processor.acall_api("prompt", lambda msg: None)
+
+    assert processor.client.aio.models.generate_content.await_count == processor.MAX_RETRIES
+
+
+@pytest.mark.asyncio
+async def test_acall_api_propagates_cancellation(processor):
+    """呼び出し中のタスクをキャンセルするとリトライせずに中断されることを確認"""
+    started = asyncio.Event()
+
+    async def slow_call(**kwargs):
+        started.set()
+        await asyncio.sleep(10)
+
+    processor.client.aio.models.generate_content = AsyncMock(side_effect=slow_call)
+
+    task = asyncio.create_task(processor.acall_api("prompt"))
+    await started.wait()
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert processor.client.aio.models.generate_content.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_acall_api_throttle_shrinks_window(processor):
+    """429 を受けると共有リミッタの同時実行ウィンドウが縮小することを確認"""
+    class QuotaError(Exception):
+        code = 429
+
+    processor.rate_limiter = RateLimiter(initial_concurrency=8, max_concurrency=8)
+    processor.client.aio.models.generate_content = AsyncMock(
+        side_effect=[QuotaError("RESOURCE_EXHAUSTED"), llm_response("ok")]
+    )
+
+    assert await processor.acall_api("prompt", lambda msg: None) == "ok"
+    assert processor.rate_limiter.concurrency_limit == 4
+    assert processor.rate_limiter.in_flight == 0
@@ -0,0 +1,110 @@
+import random
+import time
+import tracemalloc
+from unittest.mock import MagicMock
+from src.markdown_index import MarkdownIndex
+from src.skills import PaperProcessorSkills
+from src.utils import Utils, SectionFilter
+
+TRICKY = "\n".join([
+    "# Title", "", "Intro.", "## Abstract", "Text.", "##NoSpace", "  ## Indented", "### Sub", "#### Deep",
+    "## References", "Smith 2020.", "### More refs", "# Part II", "## Body", "\t# tab", "##### five", "## ", "end",
+])
+
+
+def _split_by_lines(text: str, level: int) -> list[str]:
+    """従来の行単位の分割（比較用）"""
+    marker = "#" * level + " "
+    chunks, current = [], []
+    for line in text.split("\n"):
+        if line.startswith(marker) and current:
+            chunks.append("\n".join(current))
+            current = []
+        current.append(line)
+    chunks.append("\n".join(current))
+    return chunks
+
+
+def _book(size: int) -> str:
+    """見出しの階層（部・章・節）と段落からなる size 文字程度の Markdown"""
+    rng = random.Random(0)
+    words = "the of culture ritual exchange kinship society field method".split()
+    paragraphs = [" ".join(rng.choice(words) for _ in range(120)) for _ in range(50)]
+    parts, length, i = [], 0, 0
+    while length < size:
+        if i % 200 == 0:
+            parts.append(f"# Part {i}")
+        if i % 20 == 0:
+            parts.append(f"## Chapter {i}")
+        if i % 5 == 0:
+            parts.append(f"### Section {i}")
+        parts.append(paragraphs[i % len(paragraphs)])
+        length += len(parts[-1]) + 2
+        i += 1
+    parts.append("## References\n\nSmith 2020.")
+    return "\n\n".join(parts)
+
+
+def test_split_matches_line_based_split():
+    index = MarkdownIndex(TRICKY)
+    for level in (1, 2, 3, 4):
+        assert index.split(level) == _split_by_lines(TRICKY, level)
+    assert MarkdownIndex("").split(2) == [""]
+
+
+def test_heading_tree_offsets():
+    """厳密な見出しの範囲が、同じかより浅いレベルの次の見出しの手前までになることを確認"""
+    index = MarkdownIndex(TRICKY)
+    strict = {TRICKY[h.start:h.line_end]: h for h in index.headings if h.strict}
+
+    assert TRICKY[strict["## References"].start:strict["## References"].end] == "## References\nSmith 2020.\n### More refs"
+    assert TRICKY[strict["# Title"].start:strict["# Title"].end].endswith("### More refs")
+    assert strict["# Part II"].end == len(TRICKY)
+    assert not any(h.strict for h in index.headings if TRICKY[h.start:h.line_end] in ("##NoSpace", "  ## Indented"))
+
+
+def test_filter_sections_and_title_match_line_filter():
+    keywords = ["References", "Part"]
+    section_filter = SectionFilter(keywords)
+    expected = "\n".join(line for line in TRICKY.splitlines() if section_filter.accept(line)).strip()
+
+    assert Utils.remove_unwanted_sections(TRICKY, keywords) == expected
+    assert MarkdownIndex(TRICKY).title() == "Title"
+    assert MarkdownIndex("Body\n# Title").title() is None
+
+
+def test_ten_megabyte_benchmark():
+    """10MB の Markdown で、分割・不要セクションの削除が入力の大きさに比例した時間と、入力と同程度のメモリで済むことを確認"""
+    skills = PaperProcessorSkills(llm=MagicMock())
+
+    def work(text: str) -> None:
+        skills._split_markdown_hierarchically(text)
+        Utils.remove_unwanted_sections(text, ["References"])
+        MarkdownIndex(text).title()
+
+    timings = {}
+    for size in (1_000_000, 10_000_000):
+        text = _book(size)
+        runs = []
+        for _ in range(3):
+            started = time.perf_counter()
+            work(text)
+            runs.append(time.perf_counter() - started)
+        timings[size] = min(runs)
+
+    tracemalloc.start()
+    chunks = skills._split_markdown_hierarchically(text)
+    _, split_peak = tracemalloc.get_traced_memory()
+    del chunks
+    tracemalloc.reset_peak()
+    Utils.remove_unwanted_sections(text, ["References"])
+    _, remove_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"\n1MB: {timings[1_000_000]:.3f}s, 10MB: {timings[10_000_000]:.3f}s, "
+          f"peak: split {split_peak / len(text):.2f}x, remove {remove_peak / len(text):.2f}x of input")
+    # 入力が10倍なら時間もおおむね10倍（計測の揺らぎを見込んで20倍まで）
+    assert timings[10_000_000] < timings[1_000_000] * 20
+    # 作る文字列は結果のチャンク（入力とほぼ同じ大きさ）だけ
+    assert split_peak < len(text) * 1.5
+    assert remove_peak < len(text) * 1.5
@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+from conftest import FakeBackend, target_text
+from src.llm_processor import LLMStream
+from src.skills import PaperProcessorSkills, _H2SectionSplitter
+from src.utils import Utils
+
+STRUCTURED = (
+    "# Paper Title\n\nPreamble text.\n\n"
+    "## Introduction\nIntro text.\n\n"
+    "## References\nSmith 2020.\n\n"
+    "# Appendix Bibliography\n\n"
+    "## Sources\nArchive list.\n\n"
+    "# Part II\n\n"
+    "## Discussion\nDiscussion text."
+)
+
+
+class StreamingBackend(FakeBackend):
+    """構造化を行単位の断片でゆっくり返し、翻訳が始まった時点の受信済み断片数を記録する"""
+
+    def __init__(self):
+        super().__init__()
+        self.streamed = 0
+        self.translation_started_at = []
+
+    def respond(self, prompt):
+        self.translation_started_at.append(self.streamed)
+        return f"訳: {target_text(prompt)}"
+
+    def astream_api(self, prompt, progress_callback=None):
+        async def fragments(stream):
+            for i in range(0, len(STRUCTURED), 7):
+                self.streamed += 1
+                yield STRUCTURED[i:i + 7]
+                await asyncio.sleep(0.001)
+            stream.finish_reason = "STOP"
+        return LLMStream(fragments)
+
+
+def test_splitter_matches_batch_split():
+    splitter = _H2SectionSplitter()
+    sections = []
+    for i in range(0, len(STRUCTURED), 5):
+        sections.extend(splitter.feed(STRUCTURED[i:i + 5]))
+    sections.extend(splitter.close())
+
+    skills = PaperProcessorSkills(llm=StreamingBackend())
+    assert sections == skills._split_by_heading_level(STRUCTURED, level=2)
+
+
+@pytest.mark.asyncio
+async def test_structure_and_translate_overlaps_and_matches_batch_result(tmp_path):
+    """構造化の受信中に翻訳が始まり、結果が構造化→除外→翻訳の逐次実行と一致することを確認"""
+    backend = StreamingBackend()
+    skills = PaperProcessorSkills(llm=backend)
+    # セクションごとに投入されることを確かめるため、小さなセクションをまとめない
+    skills.pack_chunks = False
+    keywords = ["References", "Bibliography"]
+    output_path = tmp_path / "structured.md"
+
+    structured, translated = await skills.structure_and_translate(
+        "raw", "hint", exclude_keywords=keywords, output_path=output_path
+    )
+
+    assert structured == STRUCTURED
+    assert output_path.read_text(encoding="utf-8") == STRUCTURED
+    assert backend.translation_started_at[0] < backend.streamed
+    expected = await skills.translate_academic(Utils.remove_unwanted_sections(STRUCTURED, keywords))
+    assert translated == expected
+    assert "Smith" not in translated and "Archive" not in translated
+    assert "# Part II" in translated
+
+
+@pytest.mark.asyncio
+async def test_structure_and_translate_packs_sections_like_batch():
+    """小さなセクションをまとめる場合も、パイプライン実行のチャンクと結果が逐次実行と一致することを確認"""
+    backend = StreamingBackend()
+    skills = PaperProcessorSkills(llm=backend)
+    keywords = ["References", "Bibliography"]
+
+    _, translated = await skills.structure_and_translate("raw", "hint", exclude_keywords=keywords)
+    batch = skills._translatable_chunks(Utils.remove_unwanted_sections(STRUCTURED, keywords))
+
+    assert len(batch) == 1
+    assert len(backend.translation_started_at) == 1
+    assert translated == await skills.translate_academic(Utils.remove_unwanted_sections(STRUCTURED, keywords))
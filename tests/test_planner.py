@@ -0,0 +1,67 @@
+import random
+import pytest
+from src.planner import LimiterModel, PlannedCall, plan_document, estimate_cost
+from src.skills import PaperProcessorSkills
+
+MARKDOWN = "# Title\n\n" + "\n\n".join(f"## Section {i}\n" + "word " * 3000 for i in range(4))
+
+
+def test_limiter_model_respects_concurrency_and_rpm(monkeypatch):
+    monkeypatch.setattr("src.planner.PLAN_CALL_OVERHEAD_SECONDS", 10.0)
+    # 同時実行 2（拡大しない）で 10 秒の呼び出し 4 件は 2 巡
+    calls = [PlannedCall(100, 0) for _ in range(4)]
+    assert LimiterModel(initial_concurrency=2, max_concurrency=2).run(calls, 0.0) == pytest.approx(20.0)
+    assert sorted(c.started for c in calls) == [0.0, 0.0, 10.0, 10.0]
+
+    # RPM 2 では 3 件目は 1 リクエスト分の補充（30 秒）を待つ
+    calls = [PlannedCall(100, 0) for _ in range(3)]
+    assert LimiterModel(requests_per_minute=2, initial_concurrency=8).run(calls, 0.0) == pytest.approx(40.0)
+
+
+def test_plan_counts_calls_and_repeated_context():
+    """フェーズごとの呼び出し数と、翻訳の各呼び出しに付与されるレジュメ・用語集の分が入力に含まれることを確認"""
+    skills = PaperProcessorSkills()
+    skills.pack_chunks = False
+    chunks = skills._translatable_chunks(MARKDOWN)
+    glossary = "term,訳語\n" * 200
+
+    plain = plan_document("paper.md", MARKDOWN, skills)
+    with_glossary = plan_document("paper.md", MARKDOWN, skills, glossary_text=glossary)
+    pipelined = plan_document("paper.md", MARKDOWN, skills, pipelined=True)
+
+    assert [(p.name, len(p.calls)) for p in plain.phases] == [("resume", 1), ("structuring", 1), ("translation", len(chunks))]
+    extra = with_glossary.phases[2].input_tokens - plain.phases[2].input_tokens
+    assert extra == len(chunks) * skills.token_estimator.estimate(glossary)
+    assert plain.cost == pytest.approx(estimate_cost(plain.input_tokens, plain.output_tokens))
+    # Phase 2 と Phase 3 が重なるぶん短くなる
+    assert [p.name for p in pipelined.phases] == ["resume", "structuring+translation"]
+    assert pipelined.wall < plain.wall
+    assert pipelined.calls == plain.calls
+
+
+def _scanned_per_char(paragraph_count: int):
+    """plan_document の見積もりで概算にかけた文字数 ÷ 入力の文字数（時間ではなく処理量で測る）"""
+    rng = random.Random(0)
+    words = "the of culture ritual exchange kinship society field method".split()
+    text = "\n\n".join(" ".join(rng.choice(words) for _ in range(120)) for _ in range(paragraph_count))
+    skills = PaperProcessorSkills()
+    raw_estimate = skills.token_estimator._raw_estimate
+    scanned = 0
+
+    def counting(chunk):
+        nonlocal scanned
+        scanned += len(chunk)
+        return raw_estimate(chunk)
+
+    skills.token_estimator._raw_estimate = counting
+    plan = plan_document("book.txt", text, skills, structuring_chunking=True)
+    return plan, scanned / len(text)
+
+
+def test_book_sized_plan_scales_linearly():
+    """3MB 程度の書籍でも、見積もりの処理量が入力の長さに比例することを確認"""
+    plan, book = _scanned_per_char(3600)
+    _, half = _scanned_per_char(1800)
+
+    assert plan.phases[1].calls and len(plan.phases[2].calls) > 10
+    assert book <= half * 1.1
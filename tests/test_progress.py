@@ -0,0 +1,103 @@
+import json
+import pytest
+from conftest import FakeBackend, llm_response, target_text
+from unittest.mock import AsyncMock
+from src.skills import PaperProcessorSkills
+from src.telemetry import call_context
+from src.progress import (
+    ProgressBus, ProgressTracker, JSONLProgressSink, CallbackProgressSink, ChunkQueued, ChunkStarted, ChunkFinished, ChunkRetried,
+    TokensProduced, progress_scope, emit
+)
+
+MARKDOWN = "# Title\n\n## One\nFirst.\n\n## Two\nSecond.\n\n## Three\nThird."
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class EchoBackend(FakeBackend):
+    def respond(self, prompt):
+        return f"訳: {target_text(prompt)}"
+
+
+def test_tracker_eta_from_token_throughput():
+    """残り時間が「未完了チャンクの予想出力トークン ÷ 直近の出力トークン/秒」になることを確認"""
+    clock = FakeClock()
+    bus = ProgressBus(tracker=ProgressTracker(window=60, clock=clock))
+    with progress_scope(bus):
+        for i in range(4):
+            with call_context(phase="translation", chunk_id=i):
+                emit(ChunkQueued(1000))
+        with call_context(phase="translation", chunk_id=0):
+            emit(ChunkStarted())
+            clock.now = 10.0
+            emit(ChunkFinished(1000))
+        with call_context(phase="translation", chunk_id=1):
+            emit(ChunkStarted())
+            emit(TokensProduced(500))
+
+    status = bus.status()
+    assert (status.queued, status.running, status.finished) == (2, 1, 1)
+    assert status.rate == 150.0  # 1500 トークン / 10 秒
+    assert status.eta == pytest.approx(2500 / 150)
+    assert status.percentage == 25
+
+
+@pytest.mark.asyncio
+async def test_translate_events_are_ordered_per_chunk(tmp_path):
+    """チャンクごとに投入→開始→完了の順でイベントが届き、JSONL に集計とともに書き出されることを確認"""
+    events = []
+    jsonl = JSONLProgressSink(tmp_path / "progress.jsonl")
+    bus = ProgressBus(jsonl)
+    bus.add_sink(CallbackProgressSink(lambda event, status: events.append(event)))
+    skills = PaperProcessorSkills(llm=EchoBackend())
+    skills.pack_chunks = False
+
+    with call_context(phase="translation"):
+        await skills.translate_academic(MARKDOWN, progress_callback=bus)
+    bus.close()
+
+    chunk_ids = sorted({e.chunk_id for e in events if isinstance(e, ChunkQueued)})
+    assert len(chunk_ids) >= 3
+    for chunk_id in chunk_ids:
+        kinds = [e.kind for e in events if e.chunk_id == chunk_id and e.kind.startswith("chunk_")]
+        assert kinds == ["chunk_queued", "chunk_started", "chunk_finished"]
+    assert bus.status().percentage == 100 and bus.status().eta == 0.0
+
+    records = [json.loads(line) for line in (tmp_path / "progress.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert len(records) == len(events)
+    assert records[-1]["status"]["finished"] == len(chunk_ids)
+
+
+@pytest.mark.asyncio
+async def test_retry_emits_chunk_retried(processor):
+    """LLM 呼び出しのリトライが ChunkRetried として現在のスコープへ届くことを確認"""
+    processor.client.aio.models.generate_content = AsyncMock(side_effect=[RuntimeError("boom"), llm_response("ok")])
+    events = []
+
+    with progress_scope(events.append), call_context(chunk_id=2):
+        assert await processor.acall_api("prompt") == "ok"
+
+    retried = [e for e in events if isinstance(e, ChunkRetried)]
+    assert len(retried) == 1
+    assert retried[0].chunk_id == 2 and "boom" in retried[0].reason
+
+
+@pytest.mark.asyncio
+async def test_stream_structure_sends_typed_events():
+    """構造化ストリームの進捗コールバックへ ProgressEvent だけが届き、呼び出し側のスコープへは漏れないことを確認"""
+    events, outer = [], []
+    skills = PaperProcessorSkills(llm=FakeBackend())
+    stream = skills.stream_structure_text_with_hint("raw text", "summary", progress_callback=events.append)
+
+    with progress_scope(outer.append):
+        text = "".join([fragment async for fragment in stream])
+
+    assert text and stream.finish_reason == "STOP"
+    assert [e.kind for e in events] == ["chunk_queued", "chunk_started", "tokens", "chunk_finished"]
+    assert outer == []
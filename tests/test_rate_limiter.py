@@ -0,0 +1,57 @@
+import asyncio
+import pytest
+from src.rate_limiter import RateLimiter, TokenBucket
+
+
+def test_aimd_window_grows_and_shrinks():
+    """成功で加算的に拡大し、429 で乗算的に縮小することを確認"""
+    limiter = RateLimiter(initial_concurrency=4, max_concurrency=8, decrease_cooldown=0)
+    for _ in range(4):
+        limiter.on_success()
+    assert limiter.concurrency_limit == 4
+    assert limiter.window > 4.9
+
+    limiter.on_throttle()
+    assert limiter.concurrency_limit == 2
+
+    for _ in range(10):
+        limiter.on_throttle()
+    assert limiter.concurrency_limit == 1
+
+
+def test_throttle_cooldown_prevents_repeated_decrease():
+    """同時に返った 429 でウィンドウが多重に縮小されないことを確認"""
+    limiter = RateLimiter(initial_concurrency=8, max_concurrency=8, decrease_cooldown=60)
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.concurrency_limit == 4
+
+
+def test_token_bucket_wait_time():
+    """バケットが空の場合、補充速度に応じた待ち時間を返すことを確認"""
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.wait_time(60) == 0.0
+    bucket.consume(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0, abs=0.05)
+
+
+@pytest.mark.asyncio
+async def test_acquire_respects_concurrency_window():
+    """同時実行数がウィンドウを超えないことを確認"""
+    limiter = RateLimiter(requests_per_minute=100000, tokens_per_minute=10 ** 9,
+                          initial_concurrency=2, max_concurrency=2)
+    running = 0
+    peak = 0
+
+    async def job():
+        nonlocal running, peak
+        await limiter.acquire(10)
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        limiter.release(10)
+
+    await asyncio.gather(*[job() for _ in range(10)])
+    assert peak == 2
+    assert limiter.in_flight == 0
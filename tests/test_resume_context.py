@@ -0,0 +1,89 @@
+import pytest
+from conftest import FakeBackend
+from src.resume_context import ResumeContext, HeadingPath, heading_key
+from src.skills import PaperProcessorSkills
+
+RESUME = """# Kinship and Exchange レジュメ
+# 1. リサーチ・クエスチョン
+How does exchange shape kinship?
+# 2. 核心的主張（Thesis）
+Exchange constitutes kinship.
+# ## Introduction：序論
+## 中心的な主張
+INTRO-CLAIM
+## Introductionの論理展開
+- intro point
+# ## 2. Ritual and Exchange：儀礼と交換
+## 中心的な主張
+RITUAL-CLAIM
+# ## Fieldwork in Melanesia
+## 中心的な主張
+FIELD-CLAIM
+# ## References：参考文献
+- REF-LIST
+"""
+
+PARAGRAPH = "This sentence is part of a long academic paragraph. " * 20
+
+
+def test_heading_key_ignores_numbering_and_annotations():
+    assert heading_key("# ## 2. Ritual and Exchange：儀礼と交換") == "ritual and exchange"
+    assert heading_key("## Ritual and Exchange") == "ritual and exchange"
+    assert heading_key("## Introductionの論理展開") == "introduction"
+
+
+def test_select_keeps_thesis_and_matching_sections_only():
+    context = ResumeContext(RESUME)
+
+    selected = context.select(["Kinship and Exchange", "Ritual and Exchange"])
+
+    assert "Exchange constitutes kinship." in selected
+    assert "How does exchange shape kinship?" in selected
+    assert "RITUAL-CLAIM" in selected
+    assert "INTRO-CLAIM" not in selected and "FIELD-CLAIM" not in selected
+    # 除外セクションは一致しても付与しない
+    assert "REF-LIST" not in context.select(["References"])
+    # 一致するセクションがなくても論旨は付く
+    assert "Exchange constitutes kinship." in context.select([])
+    assert len(context.select([])) < len(RESUME) / 2
+
+
+def test_unstructured_resume_is_used_in_full():
+    resume = "# Summary\nFree-form summary without thesis headings."
+    assert ResumeContext(resume).select(["Summary"]) == resume
+
+
+def test_heading_path_inherits_ancestors_across_chunks():
+    path = HeadingPath()
+
+    assert path.feed("# Title\n\n## Fieldwork in Melanesia\n\nText.") == ["Title", "Fieldwork in Melanesia"]
+    assert path.feed("More fieldwork text.") == ["Title", "Fieldwork in Melanesia"]
+    assert path.feed("## Introduction\n\n### Aims\n\nText.") == ["Title", "Introduction", "Aims"]
+    assert path.feed("Aims continued.\n\n## Conclusion\n\nEnd.") == ["Title", "Introduction", "Aims", "Conclusion"]
+
+
+@pytest.mark.asyncio
+async def test_translation_prompts_carry_only_relevant_resume_sections():
+    """各チャンクのプロンプトに論旨と自身の見出しのセクションだけが付き、入力がレジュメ全文より小さくなることを確認"""
+    markdown = "# Kinship and Exchange\n\n" + "\n\n".join(
+        f"## {name}\n\n{PARAGRAPH}" for name in ["Introduction", "Ritual and Exchange", "Fieldwork in Melanesia"]
+    )
+    backend = FakeBackend()
+    skills = PaperProcessorSkills(llm=backend, hedge_percentile=None)
+    skills.pack_chunks = False
+
+    await skills.translate_academic(markdown, summary_context=RESUME)
+
+    prompts = {p.split("[Target Text]\n", 1)[1].split("\n", 1)[0]: p for p in backend.prompts}
+    assert set(prompts) == {"## Introduction", "## Ritual and Exchange", "## Fieldwork in Melanesia"}
+    for prompt in prompts.values():
+        assert "Exchange constitutes kinship." in prompt
+        assert "REF-LIST" not in prompt
+    assert "INTRO-CLAIM" in prompts["## Introduction"] and "RITUAL-CLAIM" not in prompts["## Introduction"]
+    assert "RITUAL-CLAIM" in prompts["## Ritual and Exchange"] and "FIELD-CLAIM" not in prompts["## Ritual and Exchange"]
+    assert "FIELD-CLAIM" in prompts["## Fieldwork in Melanesia"] and "RITUAL-CLAIM" not in prompts["## Fieldwork in Melanesia"]
+
+    skills.select_resume_context = False
+    backend.prompts.clear()
+    await skills.translate_academic(markdown, summary_context=RESUME)
+    assert all(RESUME in p for p in backend.prompts)
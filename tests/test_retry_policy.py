@@ -0,0 +1,86 @@
+import random
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+from src.retry_policy import (
+    ErrorClass, RetryPolicy, CircuitBreaker, CircuitOpenError, ContentBlockedError,
+    DeadlineExceededError, LLMFatalError, classify_error, retry_after, deadline_scope
+)
+
+
+class FakeAPIError(Exception):
+    def __init__(self, code, details=None, headers=None):
+        super().__init__(f"{code} error")
+        self.code = code
+        self.details = details
+        self.response = MagicMock(headers=headers or {})
+
+
+def test_classify_error():
+    assert classify_error(FakeAPIError(429)) == ErrorClass.QUOTA
+    assert classify_error(FakeAPIError(401)) == ErrorClass.FATAL
+    assert classify_error(FakeAPIError(400)) == ErrorClass.FATAL
+    assert classify_error(FakeAPIError(503)) == ErrorClass.TRANSIENT
+    assert classify_error(TimeoutError()) == ErrorClass.TRANSIENT
+    assert classify_error(ContentBlockedError("SAFETY")) == ErrorClass.CONTENT_BLOCKED
+
+
+def test_retry_after_from_header_and_retry_info():
+    assert retry_after(FakeAPIError(429, headers={"retry-after": "7"})) == 7.0
+    details = {"error": {"details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "34s"}]}}
+    assert retry_after(FakeAPIError(429, details=details)) == 34.0
+    assert retry_after(FakeAPIError(503)) is None
+
+
+def test_backoff_uses_full_jitter_and_honours_retry_after():
+    policy = RetryPolicy(max_attempts=5, base_delay=2, max_delay=10, rng=random.Random(0))
+    delays = [policy.backoff(3) for _ in range(50)]
+    assert all(0 <= d <= 10 for d in delays)
+    assert len(set(delays)) > 1
+    assert policy.backoff(0, FakeAPIError(429, headers={"retry-after": "30"})) == 30.0
+
+
+def test_circuit_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure(ErrorClass.TRANSIENT)
+    breaker.before_call()
+    breaker.record_failure(ErrorClass.TRANSIENT)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+@pytest.mark.asyncio
+async def test_fatal_error_is_not_retried_and_opens_circuit(processor):
+    """不正なキー（401）はリトライせず、以降の呼び出しも即座に失敗することを確認"""
+    processor.client.aio.models.generate_content = AsyncMock(side_effect=FakeAPIError(401))
+
+    with pytest.raises(LLMFatalError):
+        await processor.acall_api("prompt", lambda msg: None)
+    assert processor.client.aio.models.generate_content.await_count == 1
+
+    with pytest.raises(CircuitOpenError):
+        await processor.acall_api("another prompt", lambda msg: None)
+    assert processor.client.aio.models.generate_content.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_blocked_prompt_raises_content_blocked(processor):
+    response = MagicMock()
+    response.prompt_feedback.block_reason = "SAFETY"
+    processor.client.aio.models.generate_content = AsyncMock(return_value=response)
+
+    with pytest.raises(ContentBlockedError):
+        await processor.acall_api("prompt", lambda msg: None)
+    assert processor.client.aio.models.generate_content.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_deadline_stops_retry_wait(processor):
+    """期限を超えるバックオフは待たずに打ち切られることを確認"""
+    processor.client.aio.models.generate_content = AsyncMock(
+        side_effect=FakeAPIError(429, headers={"retry-after": "120"})
+    )
+
+    with deadline_scope(5):
+        with pytest.raises(DeadlineExceededError):
+            await processor.acall_api("prompt", lambda msg: None)
+    assert processor.client.aio.models.generate_content.await_count == 1
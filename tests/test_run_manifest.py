@@ -0,0 +1,75 @@
+import pytest
+from conftest import FakeBackend
+from src.run_manifest import RunManifest
+from src.skills import PaperProcessorSkills
+from src.main import run_pipeline
+
+
+class FlakyBackend(FakeBackend):
+    """"Method" 節の翻訳だけ最初の1回失敗するテスト用バックエンド"""
+
+    def __init__(self):
+        super().__init__()
+        self.fail_method = True
+
+    def respond(self, prompt):
+        if "[Target Text]" in prompt and "We did things." in prompt and self.fail_method:
+            self.fail_method = False
+            raise RuntimeError("network down")
+        return super().respond(prompt)
+
+
+def test_phase_results_invalidated_when_input_changes(tmp_path):
+    manifest = RunManifest(tmp_path / "run", "original text")
+    manifest.save_phase("resume", "レジュメ")
+    manifest.save_chunk("abc", "翻訳")
+
+    assert RunManifest(tmp_path / "run", "original text").load_phase("resume") == "レジュメ"
+    changed = RunManifest(tmp_path / "run", "edited text")
+    assert changed.load_phase("resume") is None
+    # チャンクは内容のハッシュで照合するため入力が変わっても再利用できる
+    assert changed.load_chunk("abc") == "翻訳"
+    assert not list((tmp_path / "run").rglob("*.tmp"))
+
+
+@pytest.mark.asyncio
+async def test_rerun_retries_only_failed_chunks(tmp_path):
+    """Phase 3 の一部が失敗した後の再実行では、失敗したチャンクだけを呼び出すことを確認"""
+    input_file = tmp_path / "paper.txt"
+    input_file.write_text("Raw OCR text of the paper.", encoding="utf-8")
+    backend = FlakyBackend()
+    skills = PaperProcessorSkills(llm=backend)
+    skills.token_estimator.estimate = lambda text: len(text) * 1000  # 節ごとに分割させる
+
+    with pytest.raises(RuntimeError):
+        await run_pipeline(input_file, skills, "")
+    first_run_calls = len(backend.prompts)
+    assert (tmp_path / "paper_run" / "manifest.json").exists()
+
+    await run_pipeline(input_file, skills, "")
+
+    rerun_prompts = backend.prompts[first_run_calls:]
+    assert len(rerun_prompts) == 1
+    assert "We did things." in rerun_prompts[0]
+    assert (tmp_path / "paper_output.txt").exists()
+
+
+@pytest.mark.asyncio
+async def test_prompt_change_invalidates_saved_results(tmp_path, monkeypatch):
+    """プロンプトのテンプレートを変えると、保存済みのフェーズ・チャンクを使わずに呼び出し直すことを確認"""
+    input_file = tmp_path / "paper.txt"
+    input_file.write_text("Raw OCR text of the paper.", encoding="utf-8")
+    backend = FlakyBackend()
+    backend.fail_method = False
+    skills = PaperProcessorSkills(llm=backend)
+
+    await run_pipeline(input_file, skills, "")
+    first_run_calls = len(backend.prompts)
+    await run_pipeline(input_file, skills, "")
+    assert len(backend.prompts) == first_run_calls
+
+    # shared/prompts.json の翻訳プロンプトを編集した場合に相当する
+    monkeypatch.setattr(PaperProcessorSkills, "PHASE_PROMPTS", dict(PaperProcessorSkills.PHASE_PROMPTS, translation="edited"))
+    await run_pipeline(input_file, skills, "")
+    rerun_prompts = backend.prompts[first_run_calls:]
+    assert rerun_prompts and all("[Target Text]" in prompt for prompt in rerun_prompts)
@@ -0,0 +1,52 @@
+import asyncio
+import pytest
+from conftest import FakeBackend, target_text
+from src.scheduling import longest_first, schedule_stats
+from src.skills import PaperProcessorSkills
+
+SECTIONS = [("One", 1), ("Two", 1), ("Three", 1), ("Four", 1), ("Five", 6)]
+MARKDOWN = "# Title\n\n" + "\n\n".join(f"## {name}\n" + "word " * (40 * size) for name, size in SECTIONS)
+
+
+class SlotBackend(FakeBackend):
+    """同時実行 2 のリミッタを模し、チャンクの長さに比例した時間で訳を返す"""
+
+    def __init__(self):
+        super().__init__()
+        self.slots = asyncio.Semaphore(2)
+        self.started = []
+
+    async def arespond(self, prompt):
+        chunk = target_text(prompt)
+        async with self.slots:
+            self.started.append(chunk.split("\n", 1)[0])
+            await asyncio.sleep(0.001 * chunk.count("word"))
+        return f"訳: {chunk.splitlines()[0]}"
+
+
+def test_longest_first_is_stable():
+    assert longest_first([1, 5, 1, 3, 5]) == [1, 4, 3, 0, 2]
+
+
+def test_schedule_stats_against_lower_bound():
+    # 並列 2 で 1,1,1,1,6 を文書順に流した場合: makespan 8 に対し下限は max(6, 10/2) = 6
+    document_order = [(0, 1), (0, 1), (1, 2), (1, 2), (2, 8)]
+    lpt = [(0, 6), (0, 1), (1, 2), (2, 3), (3, 4)]
+
+    assert schedule_stats(document_order) == {"makespan": 8, "lower_bound": 6, "workers": 2, "efficiency": 0.75}
+    assert schedule_stats(lpt)["makespan"] == 6
+    assert schedule_stats(lpt)["efficiency"] == 1.0
+    assert schedule_stats([(0, 1)]) is None
+
+
+@pytest.mark.asyncio
+async def test_translation_starts_longest_chunk_first_and_keeps_document_order():
+    """推定コストの最も大きいチャンクが最初に始まり、結果は文書順に結合されることを確認"""
+    backend = SlotBackend()
+    skills = PaperProcessorSkills(llm=backend)
+    skills.pack_chunks = False
+
+    result = await skills.translate_academic(MARKDOWN)
+
+    assert backend.started[0] == "## Five"
+    assert result.splitlines()[::2] == [f"訳: ## {name}" for name, _ in SECTIONS]
@@ -0,0 +1,136 @@
+import asyncio
+import pytest
+import httpx
+from src.main import main
+from src.server import Job, JobServer, JobClient, parse_address
+from src.progress import Notice, ProgressStatus
+
+
+@pytest.mark.asyncio
+async def test_submit_status_and_result_over_unix_socket(tmp_path):
+    """投入したジョブが処理され、クライアントから状態と成果物を取得できることを確認"""
+    input_file = tmp_path / "paper.txt"
+    input_file.write_text("raw", encoding="utf-8")
+
+    async def runner(job: Job):
+        job.handle(Notice("Phase 1: 処理中"), ProgressStatus(0, 1, 0, 0, None, None, 0.1))
+        output = job.input_file.parent / f"{job.input_file.stem}_output.txt"
+        output.write_text(f"- done (fresh={job.fresh})", encoding="utf-8")
+        return output
+
+    server = JobServer(runner, max_queue=4, workers=1)
+    address = f"unix:{tmp_path / 'server.sock'}"
+    await server.start(address)
+    client = JobClient(address)
+    try:
+        submitted = await asyncio.to_thread(client.submit, input_file, True)
+        status = await asyncio.to_thread(client.wait, submitted["id"], 0.01)
+        result = await asyncio.to_thread(client.result, submitted["id"])
+        with pytest.raises(RuntimeError, match="404"):
+            await asyncio.to_thread(client.status, "missing")
+    finally:
+        client.close()
+        await server.close()
+
+    assert submitted["status"] == "queued"
+    assert status["status"] == "done"
+    assert status["percentage"] == 10
+    assert status["message"] == "Phase 1: 処理中"
+    assert result["content"] == "- done (fresh=True)"
+
+
+@pytest.mark.asyncio
+async def test_bounded_queue_rejects_and_failed_jobs_report_error(tmp_path):
+    """キューが満杯なら 503 で断り、失敗したジョブはエラーを返すことを確認"""
+    input_file = tmp_path / "paper.txt"
+    input_file.write_text("raw", encoding="utf-8")
+    release = asyncio.Event()
+
+    async def runner(job: Job):
+        await release.wait()
+        raise RuntimeError("boom")
+
+    server = JobServer(runner, max_queue=1, workers=1)
+    await server.start("127.0.0.1:0")
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{server.port}") as client:
+            first = await client.post("/jobs", json={"input_file": str(input_file)})
+            await asyncio.sleep(0.01)  # ワーカーが1件目を取り出すのを待つ
+            second = await client.post("/jobs", json={"input_file": str(input_file)})
+            third = await client.post("/jobs", json={"input_file": str(input_file)})
+            missing = await client.post("/jobs", json={"input_file": str(tmp_path / "none.txt")})
+            pending = await client.get(f"/jobs/{second.json()['id']}/result")
+
+            release.set()
+            while (await client.get(f"/jobs/{first.json()['id']}")).json()["status"] != "failed":
+                await asyncio.sleep(0.01)
+            failed = await client.get(f"/jobs/{first.json()['id']}/result")
+    finally:
+        await server.close()
+
+    assert (first.status_code, second.status_code, third.status_code) == (202, 202, 503)
+    assert missing.status_code == 400
+    assert pending.status_code == 409
+    assert failed.json()["error"] == "RuntimeError: boom"
+
+
+@pytest.mark.asyncio
+async def test_rejects_browser_requests(tmp_path):
+    """ループバック以外の Host と、application/json 以外の POST を断ることを確認"""
+    input_file = tmp_path / "paper.txt"
+    input_file.write_text("raw", encoding="utf-8")
+
+    async def runner(job: Job):
+        raise AssertionError("ジョブは投入されないはず")
+
+    server = JobServer(runner, max_queue=1, workers=1)
+    await server.start("127.0.0.1:0")
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{server.port}") as client:
+            plain = await client.post("/jobs", content=f'{{"input_file": "{input_file}"}}',
+                                      headers={"Content-Type": "text/plain"})
+            rebound = await client.get("/health", headers={"Host": f"attacker.example:{server.port}"})
+            health = await client.get("/health")
+    finally:
+        await server.close()
+
+    assert plain.status_code == 415
+    assert rebound.status_code == 403
+    assert health.status_code == 200 and health.json()["jobs"] == 0
+
+
+def test_parse_address_accepts_bracketed_ipv6():
+    assert parse_address("[::1]:8765") == ("::1", 8765)
+    assert parse_address("127.0.0.1:8765") == ("127.0.0.1", 8765)
+    assert parse_address("unix:/tmp/p.sock") == ("unix", "/tmp/p.sock")
+
+
+@pytest.mark.asyncio
+async def test_stalled_request_times_out(tmp_path):
+    """本文を送らずに止まったクライアントには 408 を返して接続を閉じることを確認"""
+    async def runner(job: Job):
+        raise AssertionError("ジョブは投入されないはず")
+
+    server = JobServer(runner, max_queue=1, workers=1, request_timeout=0.05)
+    await server.start("127.0.0.1:0")
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(b"POST /jobs HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\nContent-Length: 10\r\n\r\n")
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout=2)
+        writer.close()
+    finally:
+        await server.close()
+
+    assert response.startswith(b"HTTP/1.1 408")
+
+
+@pytest.mark.asyncio
+async def test_run_with_server_exits_nonzero_when_a_job_fails(tmp_path, monkeypatch):
+    input_file = tmp_path / "paper.txt"
+    input_file.write_text("raw", encoding="utf-8")
+    monkeypatch.setattr("src.main.submit_to_server", lambda *args, **kwargs: False)
+
+    with pytest.raises(SystemExit) as exited:
+        await main(["run", "--server", "127.0.0.1:1", str(input_file)])
+    assert exited.value.code == 1
@@ -0,0 +1,68 @@
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+# 読み込むと起動が遅くなる、LLM・サーバー用のモジュール
+HEAVY_MODULES = ("google.genai", "httpx", "dotenv")
+# インタプリタ自体の起動時間に上乗せしてよい時間（秒）。遅いマシンでも落ちないよう余裕を持たせる
+STARTUP_BUDGET_SECONDS = 2.0
+
+
+def _python(code: str) -> str:
+    result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+def test_main_import_skips_heavy_modules():
+    """エントリーポイントの読み込みで LLM・サーバー用の重いモジュールを読み込まないことを確認（時間ではなく sys.modules で判定）"""
+    code = (
+        "import json, sys\n"
+        "import src.main\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))\n"
+    )
+
+    assert json.loads(_python(code)) == []
+
+
+def test_main_import_within_startup_budget():
+    """エントリーポイントの読み込みが `python -c pass` と比べて大きく遅くならないことを確認（最も速い試行で比べる）"""
+    def fastest(code: str) -> float:
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            _python(code)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    baseline = fastest("pass")
+    assert fastest("import src.main") < baseline + STARTUP_BUDGET_SECONDS
+
+
+def test_local_subcommands_run_without_llm(tmp_path):
+    """convert / clean / split と run --plan が LLM（API キー）なしで動くことを確認"""
+    markdown = tmp_path / "paper.md"
+    markdown.write_text("# Title\n\n## Introduction\nBody text.\n\n## References\nSmith 2020.\n", encoding="utf-8")
+    code = (
+        "import asyncio, sys\n"
+        "from src.main import main\n"
+        "asyncio.run(main(sys.argv[1:]))\n"
+        "print('google.genai' in sys.modules, file=sys.stderr)\n"
+    )
+
+    def run(*args: str) -> subprocess.CompletedProcess:
+        return subprocess.run([sys.executable, "-c", code, *args], cwd=PROJECT_ROOT, capture_output=True, text=True,
+                              check=True, env={"PATH": "", "PYTHONPATH": str(PROJECT_ROOT)})
+
+    converted = run("convert", str(markdown))
+    cleaned = run("clean", str(markdown), "-o", str(tmp_path / "clean.md"))
+    plan = run("split", str(markdown))
+    estimate = run("run", "--plan", str(markdown))
+
+    assert converted.stdout.startswith("- Title\n  - Introduction\n    - Body text.")
+    assert "References" not in (tmp_path / "clean.md").read_text(encoding="utf-8")
+    assert "## Introduction" in plan.stdout and "References" not in plan.stdout
+    assert "=== 実行計画: paper.md ===" in estimate.stdout and "translation" in estimate.stdout
+    assert all(p.stderr.strip() == "False" for p in (converted, cleaned, plan, estimate))
@@ -0,0 +1,55 @@
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+from src.skills import PaperProcessorSkills
+
+
+def _chunk(text, finish_reason=None):
+    chunk = MagicMock()
+    chunk.text = text
+    candidate = MagicMock()
+    candidate.finish_reason = finish_reason
+    chunk.candidates = [candidate]
+    chunk.usage_metadata = None
+    chunk.prompt_feedback = None
+    return chunk
+
+
+def _stream_of(*chunks):
+    async def gen():
+        for c in chunks:
+            yield c
+    return AsyncMock(return_value=gen())
+
+
+@pytest.mark.asyncio
+async def test_astream_api_yields_fragments_and_finish_reason(processor):
+    """断片が到着順に返り、終了理由が参照できることを確認"""
+    processor.client.aio.models.generate_content_stream = _stream_of(
+        _chunk("# Title\n"), _chunk("Body"), _chunk(" text", "MAX_TOKENS")
+    )
+
+    stream = processor.astream_api("prompt")
+    fragments = [f async for f in stream]
+
+    assert fragments == ["# Title\n", "Body", " text"]
+    assert stream.finish_reason == "MAX_TOKENS"
+    assert stream.truncated
+
+
+@pytest.mark.asyncio
+async def test_structure_text_with_hint_streams_to_file(monkeypatch, tmp_path, processor):
+    """output_path 指定時に構造化結果が逐次ファイルへ書き込まれることを確認"""
+    skills = PaperProcessorSkills(llm=processor)
+    processor.client.aio.models.generate_content_stream = _stream_of(
+        _chunk("# Title\n\n"), _chunk("## Intro\nText."), _chunk("", "STOP")
+    )
+    output_path = tmp_path / "paper_structured_eng.md"
+    messages = []
+
+    result = await skills.structure_text_with_hint(
+        "raw", "hint", progress_callback=messages.append, output_path=output_path
+    )
+
+    assert result == "# Title\n\n## Intro\nText."
+    assert output_path.read_text(encoding="utf-8") == result
+    assert not any("MAX_TOKENS" in m.describe() for m in messages)
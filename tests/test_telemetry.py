@@ -0,0 +1,66 @@
+import json
+import pytest
+from conftest import llm_response
+from unittest.mock import AsyncMock
+from src.telemetry import Telemetry, CallStats, call_context
+
+
+@pytest.mark.asyncio
+async def test_records_tokens_retries_and_context(processor, tmp_path):
+    """呼び出しごとにフェーズ・チャンク・トークン数・リトライ回数が JSONL に記録されることを確認"""
+    processor.client.aio.models.generate_content = AsyncMock(
+        side_effect=[RuntimeError("boom"), llm_response("ok", prompt_tokens=100, response_tokens=50)]
+    )
+    telemetry = Telemetry(tmp_path / "telemetry.jsonl")
+
+    with telemetry.phase("translation"), call_context(chunk_id=3):
+        await processor.acall_api("prompt", lambda msg: None)
+
+    lines = (tmp_path / "telemetry.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    record = json.loads(lines[0])
+    assert record["phase"] == "translation"
+    assert record["chunk_id"] == 3
+    assert record["prompt_tokens"] == 100
+    assert record["response_tokens"] == 50
+    assert record["retries"] == 1
+    assert record["error"] is None
+    assert record["cost_usd"] == pytest.approx((100 * 0.50 + 50 * 3.00) / 1_000_000)
+
+
+@pytest.mark.asyncio
+async def test_no_record_outside_scope(processor):
+    """テレメトリのスコープ外では記録しないことを確認"""
+    processor.client.aio.models.generate_content = AsyncMock(return_value=llm_response("ok", prompt_tokens=100, response_tokens=50))
+    telemetry = Telemetry()
+
+    await processor.acall_api("prompt", lambda msg: None)
+
+    assert telemetry.records == []
+
+
+def test_summary_critical_path_and_cost():
+    """フェーズ別集計と、各フェーズで最後に終わった呼び出しがクリティカルパスになることを確認"""
+    telemetry = Telemetry(input_price_per_million=1.0, output_price_per_million=2.0)
+    for chunk_id, duration in [(0, 1.0), (1, 5.0), (2, 2.0)]:
+        stats = CallStats()
+        stats.attempts = 1
+        stats.latency = duration
+        stats.prompt_tokens = 1_000_000
+        stats.response_tokens = 500_000
+        stats.finished = stats.started + duration
+        with telemetry.phase("translation"), call_context(chunk_id=chunk_id):
+            telemetry.record(stats)
+
+    summary = telemetry.summary()
+
+    phase = summary["phases"]["translation"]
+    assert phase["calls"] == 3
+    assert phase["cost_usd"] == pytest.approx(6.0)
+    assert summary["critical_path"][0]["call"]["chunk_id"] == 1
+    assert "クリティカルパス" in telemetry.format_report()
+    # 3件が同時に始まったので、makespan は最長の呼び出しと一致し下限に達する
+    assert phase["schedule"]["workers"] == 3
+    assert phase["schedule"]["lower_bound"] == pytest.approx(5.0)
+    assert phase["schedule"]["makespan"] == pytest.approx(5.0, abs=0.01)
+    assert "makespan" in telemetry.format_report()
@@ -0,0 +1,75 @@
+import threading
+import pytest
+from conftest import FakeBackend
+from unittest.mock import MagicMock
+from src.token_estimator import TokenEstimator
+from src.skills import PaperProcessorSkills
+from src.progress import Notice
+
+
+def test_estimate_by_script():
+    """英語は約4文字/トークン、日本語は約1〜2文字/トークンで見積もられることを確認"""
+    estimator = TokenEstimator()
+    english = "academic translation " * 100
+    japanese = "学術的な翻訳を行う。" * 100
+
+    assert 400 <= estimator.estimate(english) <= 700
+    assert 600 <= estimator.estimate(japanese) <= 1000
+    assert estimator.estimate("") == 0
+
+
+def test_exact_counter_is_cached_and_calibrates():
+    """count_tokens の結果がチャンクごとにキャッシュされ、概算の補正に使われることを確認"""
+    counter = MagicMock(return_value=200)
+    estimator = TokenEstimator(counter)
+    text = "word " * 100
+    raw = estimator.estimate(text)
+
+    assert estimator.count(text) == 200
+    assert estimator.count(text) == 200
+    assert counter.call_count == 1
+    assert estimator.estimate(text) > raw
+
+
+def test_fits_accounts_for_output_expansion():
+    """出力の膨張率を含めて予算判定されることを確認"""
+    estimator = TokenEstimator()
+    text = "word " * 400  # 約 500 トークン
+    tokens = estimator.estimate(text)
+
+    assert estimator.fits(text, max_tokens=tokens * 3, output_ratio=1.4)
+    assert not estimator.fits(text, max_tokens=int(tokens * 2), output_ratio=1.4)
+
+
+def test_split_markdown_hierarchically_respects_token_budget():
+    """すべてのチャンクが入力+出力のトークン予算に収まることを確認"""
+    skills = PaperProcessorSkills(llm=MagicMock())
+    paragraph = "This sentence is part of a long academic paragraph. " * 20
+    text = "# Title\n\n## Intro\n\n" + "\n\n".join([paragraph] * 30) + "\n\n## Short\n\nTiny section."
+
+    chunks = skills._split_markdown_hierarchically(text, max_tokens=3000, output_ratio=1.4)
+
+    assert len(chunks) > 2
+    assert chunks[-1].startswith("## Short")
+    for chunk in chunks:
+        assert skills.token_estimator.fits(chunk, 3000, 1.4)
+    assert "".join(chunks).replace("\n", "") == text.replace("\n", "")
+
+
+@pytest.mark.asyncio
+async def test_exact_count_runs_off_event_loop():
+    """count_tokens API による分割はイベントループのスレッド外で行い、失敗は警告の通知になることを確認"""
+    loop_thread = threading.get_ident()
+    threads = []
+
+    def counter(text):
+        threads.append(threading.get_ident())
+        raise RuntimeError("offline")
+
+    skills = PaperProcessorSkills(llm=FakeBackend())
+    skills.token_estimator = TokenEstimator(counter)
+    events = []
+    await skills.translate_academic("# Title\n\n## One\nFirst.", progress_callback=events.append)
+
+    assert threads and loop_thread not in threads
+    assert any(isinstance(e, Notice) and e.warning and "offline" in e.message for e in events)
@@ -0,0 +1,161 @@
+import threading
+import pytest
+from conftest import FakeBackend, target_text
+from src.skills import PaperProcessorSkills
+from src.run_manifest import content_hash
+from src.translation_memory import TranslationMemory, minhash, NUM_PERM
+
+ETHICS = ("All participants gave informed consent, and the research protocol was approved by the "
+          "institutional review board of the university before fieldwork began.")
+ETHICS_VARIANT = ("All participants gave informed consent, and the research protocol was approved by the "
+                  "institutional review board of the university before the fieldwork began in 2019.")
+DATASET = ("The dataset comprises two hundred semi-structured interviews recorded in three villages "
+           "and transcribed verbatim by native speakers.")
+
+
+def fake_translation(paragraph: str) -> str:
+    """「訳(先頭の語 末尾の語)」に、原文に見合う長さの詰め物を付けた訳"""
+    return f"訳({paragraph.split()[0]} {paragraph.split()[-1]})" + "あ" * (len(paragraph) // 3)
+
+
+class ParagraphTranslator(FakeBackend):
+    """[Target Text] の段落ごとに fake_translation を返す"""
+
+    def respond(self, prompt):
+        return "\n\n".join(fake_translation(p) for p in target_text(prompt).split("\n\n") if p.strip())
+
+
+def _skills(memory: TranslationMemory):
+    backend = ParagraphTranslator()
+    skills = PaperProcessorSkills(llm=backend, hedge_percentile=None)
+    skills.pack_chunks = False
+    skills.translation_memory = memory
+    return skills, backend
+
+
+def test_exact_lookup_is_normalised_and_near_matches_use_lsh(tmp_path):
+    memory = TranslationMemory(tmp_path / "tm.sqlite3")
+    memory.add([(ETHICS, "倫理の訳"), (DATASET, "データの訳")])
+
+    assert memory.lookup("  " + ETHICS.replace(" ", "\n", 3)) == "倫理の訳"
+    # 大文字と小文字だけが違う段落は完全一致としないが、類似段落としては引ける
+    assert memory.lookup(ETHICS.upper()) is None
+    assert [source for _, source, _ in memory.similar(ETHICS.upper())] == [ETHICS]
+    assert memory.lookup(ETHICS_VARIANT) is None
+    near = memory.similar(ETHICS_VARIANT, limit=2)
+    assert [(source, translation) for _, source, translation in near] == [(ETHICS, "倫理の訳")]
+    assert memory.similar("A completely different paragraph about kinship terminology and marriage rules in the region.") == []
+    # 署名は固定の係数で作るため、プロセスをまたいで照合できる
+    assert minhash(ETHICS) == minhash(ETHICS) and len(minhash(ETHICS)) == NUM_PERM
+
+
+def test_add_translation_requires_aligned_paragraphs(tmp_path):
+    memory = TranslationMemory(tmp_path / "tm.sqlite3")
+    ethics_ja, dataset_ja = fake_translation(ETHICS), fake_translation(DATASET)
+
+    assert memory.add_translation(f"{ETHICS}\n\n{DATASET}", ethics_ja) == 0
+    # 段落数は合っていても、長さの比が妥当でない組（段落の統合と分割）があれば保存しない
+    assert memory.add_translation(f"{ETHICS}\n\n{DATASET}", f"{ethics_ja}{dataset_ja}\n\n訳") == 0
+    assert memory.add_translation(f"{ETHICS}\n\n{DATASET}", f"{ethics_ja}\n\n{dataset_ja}") == 2
+    assert memory.lookup(DATASET) == dataset_ja
+
+
+def test_exact_reuse_requires_matching_context(tmp_path):
+    """用語集・プロンプトが変わった段落は完全一致として再利用せず、署名のない段落は LSH に入れないことを確認"""
+    memory = TranslationMemory(tmp_path / "tm.sqlite3")
+    memory.add([(ETHICS, "倫理の訳"), ("## Ethics", "## 倫理")], context_of=lambda text: "glossary-v1")
+
+    assert memory.lookup(ETHICS, "glossary-v1") == "倫理の訳"
+    assert memory.lookup(ETHICS, "glossary-v2") is None
+    assert memory.plan(f"## Ethics\n\n{ETHICS}", 3, lambda text: "glossary-v2").reused == 0
+    lsh_keys = {row[0] for row in memory._conn.execute("SELECT DISTINCT key FROM lsh")}
+    assert lsh_keys == {memory.make_key(ETHICS)}
+    # 開き直しても現在の形式の訳は再利用できる
+    memory.close()
+    assert TranslationMemory(tmp_path / "tm.sqlite3").lookup(ETHICS, "glossary-v1") == "倫理の訳"
+
+
+@pytest.mark.asyncio
+async def test_second_document_reuses_boilerplate_and_gets_references(tmp_path):
+    """1つ目の文書の訳が翻訳メモリに入り、2つ目の文書では定型の段落の呼び出しが減ることを確認"""
+    memory = TranslationMemory(tmp_path / "tm.sqlite3")
+    first = f"# Paper A\n\n## Ethics\n\n{ETHICS}\n\n## Data\n\n{DATASET}\n\n## Findings\n\nGift exchange binds households."
+    second = (f"# Paper B\n\n## Ethics\n\n{ETHICS}\n\n## Data\n\n{DATASET}\n\nAn additional note on sampling."
+              f"\n\n## Procedure\n\n{ETHICS_VARIANT}")
+
+    skills, backend = _skills(memory)
+    await skills.translate_academic(first)
+    assert len(backend.prompts) == 3
+
+    skills, backend = _skills(memory)
+    result = await skills.translate_academic(second)
+
+    # Ethics は全段落が一致して呼び出しなし、Data は一致しなかった段落だけを送る
+    targets = [target_text(p) for p in backend.prompts]
+    assert sorted(targets) == sorted(["An additional note on sampling.", f"## Procedure\n\n{ETHICS_VARIANT}"])
+    procedure_prompt = next(p for p in backend.prompts if "## Procedure" in p)
+    assert "[Reference Translations]" in procedure_prompt and fake_translation(ETHICS) in procedure_prompt
+    assert result.split("\n\n") == [fake_translation(p) for p in [
+        "## Ethics", ETHICS,
+        "## Data", DATASET, "An additional note on sampling.",
+        "## Procedure", ETHICS_VARIANT,
+    ]]
+
+
+@pytest.mark.asyncio
+async def test_glossary_change_bypasses_exact_reuse(tmp_path):
+    """段落に付与する用語集の行が変わると、翻訳メモリの訳を再利用せずに翻訳し直すことを確認"""
+    memory = TranslationMemory(tmp_path / "tm.sqlite3")
+    document = f"## Ethics\n\n{ETHICS}"
+
+    skills, backend = _skills(memory)
+    await skills.translate_academic(document, "informed consent: インフォームド・コンセント")
+    skills, backend = _skills(memory)
+    await skills.translate_academic(document, "informed consent: インフォームド・コンセント")
+    assert backend.prompts == []
+
+    skills, backend = _skills(memory)
+    await skills.translate_academic(document, "informed consent: 説明に基づく同意")
+    assert len(backend.prompts) == 1 and ETHICS in backend.prompts[0]
+
+
+@pytest.mark.asyncio
+async def test_misaligned_partial_translation_falls_back_to_whole_chunk(tmp_path):
+    memory = TranslationMemory(tmp_path / "tm.sqlite3")
+    skills, backend = _skills(memory)
+    # 用語集なし・同じプロンプトとモデルで保存した訳とする
+    memory.add([(ETHICS, "倫理の訳")], context_of=lambda text: content_hash(skills.checkpoint_key("translation", ""), ""))
+
+    backend.respond = lambda prompt: "まとめた訳" if len(backend.prompts) == 1 else "訳A\n\n訳B\n\n訳C"
+    result = await skills.translate_academic(f"## Ethics\n\n{ETHICS}\n\nFollow-up paragraph.")
+
+    assert len(backend.prompts) == 2
+    assert ETHICS in backend.prompts[1]
+    assert result == "訳A\n\n訳B\n\n訳C"
+    # 長さの比が合わない対応は翻訳メモリに保存しない
+    assert len(memory) == 1
+
+
+@pytest.mark.asyncio
+async def test_memory_work_runs_off_event_loop_and_touches_once_per_chunk(tmp_path):
+    """照合と保存はイベントループのスレッド外で行い、使用日時の更新はチャンクごとに1回にまとめることを確認"""
+    memory = TranslationMemory(tmp_path / "tm.sqlite3")
+    skills, backend = _skills(memory)
+    context = content_hash(skills.checkpoint_key("translation", ""), "")
+    memory.add([(ETHICS, fake_translation(ETHICS)), (DATASET, fake_translation(DATASET))], context_of=lambda text: context)
+    loop_thread = threading.get_ident()
+    threads, touches = [], []
+    plan, add_translation, touch = memory.plan, memory.add_translation, memory._touch
+
+    def spy(method, *args):
+        threads.append(threading.get_ident())
+        return method(*args)
+
+    memory.plan = lambda *args: spy(plan, *args)
+    memory.add_translation = lambda *args: spy(add_translation, *args)
+    memory._touch = lambda keys: (touches.append(keys), touch(keys))
+
+    await skills.translate_academic(f"{ETHICS}\n\n{DATASET}\n\nA new closing paragraph.")
+
+    assert len(threads) == 2 and loop_thread not in threads
+    assert [len(keys) for keys in touches] == [2]